@@ -4,10 +4,11 @@
 
 import os
 import random
-from typing import TYPE_CHECKING, Any, List, Type
+from typing import TYPE_CHECKING, Any, List, Optional, Type
 
 from habitat import ThreadedVectorEnv, VectorEnv, logger, make_dataset
 from habitat.config import read_write
+from habitat.core.scene_scheduler import SceneAffinityScheduler
 from habitat.gym import make_gym_from_config
 from habitat_baselines.common.env_factory import VectorEnvFactory
 
@@ -43,30 +44,51 @@ class HabitatVectorEnvFactory(VectorEnvFactory):
                 "No scenes to load, multiple process logic relies on being able to split scenes uniquely between processes"
             )
 
-        random.shuffle(scenes)
-
-        scene_splits: List[List[str]] = [[] for _ in range(num_environments)]
-        if len(scenes) < num_environments:
-            msg = f"There are less scenes ({len(scenes)}) than environments ({num_environments}). "
-            if enforce_scenes_greater_eq_environments:
-                logger.warn(
-                    msg
-                    + "Reducing the number of environments to be the number of scenes."
-                )
-                num_environments = len(scenes)
-                scene_splits = [[s] for s in scenes]
-            else:
+        scene_splits: List[List[str]]
+        scene_scheduler: Optional[SceneAffinityScheduler] = None
+        if config.habitat_baselines.scene_affinity_scheduling:
+            # Loads the episodes to estimate the cost of each scene.
+            dataset_config = config.habitat.dataset.copy()
+            with read_write(dataset_config):
+                dataset_config.content_scenes = scenes
+            scene_scheduler = SceneAffinityScheduler.from_dataset(
+                make_dataset(dataset_config.type, config=dataset_config),
+                num_environments,
+                scene_load_cost=config.habitat_baselines.scene_load_cost,
+                dynamic=enforce_scenes_greater_eq_environments,
+            )
+            if scene_scheduler.num_workers < num_environments:
                 logger.warn(
-                    msg
-                    + "Each environment will use all the scenes instead of using a subset."
+                    f"There are less scenes ({len(scenes)}) than environments ({num_environments}). "
+                    "Reducing the number of environments to be the number of scenes."
                 )
-            for scene in scenes:
-                for split in scene_splits:
-                    split.append(scene)
+                num_environments = scene_scheduler.num_workers
+            scene_splits = scene_scheduler.assignments
         else:
-            for idx, scene in enumerate(scenes):
-                scene_splits[idx % len(scene_splits)].append(scene)
-            assert sum(map(len, scene_splits)) == len(scenes)
+            random.shuffle(scenes)
+
+            scene_splits = [[] for _ in range(num_environments)]
+            if len(scenes) < num_environments:
+                msg = f"There are less scenes ({len(scenes)}) than environments ({num_environments}). "
+                if enforce_scenes_greater_eq_environments:
+                    logger.warn(
+                        msg
+                        + "Reducing the number of environments to be the number of scenes."
+                    )
+                    num_environments = len(scenes)
+                    scene_splits = [[s] for s in scenes]
+                else:
+                    logger.warn(
+                        msg
+                        + "Each environment will use all the scenes instead of using a subset."
+                    )
+                for scene in scenes:
+                    for split in scene_splits:
+                        split.append(scene)
+            else:
+                for idx, scene in enumerate(scenes):
+                    scene_splits[idx % len(scene_splits)].append(scene)
+                assert sum(map(len, scene_splits)) == len(scenes)
 
         for env_index in range(num_environments):
             proc_config = config.copy()
@@ -112,7 +134,10 @@ class HabitatVectorEnvFactory(VectorEnvFactory):
             make_env_fn=make_gym_from_config,
             env_fn_args=tuple((c,) for c in configs),
             workers_ignore_signals=workers_ignore_signals,
+            shared_memory_observations=config.habitat_baselines.shared_memory_observations,
+            async_reset_done=config.habitat_baselines.async_reset_done,
         )
+        envs.scene_scheduler = scene_scheduler
 
         if config.habitat.simulator.renderer.enable_batch_renderer:
             envs.initialize_batch_renderer(config)
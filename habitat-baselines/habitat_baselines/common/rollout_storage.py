@@ -84,6 +84,12 @@ class RolloutStorage(Storage):
         self.buffers["masks"] = torch.zeros(
             numsteps + 1, num_envs, 1, dtype=torch.bool
         )
+        # False for the steps that are not environment transitions, e.g. the
+        # step of an env whose reset was deferred, see `VectorEnv`. They are
+        # excluded from the policy and value losses.
+        self.buffers["valid_masks"] = torch.ones(
+            numsteps + 1, num_envs, 1, dtype=torch.bool
+        )
 
         self.is_double_buffered = is_double_buffered
         self._nbuffers = 2 if is_double_buffered else 1
@@ -120,6 +126,7 @@ class RolloutStorage(Storage):
         rewards=None,
         next_masks=None,
         buffer_index: int = 0,
+        valid_masks=None,
         **kwargs,
     ):
         if not self.is_double_buffered:
@@ -137,6 +144,7 @@ class RolloutStorage(Storage):
             action_log_probs=action_log_probs,
             value_preds=value_preds,
             rewards=rewards,
+            valid_masks=valid_masks,
         )
 
         next_step = {k: v for k, v in next_step.items() if v is not None}
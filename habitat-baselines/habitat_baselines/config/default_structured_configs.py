@@ -478,6 +478,23 @@ class HabitatBaselinesConfig(HabitatBaselinesBaseConfig):
     log_file: str = "train.log"
     force_blind_policy: bool = False
     verbose: bool = True
+    # If True, the vectorized environment workers write the fixed-shape
+    # sensors of the observations to shared memory instead of sending them
+    # through pipes.
+    shared_memory_observations: bool = False
+    # If True, the vectorized environment returns the terminal observations
+    # of an episode right away and resets in the background. The next step
+    # of that environment then only returns the new episode observations.
+    # Evaluation always resets synchronously.
+    async_reset_done: bool = False
+    # If True, whole scenes are assigned to the environments so that each
+    # scene is loaded by as few environments as possible, balanced by their
+    # number of episodes. During evaluation, the environments that run out
+    # of episodes take the scenes that are left instead of being paused.
+    scene_affinity_scheduling: bool = False
+    # Cost of loading a scene, in number of episodes, when balancing the
+    # scenes between the environments with scene_affinity_scheduling.
+    scene_load_cost: float = 0.0
     # Creates the vectorized environment.
     vector_env_factory: VectorEnvFactoryConfig = VectorEnvFactoryConfig()
     evaluator: EvaluatorConfig = EvaluatorConfig()
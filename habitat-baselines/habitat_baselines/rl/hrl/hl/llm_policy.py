@@ -1,4 +1,5 @@
 # ruff: noqa
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Dict, List, Tuple
 
@@ -38,16 +39,39 @@ class LLMHighLevelPolicy(HighLevelPolicy):
         #     for action in ACTION_POOL
         #     if action.name in environment_action_name_set
         # ]
-        # Initialize the LLM agent
-        self.llm_agent = self._init_llm_agent(kwargs["agent_name"], ACTION_POOL)
-
-    def _init_llm_agent(self, agent_name, action_list):
+        # Initialize one LLM agent per environment, the chat state of an agent
+        # is never shared across environments
+        self.llm_agents: List[CrabAgent] = [
+            self._init_llm_agent(kwargs["agent_name"], ACTION_POOL, env_idx)
+            for env_idx in range(self._num_envs)
+        ]
+        # maximum number of environments querying the LLM at the same time, all of them if None
+        self._max_concurrency = self._config.get("max_concurrency", None)
+
+    def _init_llm_agent(self, agent_name, action_list, env_idx=0):
         # Initialize the LLM agent here based on the config
         # This could load a pre-trained model, set up prompts, etc.
         # Return the initialized agent
         # return DummyAgent(agent_name=agent_name, action_list=action_list)
 
-        return CrabAgent(agent_name, action_list)
+        # agents of the same environment share the message scope of the environment
+        return CrabAgent(agent_name, action_list, message_scope=env_idx)
+
+    @property
+    def llm_agent(self) -> CrabAgent:
+        """The LLM agent of the first environment."""
+        return self.llm_agents[0]
+
+    def filter_envs(self, curr_envs_to_keep_active):
+        """
+        Cleans up stateful variables of the policy so that
+        they match with the active environments
+        """
+        self.llm_agents = [
+            llm_agent
+            for llm_agent, keep_active in zip(self.llm_agents, curr_envs_to_keep_active)
+            if keep_active
+        ]
 
     def _parse_function_call_args(self, action_name, action_args: Dict) -> str:
         """
@@ -111,35 +135,43 @@ class LLMHighLevelPolicy(HighLevelPolicy):
             'Ensure that all required parameters are included and correctly formatted.'
         )
 
-        semantic_observation = envs_text_context[0]["scene_description"]
-        # print(semantic_observation)
-        if not self.llm_agent.start_act:
-            get_next_action_message = start_action_prompt.format(
-                scene_description=semantic_observation
-            )
-            self.llm_agent.start_act = True
-        else:
-            get_next_action_message = step_action_prompt
-
         batch_size = masks.shape[0]
         next_skill = torch.zeros(batch_size)
         skill_args_data = [None for _ in range(batch_size)]
         immediate_end = torch.zeros(batch_size, dtype=torch.bool)
 
-        assert self.llm_agent.initialized, "Exception in LLMHighLevelPolicy.get_next_skill(): LLM agent not initialized."
+        plan_envs = [
+            batch_idx
+            for batch_idx, should_plan in enumerate(plan_masks)
+            if should_plan == 1.0
+        ]
+        get_next_action_messages = []
+        for batch_idx in plan_envs:
+            llm_agent = self.llm_agents[batch_idx]
+            assert llm_agent.initialized, "Exception in LLMHighLevelPolicy.get_next_skill(): LLM agent not initialized."
+            if not llm_agent.start_act:
+                semantic_observation = envs_text_context[batch_idx]["scene_description"]
+                get_next_action_messages.append(
+                    start_action_prompt.format(scene_description=semantic_observation)
+                )
+                llm_agent.start_act = True
+            else:
+                get_next_action_messages.append(step_action_prompt)
 
-        for batch_idx, should_plan in enumerate(plan_masks):
-            if should_plan != 1.0:
-                continue
+        # Query the LLM agents of all planning envs with the current observations
+        # to get the next action and arguments
+        llm_outputs = self._chat_all(
+            [self.llm_agents[batch_idx] for batch_idx in plan_envs],
+            get_next_action_messages,
+        )
 
-            # Query the LLM agent with the current observations
-            # to get the next action and arguments
-            llm_output = self.llm_agent.chat(get_next_action_message)
+        for batch_idx, llm_output in zip(plan_envs, llm_outputs):
+            llm_agent = self.llm_agents[batch_idx]
             print("=================llm_output===================")
-            print("Agent: ", self.llm_agent.name)
+            print("Agent: ", llm_agent.name, "Env: ", batch_idx)
             print(llm_output)
             print("=================total token usage=======================")
-            print("Agent: {} {}".format(self.llm_agent.name, self.llm_agent.get_token_usage()))
+            print("Agent: {} {}".format(llm_agent.name, llm_agent.get_token_usage()))
             print("==============================================")
             if llm_output is None:
                 next_skill[batch_idx] = self._skill_name_to_idx["wait"]
@@ -163,3 +195,21 @@ class LLMHighLevelPolicy(HighLevelPolicy):
             immediate_end,
             PolicyActionData(),
         )
+
+    def _chat_all(self, llm_agents: List[CrabAgent], messages: List[str]) -> List[Any]:
+        """
+        Chat with the LLM agents of several environments concurrently, llm_agents[i] receiving messages[i].
+        The replies are returned in the order of llm_agents.
+        """
+        if len(llm_agents) <= 1 or self._max_concurrency == 1:
+            return [llm_agent.chat(message) for llm_agent, message in zip(llm_agents, messages)]
+
+        max_workers = len(llm_agents)
+        if self._max_concurrency is not None:
+            max_workers = min(self._max_concurrency, max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm_policy") as executor:
+            futures = [
+                executor.submit(llm_agent.chat, message)
+                for llm_agent, message in zip(llm_agents, messages)
+            ]
+            return [future.result() for future in futures]
@@ -9,6 +9,7 @@ import tqdm
 from habitat import logger
 from habitat.tasks.rearrange.rearrange_sensors import GfxReplayMeasure
 from habitat.tasks.rearrange.utils import write_gfx_replay
+from habitat.utils.event_log import EventLog
 from habitat.utils.visualizations.utils import (
     observations_to_image,
     overlay_frame,
@@ -16,7 +17,12 @@ from habitat.utils.visualizations.utils import (
 from habitat_baselines.common.obs_transformers import (
     apply_obs_transforms_batch,
 )
-from habitat_baselines.rl.ppo.evaluator import Evaluator, pause_envs
+from habitat_baselines.rl.ppo.evaluator import (
+    Evaluator,
+    log_scene_load_stats,
+    pause_envs,
+    reassign_envs_scenes,
+)
 from habitat_baselines.utils.common import (
     batch_obs,
     generate_video,
@@ -117,10 +123,17 @@ class HabitatMASEvaluator(Evaluator):
 
         number_of_eval_episodes = config.habitat_baselines.test_episode_count
         evals_per_ep = config.habitat_baselines.eval.evals_per_ep
+        num_pending_episodes = (
+            0
+            if envs.scene_scheduler is None
+            else envs.scene_scheduler.num_pending_episodes
+        )
         if number_of_eval_episodes == -1:
-            number_of_eval_episodes = sum(envs.number_of_episodes)
+            number_of_eval_episodes = (
+                sum(envs.number_of_episodes) + num_pending_episodes
+            )
         else:
-            total_num_eps = sum(envs.number_of_episodes)
+            total_num_eps = sum(envs.number_of_episodes) + num_pending_episodes
             # if total_num_eps is negative, it means the number of evaluation episodes is unknown
             if total_num_eps < number_of_eval_episodes and total_num_eps > 1:
                 logger.warn(
@@ -135,6 +148,10 @@ class HabitatMASEvaluator(Evaluator):
             number_of_eval_episodes > 0
         ), "You must specify a number of evaluation episodes with test_episode_count"
         envs_text_context = {}
+        # the chat histories and token usage of the LLM agents are logged to the event log
+        # of this evaluation, the json files are rebuilt periodically and when it ends
+        chat_history_dir = "./chat_history_output"
+        chat_event_log = EventLog(os.path.join(chat_history_dir, "event_log"))
         pbar = tqdm.tqdm(total=number_of_eval_episodes * evals_per_ep)
         agent.eval()
         cur_ep_id = -1
@@ -179,6 +196,8 @@ class HabitatMASEvaluator(Evaluator):
                     not_done_masks,
                     deterministic=False,
                     envs_text_context=envs_text_context,
+                    save_chat_history_dir=chat_history_dir,
+                    chat_event_log=chat_event_log,
                     **space_lengths,
                 )
                 if action_data.should_inserts is None:
@@ -364,6 +383,30 @@ class HabitatMASEvaluator(Evaluator):
                             current_episodes_info[i].episode_id,
                         )
 
+            reassigned = reassign_envs_scenes(
+                envs_to_pause, envs, dones, observations
+            )
+            if len(reassigned) > 0:
+                batch = batch_obs(observations, device=device)  # type: ignore
+                batch = apply_obs_transforms_batch(batch, obs_transforms)  # type: ignore
+                if rgb_frames is not None:
+                    # Restart the videos from the first frame in the new scene
+                    for i in reassigned:
+                        rgb_frames[i] = [
+                            observations_to_image(
+                                {k: v[i] for k, v in batch.items() if
+                                     k != "agent_0_fourth_rgb" and k != "agent_1_fourth_rgb"}, {}, config,
+                                0,
+                            )
+                        ]
+                        if config.habitat_baselines.eval.generate_fourth_rgb:
+                            rgb_frames_fourth[i] = [
+                                observations_to_image(
+                                    {k: v[i] for k, v in batch.items() if
+                                         k == "agent_0_fourth_rgb"}, {}, config, 0,
+                                )
+                            ]
+
             not_done_masks = not_done_masks.to(device=device)
             (
                 envs,
@@ -392,6 +435,7 @@ class HabitatMASEvaluator(Evaluator):
                 agent.actor_critic.on_envs_pause(envs_to_pause)
 
         pbar.close()
+        chat_event_log.close()
         assert (
             len(ep_eval_count) >= number_of_eval_episodes
         ), f"Expected {number_of_eval_episodes} episodes, got {len(ep_eval_count)}."
@@ -415,3 +459,5 @@ class HabitatMASEvaluator(Evaluator):
         metrics = {k: v for k, v in aggregated_stats.items() if k != "reward"}
         for k, v in metrics.items():
             writer.add_scalar(f"eval_metrics/{k}", v, step_id)
+
+        log_scene_load_stats(envs, writer, step_id, "eval_scenes")
@@ -4,6 +4,7 @@ import datetime
 import json
 import re
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional
 from hydra.core.hydra_config import HydraConfig
@@ -13,7 +14,7 @@ import numpy as np
 import torch
 from habitat_mas.agents.actions.discussion_actions import *
 from habitat_mas.utils import AgentArguments
-from habitat_mas.utils.models import OpenAIModel
+from habitat_mas.utils.models import OpenAIModel, chat_all
 
 from habitat_baselines.common.storage import Storage
 from habitat_baselines.common.tensor_dict import TensorDict
@@ -236,7 +237,19 @@ def group_discussion(
     should_robot_resume: bool = True, 
     should_numerical: bool = True,
     max_discussion_rounds = 3,
+    max_concurrency: Optional[int] = None,
+    chat_timeout: Optional[float] = None,
+    chat_event_log=None,
 ) -> dict[str, AgentArguments]:
+    """
+    Leader assigns subtasks to the robots, then discusses with them until all subtasks are feasible.
+    
+    Robot agents reflect on their subtasks concurrently in each round, at most max_concurrency 
+    at a time (all robots if None). chat_timeout is the timeout in seconds of each chat completions
+    request, not of a whole chat or discussion: a chat with client retries or tool call rounds 
+    sends several requests, each with this timeout. Robot responses are handled in the order of the leader assignment.
+    Chat histories are logged to chat_event_log if given, see OpenAIModel.
+    """
 
     ### 0. whether save chat history or not
     if save_chat_history:
@@ -294,6 +307,7 @@ def group_discussion(
         enable_logging=save_chat_history,
         logging_file = os.path.join(episode_save_dir, "leader_group_chat_history.json"),
         agent_name="leader",
+        event_log=chat_event_log,
     )
 
     ### 4. create robot agents, no chat yet
@@ -316,6 +330,7 @@ def group_discussion(
             enable_logging=save_chat_history,
             logging_file = os.path.join(episode_save_dir, f"{robot_key}_group_chat_history.json"),
             agent_name=robot_resume[robot_key]["robot_type"],
+            event_log=chat_event_log,
         )
 
     ### 5. leader get task and scene, assign initial subtask to robots
@@ -323,7 +338,7 @@ def group_discussion(
         task_description=task_description, 
         scene_description=scene_description
     )
-    response = leader.chat(leader_start_message)
+    response = leader.chat(leader_start_message, timeout=chat_timeout)
     robot_tasks = parse_leader_response(response)
     print("===============Scene Description==============")
     print(scene_description)
@@ -347,18 +362,29 @@ def group_discussion(
         return results
 
     ### 6. agent reflection based on assigned task from leader
-    for robot_id in robot_tasks:
-        robot_model = agents[robot_id]
-        robot_start_message = create_robot_start_message(
-            task_description=robot_tasks[robot_id],
-            scene_description=scene_description,
-            compute_path=compute_path,
+    def robots_reflect(robot_tasks):
+        robot_ids = list(robot_tasks)
+        robot_start_messages = [
+            create_robot_start_message(
+                task_description=robot_tasks[robot_id],
+                scene_description=scene_description,
+                compute_path=compute_path,
+            )
+            for robot_id in robot_ids
+        ]
+        responses = chat_all(
+            [agents[robot_id] for robot_id in robot_ids],
+            robot_start_messages,
+            max_concurrency=max_concurrency,
+            timeout=chat_timeout,
         )
-        response = robot_model.chat(robot_start_message)
-        agent_response[robot_id] = parse_agent_response(response)
-        print("===============Robot Response==============")
-        print(f"Robot {robot_id} response: {response}")
-        print("===========================================")
+        for robot_id, response in zip(robot_ids, responses):
+            agent_response[robot_id] = parse_agent_response(response)
+            print("===============Robot Response==============")
+            print(f"Robot {robot_id} response: {response}")
+            print("===========================================")
+
+    robots_reflect(robot_tasks)
 
     ### 7. leader refine task if not all_yes
     # TODO: modify the prompt and solve the task assign when not all_yes
@@ -378,24 +404,13 @@ def group_discussion(
             r"Each agent should still be described in the format: {robot_id||subtask_description}\n"
         )
 
-        response = leader.chat(prompt)
+        response = leader.chat(prompt, timeout=chat_timeout)
         robot_tasks = parse_leader_response(response)
 
         print("===============Leader Response==============")
         print(response)
         print("===========================================")
-        for robot_id in robot_tasks:
-            robot_model = agents[robot_id]
-            robot_start_message = create_robot_start_message(
-                task_description=robot_tasks[robot_id],
-                scene_description=scene_description,
-                compute_path=compute_path,
-            )
-            response = robot_model.chat(robot_start_message)
-            agent_response[robot_id] = parse_agent_response(response)
-            print("===============Robot Response==============")
-            print(f"Robot {robot_id} response: {response}")
-            print("===========================================")
+        robots_reflect(robot_tasks)
 
     results = {}
     for agent in agents:
@@ -415,10 +430,26 @@ def group_discussion(
     print(f"Leader token usage: {leader_tokens}")
     print(f"Robots token usage: {robot_tokens}")
     print(f"Total token usage: {total_tokens}")
+    if leader.cache is not None:
+        print(f"Chat cache: {leader.cache.stats()}")
     print("========================================================")
 
     return results
 
+def _run_all(fn: Callable, args_list: List[tuple], max_concurrency: Optional[int] = None) -> List[Any]:
+    """
+    Call fn(*args) for each args in args_list concurrently, at most max_concurrency
+    at a time (all of them if None). The results are returned in the order of args_list.
+    """
+    if len(args_list) <= 1 or max_concurrency == 1:
+        return [fn(*args) for args in args_list]
+
+    max_workers = len(args_list) if max_concurrency is None else min(max_concurrency, len(args_list))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="multi_llm") as executor:
+        futures = [executor.submit(fn, *args) for args in args_list]
+        return [future.result() for future in futures]
+
+
 ABLATION_MODE = {
     (True, True, True, True) : "FULL",
     (False, True, True, True) : "GROUP_DISCUSSION",
@@ -446,6 +477,13 @@ class MultiLLMPolicy(MultiPolicy):
         self.should_agent_reflection = kwargs.get("should_agent_reflection", True)
         self.should_robot_resume = kwargs.get("should_robot_resume", True)
         self.should_numerical = kwargs.get("should_numerical", True)
+        # concurrency of robot agent chats in group discussion
+        self.discussion_max_concurrency = kwargs.get("discussion_max_concurrency", None)
+        self.discussion_chat_timeout = kwargs.get("discussion_chat_timeout", None)
+        # number of environments running group discussion or agent initialization at the same time
+        self.env_max_concurrency = kwargs.get("env_max_concurrency", None)
+        # group discussion result of each environment, kept for the whole episode
+        self._envs_agent_arguments: List[Dict[str, AgentArguments]] = []
         self.ablation_mode = ABLATION_MODE[
             (
                 self.should_group_discussion, 
@@ -461,6 +499,11 @@ class MultiLLMPolicy(MultiPolicy):
     def on_envs_pause(self, envs_to_pause):
         for policy in self._active_policies:
             policy.on_envs_pause(envs_to_pause)
+        self._envs_agent_arguments = [
+            arguments
+            for i, arguments in enumerate(self._envs_agent_arguments)
+            if i not in envs_to_pause
+        ]
 
     def act(
         self,
@@ -476,6 +519,8 @@ class MultiLLMPolicy(MultiPolicy):
         # TODO: disable saving chat history for batch experiments
         save_chat_history = kwargs.get("save_chat_history", True)
         save_chat_history_dir = kwargs.get("save_chat_history_dir", "./chat_history_output")
+        # event log of the chat histories, opened and closed by the evaluator
+        chat_event_log = kwargs.get("chat_event_log", None)
         # Create a directory to save chat history
         if save_chat_history:
             # save dir format: chat_history_output/<date>/<config>/<episode_id>
@@ -500,88 +545,90 @@ class MultiLLMPolicy(MultiPolicy):
         )
         agent_masks = masks.split([1] * n_agents, -1)
         n_envs = prev_actions.shape[0]
-        assert n_envs == 1, "Currently, the stage 2 only supports single environment with multiple agents."
+        if len(self._envs_agent_arguments) != n_envs:
+            self._envs_agent_arguments = [{} for _ in range(n_envs)]
 
-        text_goal = observations["pddl_text_goal"][0].tolist()
-        text_goal = "".join([chr(code) for code in text_goal]).strip()
-        # text_goal = "Fill in a tank with water. The tank is 80cm high, 50cm wide, and 50cm deep. The tank is empty. agent_0 has a 1L backet and agent_1 has a 2L bucket. Use function call to compute how many time agent_1 and agent_2 needs to fill the tank to full."
-        # Stage 1: If all prev_actions are zero, which means it is the first step of the episode, then we need to do group discussion
+        # Stage 1: If all prev_actions of an env are zero, which means it is the first step of the episode,
+        # then we need to do group discussion. Envs starting on the same step discuss concurrently.
         # Given: Robot resume + Scene description + task instruction
         # Output: (Subtask decomposition) + task assignment
-        envs_agent_arguments = []
-        for i in range(n_envs):
-            env_prev_actions = prev_actions[i]
+        def env_group_discussion(i):
             env_text_context = envs_text_context[i]
-            # if no previous actions, then it is the first step of the episode
-            if not env_prev_actions.any():
-                if "robot_resume" in env_text_context:
-                    robot_resume = env_text_context["robot_resume"]
-                if "scene_description" in env_text_context:
-                    scene_description = env_text_context["scene_description"]
-                if "episode_id" in env_text_context:
-                    episode_id = env_text_context["episode_id"]
-                # print("===============Group Discussion===============")
-                # print(robot_resume)
-                # print("=============================================")
-                # print(scene_description)
-                # print("=============================================")
-                # print(text_goal)
-                # print("=============================================")
-                
-                agent_arguments = group_discussion(
-                    robot_resume, 
-                    scene_description, 
-                    text_goal, 
-                    should_group_discussion=self.should_group_discussion, 
-                    should_agent_reflection=self.should_agent_reflection,
-                    should_robot_resume=self.should_robot_resume, 
-                    should_numerical=self.should_numerical,
-                    save_chat_history=save_chat_history,
-                    save_chat_history_dir=save_chat_history_dir,
-                    episode_id=episode_id,
-                )
-                envs_agent_arguments.append(agent_arguments)
-                
-                # Invalidate all action policies and flag them to be reinitialized
-                for agent_i, policy in enumerate(self._active_policies):
-                    policy._high_level_policy.llm_agent.initialized = False
-                    
+            text_goal = observations["pddl_text_goal"][i].tolist()
+            text_goal = "".join([chr(code) for code in text_goal]).strip()
+            return group_discussion(
+                env_text_context["robot_resume"],
+                env_text_context["scene_description"],
+                text_goal,
+                should_group_discussion=self.should_group_discussion,
+                should_agent_reflection=self.should_agent_reflection,
+                should_robot_resume=self.should_robot_resume,
+                should_numerical=self.should_numerical,
+                save_chat_history=save_chat_history,
+                save_chat_history_dir=save_chat_history_dir,
+                episode_id=env_text_context.get("episode_id", -1),
+                max_concurrency=self.discussion_max_concurrency,
+                chat_timeout=self.discussion_chat_timeout,
+                chat_event_log=chat_event_log,
+            )
+
+        start_envs = [i for i in range(n_envs) if not prev_actions[i].any()]
+        start_envs_agent_arguments = _run_all(
+            env_group_discussion,
+            [(i,) for i in start_envs],
+            max_concurrency=self.env_max_concurrency,
+        )
+        for i, agent_arguments in zip(start_envs, start_envs_agent_arguments):
+            self._envs_agent_arguments[i] = agent_arguments
+            # Invalidate the action agents of the env and flag them to be reinitialized
+            for policy in self._active_policies:
+                policy._high_level_policy.llm_agents[i].initialized = False
+
+        # Initialize action execution agents with new context information, concurrently for all (env, agent)
+        def init_llm_agent(agent_i, i):
+            agent_i_handle = f"agent_{agent_i}"
+            args = self._envs_agent_arguments[i].get(agent_i_handle, None)
+            print("=================agent_task_assignment===================")
+            print(args)
+            episode_id = envs_text_context[i]["episode_id"]
+            episode_save_dir = os.path.join(save_chat_history_dir, str(episode_id))
+            logging_path = os.path.join(episode_save_dir, f"{agent_i_handle}_action_history.json")
+
+            llm_policy: LLMHighLevelPolicy = self._active_policies[agent_i]._high_level_policy
+            llm_policy.llm_agents[i].init_agent(
+                robot_type=args.robot_type,
+                task_description=args.task_description,
+                subtask_description=args.subtask_description,
+                chat_history=args.chat_history,
+                enable_logging=save_chat_history,
+                logging_file=logging_path,
+                event_log=chat_event_log,
+            )
+
+        _run_all(
+            init_llm_agent,
+            [
+                (agent_i, i)
+                for agent_i, policy in enumerate(self._active_policies)
+                for i in range(n_envs)
+                if not policy._high_level_policy.llm_agents[i].initialized
+            ],
+            max_concurrency=self.env_max_concurrency,
+        )
 
         # Stage 2: Individual policy actions
         agent_actions = []
         for agent_i, policy in enumerate(self._active_policies):
             # collect assigned tasks for agent_i across all envs
             agent_i_handle = f"agent_{agent_i}"
-            # Default 1 environment
             select_agent_arguments = [
-                arguments[agent_i_handle] if agent_i_handle in arguments else None
-                for arguments in envs_agent_arguments
+                arguments.get(agent_i_handle, None)
+                for arguments in self._envs_agent_arguments
             ]
             agent_obs = self._update_obs_with_agent_prefix_fn(observations, agent_i)
 
-            # TODO: Currently, the stage 2 only supports single environment with multiple agents.
-            # TODO: Please update the code of agent initialization and policy action to support vectorized environment.
-            # Initialize action execution agent with new context information
-            policy: HierarchicalPolicy
-            llm_policy: LLMHighLevelPolicy = policy._high_level_policy
-            if not llm_policy.llm_agent.initialized:
-                print("=================agent_task_assignment===================")
-                args = select_agent_arguments[0]
-                print(args)
-                episode_id = envs_text_context[0]["episode_id"]
-                episode_save_dir = os.path.join(save_chat_history_dir, str(episode_id))
-                logging_path = os.path.join(episode_save_dir, f"{agent_i_handle}_action_history.json")
-                
-                llm_policy.llm_agent.init_agent(
-                    robot_type=args.robot_type,
-                    task_description=args.task_description,
-                    subtask_description=args.subtask_description,
-                    chat_history=args.chat_history,
-                    enable_logging=save_chat_history,
-                    logging_file=logging_path,
-                )
-
             # Run the policy
+            policy: HierarchicalPolicy
             agent_actions.append(
                 policy.act(
                     agent_obs,
@@ -595,18 +642,17 @@ class MultiLLMPolicy(MultiPolicy):
             )
 
         if self.should_terminate_on_wait:
-            should_terminate = True
-            for agent_id, agent_action in enumerate(agent_actions):
-                wait_id = self._active_policies[agent_id]._name_to_idx['wait']
-                if agent_action.skill_id != wait_id:
-                    should_terminate = False
-                    break
-            if should_terminate:
-                print("=================Terminate=================")
-                print("All agents are waiting for next action.")
-                print("===========================================")
-                for agent_i, policy in enumerate(self._active_policies):
-                    agent_actions[agent_i].actions[i, policy._stop_action_idx] = 1.0
+            for i in range(n_envs):
+                should_terminate = all(
+                    policy._cur_skills[i] == policy._name_to_idx["wait"]
+                    for policy in self._active_policies
+                )
+                if should_terminate:
+                    print("=================Terminate=================")
+                    print(f"All agents are waiting for next action in env {i}.")
+                    print("===========================================")
+                    for agent_i, policy in enumerate(self._active_policies):
+                        agent_actions[agent_i].actions[i, policy._stop_action_idx] = 1.0
 
         policy_info = _merge_list_dict(
             [ac.policy_info for ac in agent_actions]
@@ -793,6 +839,9 @@ class MultiLLMPolicy(MultiPolicy):
         kwargs["should_agent_reflection"] = config.habitat.dataset.should_agent_reflection
         kwargs["should_robot_resume"] = config.habitat.dataset.should_robot_resume
         kwargs["should_numerical"] = config.habitat.dataset.should_numerical
+        kwargs["discussion_max_concurrency"] = config.habitat.dataset.get("discussion_max_concurrency", None)
+        kwargs["discussion_chat_timeout"] = config.habitat.dataset.get("discussion_chat_timeout", None)
+        kwargs["env_max_concurrency"] = config.habitat.dataset.get("env_max_concurrency", None)
 
         return cls(update_obs_with_agent_prefix_fn, **kwargs)
 
@@ -418,6 +418,7 @@ class MultiStorage(Storage):
         rewards=None,
         buffer_index=0,
         next_masks=None,
+        valid_masks=None,
         **kwargs,
     ):
         n_agents = len(self._active_storages)
@@ -468,6 +469,7 @@ class MultiStorage(Storage):
                 rewards=rewards,
                 buffer_index=buffer_index,
                 next_masks=next_masks,
+                valid_masks=valid_masks,
                 **{
                     k: v[agent_i] if v is not None else v
                     for k, v in insert_d.items()
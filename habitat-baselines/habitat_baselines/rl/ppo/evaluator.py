@@ -5,7 +5,8 @@ import torch
 from numpy import ndarray
 from torch import Tensor
 
-from habitat import VectorEnv
+from habitat import VectorEnv, logger
+from habitat.core.scene_scheduler import aggregate_scene_load_stats
 from habitat_baselines.common.env_spec import EnvironmentSpec
 from habitat_baselines.common.obs_transformers import ObservationTransformer
 from habitat_baselines.common.tensorboard_utils import TensorboardWriter
@@ -99,3 +100,59 @@ def pause_envs(
         batch,
         rgb_frames,
     )
+
+
+def reassign_envs_scenes(
+    envs_to_pause: List[int],
+    envs: VectorEnv,
+    dones: List[bool],
+    observations: List[Any],
+) -> List[int]:
+    r"""Gives the scenes that the scene scheduler of :p:`envs` did not assign
+    yet to the environments that ran out of episodes, instead of pausing
+    them. Only environments whose episode just ended are reassigned.
+
+    :param envs_to_pause: environments that ran out of episodes. The
+        reassigned environments are removed from it.
+    :param envs: vectorized environments with a ``scene_scheduler``.
+    :param dones: whether the episode of each environment just ended.
+    :param observations: observations of each environment, the ones of the
+        reassigned environments are replaced by the first observations in
+        their new scenes.
+    :return: the reassigned environments.
+    """
+    reassigned: List[int] = []
+    if envs.scene_scheduler is None:
+        return reassigned
+    for idx in list(envs_to_pause):
+        if not dones[idx]:
+            continue
+        scenes = envs.scene_scheduler.next_scenes()
+        if scenes is None:
+            break
+        envs.call_at(idx, "set_content_scenes", {"content_scenes": scenes})
+        observations[idx] = envs.post_step(envs.reset_at(idx))[0]
+        envs_to_pause.remove(idx)
+        reassigned.append(idx)
+    return reassigned
+
+
+def log_scene_load_stats(
+    envs: VectorEnv, writer: TensorboardWriter, step_id: int, prefix: str
+) -> None:
+    r"""Logs the scene switches and the mean load time of each scene of all
+    the environments, including the paused ones. Does nothing if the scenes
+    of :p:`envs` are not assigned by a scene scheduler.
+    """
+    if envs.scene_scheduler is None:
+        return
+    envs.resume_all()
+    stats = aggregate_scene_load_stats(
+        envs.call(["scene_load_stats"] * envs.num_envs)
+    )
+    logger.info(
+        f"Scene switches: {int(stats['scene_switches'])}\t"
+        f"Scene loads: {int(stats['scene_loads'])}"
+    )
+    for k, v in stats.items():
+        writer.add_scalar(f"{prefix}/{k}", v, step_id)
@@ -16,7 +16,12 @@ from habitat.utils.visualizations.utils import (
 from habitat_baselines.common.obs_transformers import (
     apply_obs_transforms_batch,
 )
-from habitat_baselines.rl.ppo.evaluator import Evaluator, pause_envs
+from habitat_baselines.rl.ppo.evaluator import (
+    Evaluator,
+    log_scene_load_stats,
+    pause_envs,
+    reassign_envs_scenes,
+)
 from habitat_baselines.utils.common import (
     batch_obs,
     generate_video,
@@ -105,10 +110,17 @@ class HabitatEvaluator(Evaluator):
 
         number_of_eval_episodes = config.habitat_baselines.test_episode_count
         evals_per_ep = config.habitat_baselines.eval.evals_per_ep
+        num_pending_episodes = (
+            0
+            if envs.scene_scheduler is None
+            else envs.scene_scheduler.num_pending_episodes
+        )
         if number_of_eval_episodes == -1:
-            number_of_eval_episodes = sum(envs.number_of_episodes)
+            number_of_eval_episodes = (
+                sum(envs.number_of_episodes) + num_pending_episodes
+            )
         else:
-            total_num_eps = sum(envs.number_of_episodes)
+            total_num_eps = sum(envs.number_of_episodes) + num_pending_episodes
             # if total_num_eps is negative, it means the number of evaluation episodes is unknown
             if total_num_eps < number_of_eval_episodes and total_num_eps > 1:
                 logger.warn(
@@ -298,6 +310,21 @@ class HabitatEvaluator(Evaluator):
                             current_episodes_info[i].episode_id,
                         )
 
+            reassigned = reassign_envs_scenes(
+                envs_to_pause, envs, dones, observations
+            )
+            if len(reassigned) > 0:
+                batch = batch_obs(observations, device=device)  # type: ignore
+                batch = apply_obs_transforms_batch(batch, obs_transforms)  # type: ignore
+                if rgb_frames is not None:
+                    # Restart the videos from the first frame in the new scene
+                    for i in reassigned:
+                        rgb_frames[i] = [
+                            observations_to_image(
+                                {k: v[i] for k, v in batch.items()}, {}, config, 0,
+                            )
+                        ]
+
             not_done_masks = not_done_masks.to(device=device)
             (
                 envs,
@@ -349,3 +376,5 @@ class HabitatEvaluator(Evaluator):
         metrics = {k: v for k, v in aggregated_stats.items() if k != "reward"}
         for k, v in metrics.items():
             writer.add_scalar(f"eval_metrics/{k}", v, step_id)
+
+        log_scene_load_stats(envs, writer, step_id, "eval_scenes")
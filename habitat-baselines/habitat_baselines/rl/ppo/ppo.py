@@ -141,16 +141,20 @@ class PPO(nn.Module, Updater):
             rollouts.buffers["returns"]  # type: ignore
             - rollouts.buffers["value_preds"]
         )
+        # Steps that are not environment transitions get no advantage.
+        invalid = torch.logical_not(rollouts.buffers["valid_masks"])
         if not self.use_normalized_advantage:
-            return advantages
+            return advantages.masked_fill_(invalid, 0.0)
 
         var, mean = self._compute_var_mean(
-            advantages[torch.isfinite(advantages)]
+            advantages[torch.isfinite(advantages) & ~invalid]
         )
 
         advantages -= mean
 
-        return advantages.mul_(torch.rsqrt(var + EPS_PPO))
+        return advantages.mul_(torch.rsqrt(var + EPS_PPO)).masked_fill_(
+            invalid, 0.0
+        )
 
     @staticmethod
     def _compute_var_mean(x):
@@ -222,6 +226,9 @@ class PPO(nn.Module, Updater):
         value_loss = 0.5 * F.mse_loss(
             values, batch["returns"], reduction="none"
         )
+        if "valid_masks" in batch:
+            # No value target for steps that are not environment transitions
+            value_loss = value_loss * batch["valid_masks"]
 
         if "is_coeffs" in batch:
             assert isinstance(batch["is_coeffs"], torch.Tensor)
@@ -20,6 +20,8 @@ import habitat_baselines.rl.multi_agent  # noqa: F401.
 from habitat import VectorEnv, logger
 from habitat.config import read_write
 from habitat.config.default import get_agent_config
+from habitat.core.scene_scheduler import aggregate_scene_load_stats
+from habitat.core.vector_env import RESET_DEFERRED_KEY
 from habitat.utils import profiling_wrapper
 from habitat_baselines.common import VectorEnvFactory
 from habitat_baselines.common.base_trainer import BaseRLTrainer
@@ -414,6 +416,11 @@ class PPOTrainer(BaseRLTrainer):
             observations, rewards_l, dones, infos = [
                 list(x) for x in zip(*outputs)
             ]
+            # Set by the envs with async resets, on the step returning the
+            # first observations of an episode
+            resets_deferred = [
+                info.pop(RESET_DEFERRED_KEY, False) for info in infos
+            ]
 
         with g_timer.avg_time("trainer.update_stats"):
             observations = self.envs.post_step(observations)
@@ -464,6 +471,16 @@ class PPOTrainer(BaseRLTrainer):
                 done_masks, 0.0
             )
 
+            # The action taken from the terminal observations of an env with
+            # a deferred reset did not lead to the new episode, so do not
+            # bootstrap across it and do not train on that step.
+            valid_masks = torch.tensor(
+                [[not deferred] for deferred in resets_deferred],
+                dtype=torch.bool,
+                device=not_done_masks.device,
+            )
+            not_done_masks = torch.logical_and(not_done_masks, valid_masks)
+
         if self._is_static_encoder:
             with inference_mode(), g_timer.avg_time("trainer.visual_features"):
                 batch[
@@ -475,6 +492,7 @@ class PPOTrainer(BaseRLTrainer):
             rewards=rewards,
             next_masks=not_done_masks,
             buffer_index=buffer_index,
+            valid_masks=valid_masks,
         )
 
         self._agent.rollouts.advance_rollout(buffer_index)
@@ -620,6 +638,17 @@ class PPOTrainer(BaseRLTrainer):
                 f"Num updates: {self.num_updates_done}\tNum frames {self.num_steps_done}"
             )
 
+            if self.envs.scene_scheduler is not None:
+                scene_stats = aggregate_scene_load_stats(
+                    self.envs.call(["scene_load_stats"] * self.envs.num_envs)
+                )
+                for k, v in scene_stats.items():
+                    writer.add_scalar(f"scenes/{k}", v, self.num_steps_done)
+                logger.info(
+                    f"Scene switches: {int(scene_stats['scene_switches'])}\t"
+                    f"Scene loads: {int(scene_stats['scene_loads'])}"
+                )
+
             logger.info(
                 "Average window size: {}  {}".format(
                     len(self.window_episode_stats["count"]),
@@ -868,6 +897,11 @@ class PPOTrainer(BaseRLTrainer):
                                         render_view.uuid
                                     )
 
+        # The evaluators expect the observations of the next episode on the
+        # step that ends an episode
+        with read_write(config):
+            config.habitat_baselines.async_reset_done = False
+
         if config.habitat_baselines.verbose:
             logger.info(f"env config: {OmegaConf.to_yaml(config)}")
 
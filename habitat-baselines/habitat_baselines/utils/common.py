@@ -6,6 +6,7 @@
 
 import glob
 import math
+import mmap
 import numbers
 import os
 import re
@@ -190,6 +191,41 @@ def linear_decay(epoch: int, total_num_updates: int) -> float:
     return 1 - (epoch / float(total_num_updates))
 
 
+def _as_batch_view(arrays: List[Any]) -> Optional[np.ndarray]:
+    r"""Returns the arrays stacked without copying if they are consecutive,
+    equally shaped slices of the same memory-mapped buffer, like the
+    observations :ref:`habitat.VectorEnv` reads from shared memory.
+    Returns None otherwise.
+    """
+    first = arrays[0]
+    if (
+        not isinstance(first, np.ndarray)
+        or not isinstance(first.base, np.ndarray)
+        or not isinstance(first.base.base, mmap.mmap)
+        or not first.flags.c_contiguous
+        or first.nbytes == 0
+    ):
+        return None
+
+    start = first.__array_interface__["data"][0]
+    for i, arr in enumerate(arrays):
+        if (
+            not isinstance(arr, np.ndarray)
+            or arr.base is not first.base
+            or arr.shape != first.shape
+            or arr.dtype != first.dtype
+            or not arr.flags.c_contiguous
+            or arr.__array_interface__["data"][0] != start + i * first.nbytes
+        ):
+            return None
+
+    return np.lib.stride_tricks.as_strided(
+        first,
+        shape=(len(arrays), *first.shape),
+        strides=(first.nbytes, *first.strides),
+    )
+
+
 @attr.s(auto_attribs=True, slots=True)
 class _ObservationBatchingCache(metaclass=Singleton):
     r"""Helper for batching observations that maintains a cpu-side tensor
@@ -269,7 +305,19 @@ class _ObservationBatchingCache(metaclass=Singleton):
         )
 
         batched_tensors = []
-        for sensor_name, obs in zip(observation_keys, observation_tensors[0]):
+        # Sensors already stacked in shared memory are used as is
+        batch_view_idxs = set()
+        for idx, (sensor_name, obs) in enumerate(
+            zip(observation_keys, observation_tensors[0])
+        ):
+            batch_view = _as_batch_view(
+                [all_obs[idx] for all_obs in observation_tensors]
+            )
+            if batch_view is not None:
+                batched_tensors.append(batch_view)
+                batch_view_idxs.add(idx)
+                continue
+
             batched_tensors.append(
                 self.get(
                     len(observations),
@@ -280,20 +328,21 @@ class _ObservationBatchingCache(metaclass=Singleton):
             )
 
         for idx in upload_ordering:
-            for i, all_obs in enumerate(observation_tensors):
-                obs = all_obs[idx]
-                # Use isinstance(sensor, np.ndarray) here instead of
-                # np.asarray as this is quickier for the more common
-                # path of sensor being an np.ndarray
-                # np.asarray is ~3x slower than checking
-                if isinstance(obs, np.ndarray):
-                    batched_tensors[idx][i] = obs  # type: ignore
-                elif isinstance(obs, torch.Tensor):
-                    batched_tensors[idx][i].copy_(obs, non_blocking=True)  # type: ignore
-                # If the sensor wasn't a tensor, then it's some CPU side data
-                # so use a numpy array
-                else:
-                    batched_tensors[idx][i] = np.asarray(obs)  # type: ignore
+            if idx not in batch_view_idxs:
+                for i, all_obs in enumerate(observation_tensors):
+                    obs = all_obs[idx]
+                    # Use isinstance(sensor, np.ndarray) here instead of
+                    # np.asarray as this is quickier for the more common
+                    # path of sensor being an np.ndarray
+                    # np.asarray is ~3x slower than checking
+                    if isinstance(obs, np.ndarray):
+                        batched_tensors[idx][i] = obs  # type: ignore
+                    elif isinstance(obs, torch.Tensor):
+                        batched_tensors[idx][i].copy_(obs, non_blocking=True)  # type: ignore
+                    # If the sensor wasn't a tensor, then it's some CPU side data
+                    # so use a numpy array
+                    else:
+                        batched_tensors[idx][i] = np.asarray(obs)  # type: ignore
 
             # With the batching cache, we use pinned mem
             # so we can start the move to the GPU async
@@ -319,7 +368,8 @@ def batch_obs(
     device: Optional[torch.device] = None,
 ) -> TensorDict:
     r"""Transpose a batch of observation dicts to a dict of batched
-    observations.
+    observations. Sensors that :ref:`habitat.VectorEnv` read from shared
+    memory for all the environments are batched without copying.
 
     Args:
         observations:  list of dicts of observations.
@@ -502,6 +502,9 @@ class OracleNavActionConfig(ActionConfig):
     allow_back: bool = True
     spawn_max_dist_to_obj: float = 2.0
     num_spawn_attempts: int = 200
+    # The path to the target is reused while the agent stays within this
+    # distance of it, and searched again otherwise
+    path_cache_tolerance: float = 0.2
     # For social nav training only. It controls the distance threshold
     # between the robot and the human and decide if the human wants to walk or not
     human_stop_and_walk_to_robot_distance_threshold: float = -1.0
@@ -4,6 +4,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import copy
 import random
 import time
 from typing import (
@@ -20,7 +21,6 @@ from typing import (
 
 import os
 import gym
-import json
 import numba
 import numpy as np
 from gym import spaces
@@ -33,6 +33,7 @@ from habitat.datasets import make_dataset
 from habitat.sims import make_sim
 from habitat.tasks.registration import make_task
 from habitat.utils import profiling_wrapper
+from habitat.utils.event_log import EventLog
 
 if TYPE_CHECKING:
     from omegaconf import DictConfig
@@ -75,6 +76,8 @@ class Env:
     _episode_over: bool
     _episode_from_iter_on_reset: bool
     _episode_force_changed: bool
+    _loaded_scene_id: Optional[str]
+    _scene_load_stats: Dict[str, Any]
 
     def __init__(
         self, config: "DictConfig", dataset: Optional[Dataset[Episode]] = None
@@ -102,6 +105,14 @@ class Env:
         self._episode_iterator = None
         self._episode_from_iter_on_reset = True
         self._episode_force_changed = False
+        self._loaded_scene_id = None
+        self._scene_load_stats = {
+            "scene_switches": 0,
+            "scene_loads": {},
+            "scene_load_time": {},
+        }
+        # event log of the episode logs, opened on the first one
+        self._event_log: Optional[EventLog] = None
 
         # load the first scene if dataset is present
         if self._dataset:
@@ -120,9 +131,14 @@ class Env:
         else:
             self.number_of_episodes = None
 
+        load_start_time = time.time()
         self._sim = make_sim(
             id_sim=self._config.simulator.type, config=self._config.simulator
         )
+        if self._current_episode is not None:
+            self._record_scene_load(
+                self.current_episode.scene_id, time.time() - load_start_time
+            )
 
         self._task = make_task(
             self._config.task.type,
@@ -203,6 +219,40 @@ class Env:
         self._episode_force_changed = True
         self._episode_from_iter_on_reset = True
 
+    def set_content_scenes(self, content_scenes: List[str]) -> int:
+        r"""Replaces the episodes with the episodes of :p:`content_scenes`
+        in the dataset of the config. Used to hand new scenes to a worker
+        without restarting it.
+
+        :param content_scenes: names of the scenes to load the episodes of.
+        :return: the new number of episodes.
+        """
+        with read_write(self._config):
+            self._config.dataset.content_scenes = list(content_scenes)
+        dataset = make_dataset(
+            id_dataset=self._config.dataset.type, config=self._config.dataset
+        )
+        self.episodes = dataset.episodes
+        self.number_of_episodes = len(self.episodes)
+        return self.number_of_episodes
+
+    @property
+    def scene_load_stats(self) -> Dict[str, Any]:
+        r"""Number of scene switches, and number of loads and total load
+        time in seconds of each scene, since the environment was created.
+        """
+        return copy.deepcopy(self._scene_load_stats)
+
+    def _record_scene_load(self, scene_id: str, load_time: float) -> None:
+        if self._loaded_scene_id is not None:
+            self._scene_load_stats["scene_switches"] += 1
+        self._loaded_scene_id = scene_id
+        scene = Dataset.scene_from_scene_path(scene_id)
+        loads = self._scene_load_stats["scene_loads"]
+        loads[scene] = loads.get(scene, 0) + 1
+        load_times = self._scene_load_stats["scene_load_time"]
+        load_times[scene] = load_times.get(scene, 0.0) + load_time
+
     @property
     def sim(self) -> Simulator:
         return self._sim
@@ -270,7 +320,12 @@ class Env:
         self._episode_force_changed = False
 
         assert self._current_episode is not None, "Reset requires an episode"
+        load_start_time = time.time()
         self.reconfigure(self._config)
+        if self.current_episode.scene_id != self._loaded_scene_id:
+            self._record_scene_load(
+                self.current_episode.scene_id, time.time() - load_start_time
+            )
 
         observations = self.task.reset(episode=self.current_episode)
         self._task.measurements.reset_measures(
@@ -314,26 +369,17 @@ class Env:
         log_file_path = os.path.join(log_dir_path, f"{dataset_name}_steps_log.json")
         subgoal_file_path = os.path.join(log_dir_path, f"{dataset_name}_subgoals.json")
 
-        if not os.path.exists(log_dir_path):
-            os.makedirs(log_dir_path)
-            with open(log_file_path, 'w') as f:
-                json.dump({}, f)
-            with open(subgoal_file_path, 'w') as f:
-                json.dump({}, f)
-
-        with open(log_file_path, 'r') as f:
-            log_data = json.load(f)
-        with open(subgoal_file_path, 'r') as f:
-            subgoal_data = json.load(f)
-        
-        log_data[f"episode_id: {episode_data['episode_id']}"] = f"num_steps: {episode_data['num_steps']}"
+        # appended to the event log of the output dir, the json files are
+        # rebuilt periodically and when the env is closed
+        if self._event_log is None:
+            self._event_log = EventLog(os.path.join(log_dir_path, "event_log"))
+        event_log = self._event_log
+        episode_key = f"episode_id: {episode_data['episode_id']}"
+        event_log.json_update(
+            log_file_path, episode_key, f"num_steps: {episode_data['num_steps']}"
+        )
         stage_goal = self._task.measurements.measures['pddl_stage_goals'].get_metric()
-        subgoal_data[f"episode_id: {episode_data['episode_id']}"] = stage_goal
-        with open(subgoal_file_path, 'w') as f:
-            json.dump(subgoal_data, f, indent=4)
-
-        with open(log_file_path, 'w') as f:
-            json.dump(log_data, f, indent=4)
+        event_log.json_update(subgoal_file_path, episode_key, stage_goal)
 
     def step(
         self, action: Union[int, str, Dict[str, Any]], **kwargs
@@ -402,6 +448,8 @@ class Env:
 
     def close(self) -> None:
         self._sim.close()
+        if self._event_log is not None:
+            self._event_log.close()
 
     def __enter__(self):
         return self
@@ -457,6 +505,15 @@ class RLEnv(gym.Env):
     def episodes(self, episodes: List[Episode]) -> None:
         self._env.episodes = episodes
 
+    def set_content_scenes(self, content_scenes: List[str]) -> int:
+        r"""See :ref:`Env.set_content_scenes`."""
+        self.number_of_episodes = self._env.set_content_scenes(content_scenes)
+        return self.number_of_episodes
+
+    @property
+    def scene_load_stats(self) -> Dict[str, Any]:
+        return self._env.scene_load_stats
+
     def current_episode(self, all_info: bool = False) -> BaseEpisode:
         r"""Returns the current episode of the environment.
 
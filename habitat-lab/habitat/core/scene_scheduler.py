@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+r"""Scene-aware assignment of episodes to the workers of a
+:ref:`habitat.core.vector_env.VectorEnv`.
+
+Loading a scene is usually much more expensive than resetting an episode in
+an already loaded scene. :ref:`SceneAffinityScheduler` hands whole scenes
+to workers so that each scene is loaded by as few workers as possible, and
+balances the workers by the estimated cost of their scenes.
+"""
+
+import heapq
+from collections import defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+)
+
+if TYPE_CHECKING:
+    from habitat.core.dataset import Dataset, Episode
+
+
+class SceneAffinityScheduler:
+    r"""Assigns groups of scenes to :ref:`VectorEnv` workers.
+
+    The cost of a scene is the cost of loading it plus the estimated cost of
+    its episodes. Scenes are assigned with the longest-processing-time-first
+    rule: the costliest remaining scene goes to the least loaded worker.
+
+    With :p:`dynamic`, which is meant for evaluation where every episode
+    is run once, each worker starts with a single scene and the other
+    scenes are kept in a pool. Workers that run out of episodes take the
+    costliest pooled scene with :ref:`next_scenes`, so the workers finish
+    at about the same time however wrong the cost estimates are.
+
+    When there are fewer scenes than workers, every worker gets one scene
+    and the costliest scenes are shared by more workers, so that no worker
+    switches scenes.
+    """
+
+    def __init__(
+        self,
+        scene_costs: Dict[str, float],
+        num_workers: int,
+        scene_num_episodes: Optional[Dict[str, int]] = None,
+        dynamic: bool = False,
+    ) -> None:
+        r"""Constructor
+
+        :param scene_costs: estimated cost of each scene.
+        :param num_workers: number of workers to assign the scenes to.
+        :param scene_num_episodes: number of episodes of each scene, used to
+            count the episodes that are not assigned yet.
+        :param dynamic: keep the scenes that do not fit in the first
+            assignment for the workers that finish first.
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers must be strictly positive")
+        if len(scene_costs) == 0:
+            raise ValueError("No scenes to schedule")
+
+        self._scene_costs = dict(scene_costs)
+        self._scene_num_episodes = dict(scene_num_episodes or {})
+        # Costliest scenes first, the name makes the order deterministic.
+        scenes = sorted(
+            self._scene_costs, key=lambda s: (-self._scene_costs[s], s)
+        )
+        if dynamic:
+            num_workers = min(num_workers, len(scenes))
+            self._assignments = [[s] for s in scenes[:num_workers]]
+            # Reversed so that the costliest scene is popped first.
+            self._pool = scenes[num_workers:][::-1]
+        elif len(scenes) < num_workers:
+            self._assignments = self._share_scenes(scenes, num_workers)
+            self._pool = []
+        else:
+            self._assignments = self._balance_scenes(scenes, num_workers)
+            self._pool = []
+
+    @classmethod
+    def from_dataset(
+        cls,
+        dataset: "Dataset",
+        num_workers: int,
+        scene_load_cost: float = 0.0,
+        episode_cost_fn: Optional[Callable[["Episode"], float]] = None,
+        dynamic: bool = False,
+    ) -> "SceneAffinityScheduler":
+        r"""Creates a scheduler for the scenes of :p:`dataset`.
+
+        :param dataset: dataset with the episodes to schedule.
+        :param num_workers: number of workers to assign the scenes to.
+        :param scene_load_cost: cost of loading a scene, in the same unit as
+            the episode costs.
+        :param episode_cost_fn: estimated cost of an episode. Every episode
+            costs 1 if not provided.
+        :param dynamic: see :ref:`SceneAffinityScheduler`.
+        """
+        scene_costs: Dict[str, float] = defaultdict(lambda: scene_load_cost)
+        scene_num_episodes: Dict[str, int] = defaultdict(int)
+        episodes = dataset.episodes
+        if episode_cost_fn is None:
+            # Only the scenes are needed, lazily loaded episodes provide
+            # them without being decoded.
+            episodes = getattr(episodes, "refs", episodes)
+        for episode in episodes:
+            scene = dataset.scene_from_scene_path(episode.scene_id)
+            scene_costs[scene] += (
+                1.0 if episode_cost_fn is None else episode_cost_fn(episode)
+            )
+            scene_num_episodes[scene] += 1
+        return cls(
+            scene_costs,
+            num_workers,
+            scene_num_episodes=scene_num_episodes,
+            dynamic=dynamic,
+        )
+
+    def _balance_scenes(
+        self, scenes: Sequence[str], num_workers: int
+    ) -> List[List[str]]:
+        # Heap of (load, worker index) to find the least loaded worker.
+        loads = [(0.0, i) for i in range(num_workers)]
+        assignments: List[List[str]] = [[] for _ in range(num_workers)]
+        for scene in scenes:
+            load, worker = heapq.heappop(loads)
+            assignments[worker].append(scene)
+            heapq.heappush(loads, (load + self._scene_costs[scene], worker))
+        return assignments
+
+    def _share_scenes(
+        self, scenes: Sequence[str], num_workers: int
+    ) -> List[List[str]]:
+        # Every scene gets one worker, the other workers go to the scenes
+        # with the highest cost per worker.
+        num_scene_workers = {scene: 1 for scene in scenes}
+        shares = [(-self._scene_costs[s], s) for s in scenes]
+        heapq.heapify(shares)
+        for _ in range(num_workers - len(scenes)):
+            _, scene = heapq.heappop(shares)
+            num_scene_workers[scene] += 1
+            heapq.heappush(
+                shares,
+                (-self._scene_costs[scene] / num_scene_workers[scene], scene),
+            )
+        return [
+            [scene]
+            for scene in scenes
+            for _ in range(num_scene_workers[scene])
+        ]
+
+    @property
+    def num_workers(self) -> int:
+        r"""Number of workers of the assignment. In :p:`dynamic` mode, this
+        is at most the number of scenes.
+        """
+        return len(self._assignments)
+
+    @property
+    def assignments(self) -> List[List[str]]:
+        r"""The initial scenes of each worker."""
+        return [list(scenes) for scenes in self._assignments]
+
+    @property
+    def num_pending_scenes(self) -> int:
+        r"""Number of scenes that are not assigned to a worker yet."""
+        return len(self._pool)
+
+    @property
+    def num_pending_episodes(self) -> int:
+        r"""Number of episodes of the scenes that are not assigned to a
+        worker yet.
+        """
+        return sum(self._scene_num_episodes.get(s, 0) for s in self._pool)
+
+    def next_scenes(self) -> Optional[List[str]]:
+        r"""Takes the costliest scene that is not assigned yet.
+
+        :return: the scenes for a worker that finished its episodes, or
+            :py:`None` if all the scenes are assigned.
+        """
+        if len(self._pool) == 0:
+            return None
+        return [self._pool.pop()]
+
+
+def aggregate_scene_load_stats(
+    stats: Sequence[Dict[str, Any]]
+) -> Dict[str, float]:
+    r"""Aggregates the :ref:`habitat.core.env.Env.scene_load_stats` of
+    several environments.
+
+    :param stats: scene load stats of each environment.
+    :return: the total number of scene switches and scene loads, and the
+        mean load time in seconds of each scene under
+        ``scene_load_time/<scene>``.
+    """
+    num_loads: Dict[str, int] = defaultdict(int)
+    load_time: Dict[str, float] = defaultdict(float)
+    for env_stats in stats:
+        for scene, count in env_stats["scene_loads"].items():
+            num_loads[scene] += count
+        for scene, seconds in env_stats["scene_load_time"].items():
+            load_time[scene] += seconds
+
+    aggregated = {
+        "scene_switches": float(sum(s["scene_switches"] for s in stats)),
+        "scene_loads": float(sum(num_loads.values())),
+    }
+    for scene in sorted(num_loads):
+        aggregated[f"scene_load_time/{scene}"] = (
+            load_time[scene] / num_loads[scene]
+        )
+    return aggregated
@@ -6,6 +6,7 @@
 
 import signal
 import warnings
+from multiprocessing import shared_memory
 from multiprocessing.connection import Connection
 from multiprocessing.context import BaseContext
 from queue import Queue
@@ -35,6 +36,7 @@ import habitat
 from habitat.core.batch_rendering.env_batch_renderer import EnvBatchRenderer
 from habitat.core.env import Env, RLEnv
 from habitat.core.logging import logger
+from habitat.core.scene_scheduler import SceneAffinityScheduler
 from habitat.core.utils import tile_images
 from habitat.gym.gym_env_episode_count_wrapper import EnvCountEpisodeWrapper
 from habitat.gym.gym_env_obs_dict_wrapper import EnvObsDictWrapper
@@ -65,6 +67,7 @@ RENDER_COMMAND = "render"
 CLOSE_COMMAND = "close"
 CALL_COMMAND = "call"
 COUNT_EPISODES_COMMAND = "count_episodes"
+SHARED_MEMORY_COMMAND = "shared_memory"
 
 EPISODE_OVER_NAME = "episode_over"
 GET_METRICS_NAME = "get_metrics"
@@ -74,6 +77,10 @@ ACTION_SPACE_NAME = "action_space"
 ORIG_ACTION_SPACE_NAME = "original_action_space"
 OBSERVATION_SPACE_NAME = "observation_space"
 
+# Info key set to True by the step that returns the observations of a reset
+# deferred by the previous step, see the async_reset_done of VectorEnv
+RESET_DEFERRED_KEY = "reset_deferred"
+
 
 def _make_env_fn(
     config: "DictConfig",
@@ -132,6 +139,135 @@ class _WriteWrapper:
         self.read_wrapper.is_waiting = True
 
 
+@attr.s(auto_attribs=True, slots=True)
+class _SharedObservations:
+    r"""Observations sent by a worker whose fixed-shape sensors were written
+    to the shared memory buffers instead of the connection. The written
+    sensors are :py:`None` in :py:`observations` and are read from slot
+    :py:`slot` of the buffers.
+    """
+    observations: Dict[str, Any]
+    slot: int
+    keys: List[str]
+
+
+class _SharedObservationBuffers:
+    r"""Shared memory ring buffers for the fixed-shape sensors of the
+    observations of a :ref:`VectorEnv`.
+
+    Each :ref:`spaces.Box` sensor has a buffer of shape
+    :py:`(num_slots, num_envs, *sensor_shape)`. Every step, a worker writes
+    its observations in the next slot of its ring, so the observations read
+    by the main process stay valid for :py:`num_slots - 1` more steps. The
+    observations of the envs stepped together are contiguous in a slot, which
+    lets :ref:`habitat_baselines.utils.common.batch_obs` batch them without
+    copying.
+    """
+
+    def __init__(
+        self,
+        spec: Dict[str, Tuple[str, Tuple[int, ...], str]],
+        num_slots: int,
+        create: bool = False,
+    ) -> None:
+        self.spec = spec
+        self.num_slots = num_slots
+        self._create = create
+        self._next_slot = 0
+        self._shms: List[shared_memory.SharedMemory] = []
+        self.buffers: Dict[str, np.ndarray] = {}
+        for key, (name, shape, dtype) in spec.items():
+            shm = shared_memory.SharedMemory(
+                name=name,
+                create=create,
+                size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1),
+            )
+            self._shms.append(shm)
+            self.buffers[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(
+        cls,
+        observation_spaces: List[spaces.Dict],
+        num_envs: int,
+        num_slots: int,
+    ) -> "_SharedObservationBuffers":
+        r"""Allocates the buffers of the :ref:`spaces.Box` sensors that have
+        the same shape and dtype in all the observation spaces.
+        """
+        spec = {}
+        for key, space in observation_spaces[0].spaces.items():
+            if not all(
+                isinstance(obs_space.spaces.get(key, None), spaces.Box)
+                and obs_space.spaces[key].shape == space.shape
+                and obs_space.spaces[key].dtype == space.dtype
+                for obs_space in observation_spaces
+            ):
+                continue
+            spec[key] = (
+                None,
+                (num_slots, num_envs, *space.shape),
+                np.dtype(space.dtype).str,
+            )
+
+        buffers = cls(spec, num_slots, create=True)
+        # name the buffers after the segments the OS allocated
+        buffers.spec = {
+            key: (shm.name, shape, dtype)
+            for shm, (key, (_, shape, dtype)) in zip(
+                buffers._shms, spec.items()
+            )
+        }
+        return buffers
+
+    def pack(
+        self, observations: Dict[str, Any], rank: int
+    ) -> _SharedObservations:
+        r"""Writes the observations of the worker :py:`rank` in its next slot."""
+        slot = self._next_slot
+        self._next_slot = (self._next_slot + 1) % self.num_slots
+        observations = dict(observations)
+        keys = []
+        for key, buffer in self.buffers.items():
+            value = observations.get(key, None)
+            # anything else than the expected array goes through the connection
+            if (
+                isinstance(value, np.ndarray)
+                and value.shape == buffer.shape[2:]
+                and value.dtype == buffer.dtype
+            ):
+                buffer[slot, rank] = value
+                observations[key] = None
+                keys.append(key)
+        return _SharedObservations(observations, slot, keys)
+
+    def unpack(
+        self, shared_observations: _SharedObservations, rank: int
+    ) -> Dict[str, Any]:
+        r"""Returns the observations of the worker :py:`rank` with the shared
+        sensors as views of the buffers.
+        """
+        observations = shared_observations.observations
+        for key in shared_observations.keys:
+            observations[key] = self.buffers[key][
+                shared_observations.slot, rank
+            ]
+        return observations
+
+    def close(self) -> None:
+        self.buffers = {}
+        for shm in self._shms:
+            try:
+                shm.close()
+            except BufferError:
+                # views of the buffer are still in use, the memory is
+                # unmapped when they are released
+                pass
+            if self._create:
+                shm.unlink()
+        self._shms = []
+
+
 class VectorEnv:
     r"""Vectorized environment which creates multiple processes where each
     process runs its own environment. Main class for parallelization of
@@ -151,6 +287,10 @@ class VectorEnv:
     _connection_read_fns: List[_ReadWrapper]
     _connection_write_fns: List[_WriteWrapper]
     _batch_renderer: Optional[EnvBatchRenderer] = None
+    _shared_observations: Optional[_SharedObservationBuffers] = None
+    # Set by the creator of the environments when the scenes are assigned
+    # to the workers by a scheduler.
+    scene_scheduler: Optional[SceneAffinityScheduler] = None
 
     def __init__(
         self,
@@ -159,6 +299,9 @@ class VectorEnv:
         auto_reset_done: bool = True,
         multiprocessing_start_method: str = "forkserver",
         workers_ignore_signals: bool = False,
+        shared_memory_observations: bool = False,
+        shared_memory_slots: int = 2,
+        async_reset_done: bool = False,
     ) -> None:
         """..
 
@@ -176,6 +319,21 @@ class VectorEnv:
             used, the subproccess  must be started before any other GPU usage.
         :param workers_ignore_signals: Whether or not workers will ignore SIGINT and SIGTERM
             and instead will only exit when :ref:`close` is called
+        :param shared_memory_observations: Whether or not workers write the
+            fixed-shape sensors of the observations to shared memory instead
+            of sending them through the pipe. The returned sensors are then
+            views of the shared memory that are overwritten
+            :py:`shared_memory_slots` steps later, copy them to keep them
+            longer.
+        :param shared_memory_slots: number of steps of observations kept in
+            shared memory for each environment.
+        :param async_reset_done: when :py:`auto_reset_done` is set, return
+            the terminal observations of an episode right away and reset the
+            environment in the background, while the next actions are
+            computed. The next step then ignores its action and returns the
+            first observations of the new episode with a reward of 0 and
+            :py:`info[RESET_DEFERRED_KEY]` set to True, which is False for
+            the other steps.
         """
         self._is_closed = True
 
@@ -189,6 +347,10 @@ class VectorEnv:
             "multiprocessing_start_method must be one of {}. Got '{}'"
         ).format(self._valid_start_methods, multiprocessing_start_method)
         self._auto_reset_done = auto_reset_done
+        assert (
+            auto_reset_done or not async_reset_done
+        ), "async_reset_done requires auto_reset_done"
+        self._async_reset_done = async_reset_done
         self._mp_ctx = mp.get_context(multiprocessing_start_method)
         self._workers = []
         (
@@ -226,6 +388,27 @@ class VectorEnv:
         ]
         self._paused: List[Tuple] = []
 
+        if shared_memory_observations:
+            assert (
+                shared_memory_slots >= 2
+            ), "shared_memory_slots must be at least 2"
+            self._shared_observations = _SharedObservationBuffers.create(
+                self.observation_spaces, self._num_envs, shared_memory_slots
+            )
+            for rank, write_fn in enumerate(self._connection_write_fns):
+                write_fn(
+                    (
+                        SHARED_MEMORY_COMMAND,
+                        (
+                            rank,
+                            self._shared_observations.spec,
+                            shared_memory_slots,
+                        ),
+                    )
+                )
+            for read_fn in self._connection_read_fns:
+                read_fn()
+
     @property
     def num_envs(self):
         r"""number of individual environments."""
@@ -241,6 +424,7 @@ class VectorEnv:
         mask_signals: bool = False,
         child_pipe: Optional[Connection] = None,
         parent_pipe: Optional[Connection] = None,
+        async_reset_done: bool = False,
     ) -> None:
         r"""process worker for creating and interacting with the environment."""
         if mask_signals:
@@ -253,21 +437,58 @@ class VectorEnv:
         env = EnvCountEpisodeWrapper(EnvObsDictWrapper(env_fn(*env_fn_args)))
         if parent_pipe is not None:
             parent_pipe.close()
+        shared_observations: Optional[_SharedObservationBuffers] = None
+        rank = 0
+        # observations and info of the episode reset after the last reply
+        deferred_reset: Optional[Tuple[Any, Dict[str, Any]]] = None
         try:
             command, data = connection_read_fn()
             while command != CLOSE_COMMAND:
                 if command == STEP_COMMAND:
-                    observations, reward, done, info = env.step(data)
-
-                    if auto_reset_done and done:
-                        observations = env.reset()
-
+                    if deferred_reset is not None:
+                        # The action was chosen from the terminal observations
+                        # of the previous episode, skip it
+                        observations, info = deferred_reset
+                        reward, done = 0.0, False
+                        info = {**info, RESET_DEFERRED_KEY: True}
+                        deferred_reset = None
+                    else:
+                        observations, reward, done, info = env.step(data)
+                        if async_reset_done:
+                            info = {**info, RESET_DEFERRED_KEY: False}
+                        elif auto_reset_done and done:
+                            observations = env.reset()
+
+                    if shared_observations is not None:
+                        observations = shared_observations.pack(
+                            observations, rank
+                        )
                     connection_write_fn((observations, reward, done, info))
 
+                    if async_reset_done and done:
+                        # Reset while the main process uses the reply
+                        deferred_reset = (env.reset(), info)
+
                 elif command == RESET_COMMAND:
-                    observations = env.reset()
+                    if deferred_reset is not None:
+                        # The environment was just reset
+                        observations, _ = deferred_reset
+                        deferred_reset = None
+                    else:
+                        observations = env.reset()
+                    if shared_observations is not None:
+                        observations = shared_observations.pack(
+                            observations, rank
+                        )
                     connection_write_fn(observations)
 
+                elif command == SHARED_MEMORY_COMMAND:
+                    rank, spec, num_slots = data
+                    shared_observations = _SharedObservationBuffers(
+                        spec, num_slots
+                    )
+                    connection_write_fn(True)
+
                 elif command == RENDER_COMMAND:
                     connection_write_fn(env.render(*data[0], **data[1]))
 
@@ -298,6 +519,8 @@ class VectorEnv:
         finally:
             if child_pipe is not None:
                 child_pipe.close()
+            if shared_observations is not None:
+                shared_observations.close()
             env.close()
 
     def _spawn_workers(
@@ -327,6 +550,7 @@ class VectorEnv:
                     workers_ignore_signals,
                     worker_conn,
                     parent_conn,
+                    self._async_reset_done,
                 ),
             )
             self._workers.append(cast(mp.Process, ps))
@@ -386,7 +610,7 @@ class VectorEnv:
             write_fn((RESET_COMMAND, None))
         results = []
         for read_fn in self._connection_read_fns:
-            results.append(read_fn())
+            results.append(self._unpack_observations(read_fn(), read_fn.rank))
         return results
 
     def reset_at(self, index_env: int):
@@ -396,7 +620,8 @@ class VectorEnv:
         :return: list containing the output of reset method of indexed env.
         """
         self._connection_write_fns[index_env]((RESET_COMMAND, None))
-        results = [self._connection_read_fns[index_env]()]
+        read_fn = self._connection_read_fns[index_env]
+        results = [self._unpack_observations(read_fn(), read_fn.rank)]
         return results
 
     def async_step_at(
@@ -407,7 +632,17 @@ class VectorEnv:
 
     @profiling_wrapper.RangeContext("wait_step_at")
     def wait_step_at(self, index_env: int) -> Any:
-        return self._connection_read_fns[index_env]()
+        read_fn = self._connection_read_fns[index_env]
+        result = read_fn()
+        if self._shared_observations is None:
+            return result
+        observations, reward, done, info = result
+        return (
+            self._unpack_observations(observations, read_fn.rank),
+            reward,
+            done,
+            info,
+        )
 
     def step_at(self, index_env: int, action: Union[int, np.ndarray]):
         r"""Step in the index_env environment in the vector.
@@ -448,6 +683,15 @@ class VectorEnv:
         self.async_step(data)
         return self.wait_step()
 
+    def _unpack_observations(self, observations: Any, rank: int) -> Any:
+        r"""Reads the sensors a worker wrote to shared memory back into its
+        observations.
+        """
+        if isinstance(observations, _SharedObservations):
+            assert self._shared_observations is not None
+            return self._shared_observations.unpack(observations, rank)
+        return observations
+
     def post_step(self, observations) -> List[OrderedDict]:
         r"""Performs batch transformations on step outputs.
 
@@ -478,6 +722,9 @@ class VectorEnv:
         for _, _, _, process in self._paused:
             process.join()
 
+        if self._shared_observations is not None:
+            self._shared_observations.close()
+
         self._is_closed = True
 
         if self._batch_renderer != None:
@@ -653,6 +900,10 @@ class ThreadedVectorEnv(VectorEnv):
                     make_env_fn,
                     env_args,
                     self._auto_reset_done,
+                    False,
+                    None,
+                    None,
+                    self._async_reset_done,
                 ),
             )
             self._workers.append(thread)
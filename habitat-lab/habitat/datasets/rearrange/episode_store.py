@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+r"""Indexed on-disk episode format, loaded lazily.
+
+An episode store holds the output of
+:ref:`habitat.datasets.rearrange.rearrange_dataset.RearrangeDatasetV0.to_binary`
+in a single file:
+
+- a header with a magic string and the position of the index,
+- the object transforms of all the episodes, as one raw array,
+- one pickled record per episode,
+- the index: the offset of each record, the id and scene of each episode,
+  and the table of names shared by the records.
+
+The file is memory-mapped, so that the workers of a
+:ref:`habitat.core.vector_env.VectorEnv` share the same pages. Only the
+index is read on load, an episode is decoded when it is accessed.
+
+Build a store once from a dataset file with:
+
+.. code:: sh
+
+    python -m habitat.datasets.rearrange.episode_store \
+        data/datasets/replica_cad/rearrange/v1/train/rearrange_easy.json.gz \
+        data/datasets/replica_cad/rearrange/v1/train/rearrange_easy.eps
+"""
+
+import argparse
+import mmap
+import pickle
+import struct
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+    overload,
+)
+
+import attr
+import numpy as np
+
+from habitat.core.dataset import Episode, EpisodeIterator
+
+EPISODE_STORE_EXT = ".eps"
+
+_MAGIC = b"HABEPS01"
+# magic, index offset, index size
+_HEADER = struct.Struct("<8sQQ")
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
+class EpisodeRef:
+    r"""Reference to an episode of an :ref:`EpisodeStore`, with the fields
+    that are in the index.
+    """
+    index: int
+    episode_id: str
+    scene_id: str
+
+
+def write_episode_store(path: str, data_dict: Dict[str, Any]) -> None:
+    r"""Writes an episode store.
+
+    :param path: path of the file to write.
+    :param data_dict: dataset in the format of
+        :ref:`RearrangeDatasetV0.to_binary`.
+    """
+    all_transforms = np.ascontiguousarray(data_dict["all_transforms"])
+    scene_ids: List[str] = []
+    scene_to_idx: Dict[str, int] = {}
+    episode_scenes = []
+    episode_ids = []
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, 0, 0))
+        transforms_offset = f.tell()
+        f.write(all_transforms.tobytes())
+
+        offsets = [f.tell()]
+        for ep in data_dict["all_eps"]:
+            f.write(pickle.dumps(ep, protocol=pickle.HIGHEST_PROTOCOL))
+            offsets.append(f.tell())
+            if ep["scene_id"] not in scene_to_idx:
+                scene_to_idx[ep["scene_id"]] = len(scene_ids)
+                scene_ids.append(ep["scene_id"])
+            episode_scenes.append(scene_to_idx[ep["scene_id"]])
+            episode_ids.append(str(ep["episode_id"]))
+
+        index = {
+            "idx_to_name": data_dict["idx_to_name"],
+            "transforms_offset": transforms_offset,
+            "transforms_dtype": all_transforms.dtype.str,
+            "transforms_shape": all_transforms.shape,
+            "offsets": np.array(offsets, dtype=np.int64),
+            "episode_ids": episode_ids,
+            "scene_ids": scene_ids,
+            "episode_scenes": np.array(episode_scenes, dtype=np.int32),
+        }
+        index_offset = f.tell()
+        f.write(pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+        index_size = f.tell() - index_offset
+
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, index_offset, index_size))
+
+
+class EpisodeStore:
+    r"""Memory-mapped episode store, see :ref:`write_episode_store`."""
+
+    def __init__(
+        self,
+        path: str,
+        decode_fn: Callable[[Dict[str, Any], np.ndarray, Dict[int, str]], Any],
+    ) -> None:
+        r"""Constructor
+
+        :param path: path of the store.
+        :param decode_fn: function that creates an episode from a record,
+            the transforms and the table of names of the store.
+        """
+        self.path = path
+        self._decode_fn = decode_fn
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_size = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} is not an episode store")
+        index = pickle.loads(
+            self._mmap[index_offset : index_offset + index_size]
+        )
+        self._idx_to_name = index["idx_to_name"]
+        self._offsets = index["offsets"]
+        self.episode_ids: List[str] = index["episode_ids"]
+        self.scene_ids: List[str] = index["scene_ids"]
+        self.episode_scenes: np.ndarray = index["episode_scenes"]
+        shape = index["transforms_shape"]
+        self._transforms = np.frombuffer(
+            self._mmap,
+            dtype=index["transforms_dtype"],
+            count=int(np.prod(shape)),
+            offset=index["transforms_offset"],
+        ).reshape(shape)
+
+    def __len__(self) -> int:
+        return len(self.episode_ids)
+
+    def ref(self, index: int) -> EpisodeRef:
+        return EpisodeRef(
+            index=index,
+            episode_id=self.episode_ids[index],
+            scene_id=self.scene_ids[self.episode_scenes[index]],
+        )
+
+    def decode(self, index: int) -> Any:
+        r"""Decodes the episode at :p:`index`."""
+        record = pickle.loads(
+            self._mmap[self._offsets[index] : self._offsets[index + 1]]
+        )
+        return self._decode_fn(record, self._transforms, self._idx_to_name)
+
+    def __getstate__(self):
+        return {"path": self.path, "_decode_fn": self._decode_fn}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+
+class LazyEpisodes(Sequence[Episode]):
+    r"""Sequence of episodes of an :ref:`EpisodeStore` which are decoded on
+    access. Slicing and selecting episodes only copies their indices.
+    """
+
+    def __init__(
+        self, store: EpisodeStore, indices: Optional[np.ndarray] = None
+    ) -> None:
+        self.store = store
+        self.indices = (
+            np.arange(len(store), dtype=np.int64)
+            if indices is None
+            else np.asarray(indices, dtype=np.int64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @overload
+    def __getitem__(self, idx: int) -> Episode:
+        ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> "LazyEpisodes":
+        ...
+
+    def __getitem__(
+        self, idx: Union[int, slice]
+    ) -> Union[Episode, "LazyEpisodes"]:
+        if isinstance(idx, slice):
+            return LazyEpisodes(self.store, self.indices[idx])
+        return self.store.decode(int(self.indices[idx]))
+
+    def __iter__(self) -> Iterator[Episode]:
+        for index in self.indices:
+            yield self.store.decode(int(index))
+
+    @property
+    def refs(self) -> List[EpisodeRef]:
+        r"""References to the episodes, read from the index only."""
+        return [self.store.ref(int(index)) for index in self.indices]
+
+    @property
+    def scene_ids(self) -> List[str]:
+        r"""Unique scene ids of the episodes, read from the index only."""
+        scene_idxs = np.unique(self.store.episode_scenes[self.indices])
+        return sorted(self.store.scene_ids[i] for i in scene_idxs)
+
+    def select(self, store_indices: Sequence[int]) -> "LazyEpisodes":
+        r"""Episodes at the given indices of the store."""
+        return LazyEpisodes(self.store, np.asarray(store_indices))
+
+    def select_scenes(
+        self, scene_ids: Sequence[str], match_fn: Callable[[str], str]
+    ) -> "LazyEpisodes":
+        r"""Episodes whose scene matches one of :p:`scene_ids` once
+        transformed by :p:`match_fn`, read from the index only.
+        """
+        wanted = set(scene_ids)
+        scene_mask = np.array(
+            [match_fn(s) in wanted for s in self.store.scene_ids], dtype=bool
+        )
+        if len(scene_mask) == 0:
+            return LazyEpisodes(self.store, self.indices[:0])
+        return LazyEpisodes(
+            self.store,
+            self.indices[scene_mask[self.store.episode_scenes[self.indices]]],
+        )
+
+    def filter(self, filter_fn: Callable[[Episode], bool]) -> "LazyEpisodes":
+        r"""Episodes for which :p:`filter_fn` is true. The episodes are
+        decoded one at a time and not kept in memory.
+        """
+        return LazyEpisodes(
+            self.store,
+            np.array(
+                [
+                    index
+                    for index in self.indices
+                    if filter_fn(self.store.decode(int(index)))
+                ],
+                dtype=np.int64,
+            ),
+        )
+
+
+class LazyEpisodeIterator(EpisodeIterator):
+    r""":ref:`EpisodeIterator` over :ref:`LazyEpisodes`. The iteration
+    order is computed on the :ref:`EpisodeRef` of the episodes, which are
+    only decoded when they are returned.
+    """
+
+    def __init__(self, episodes: LazyEpisodes, *args, **kwargs) -> None:
+        self._store = episodes.store
+        super().__init__(episodes.refs, *args, **kwargs)  # type: ignore[arg-type]
+
+    def __next__(self) -> Episode:
+        ref = super().__next__()
+        return self._store.decode(ref.index)  # type: ignore[attr-defined]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Builds an episode store from a rearrange dataset file."
+    )
+    parser.add_argument("input", help="`.json.gz` or `.pickle` dataset file")
+    parser.add_argument("output", help=f"`{EPISODE_STORE_EXT}` file to write")
+    args = parser.parse_args()
+
+    from habitat.datasets.rearrange.rearrange_dataset import (
+        RearrangeDatasetV0,
+    )
+
+    dataset = RearrangeDatasetV0()
+    dataset._load_from_file(args.input, scenes_dir=None)
+    write_episode_store(args.output, dataset.to_binary())
+
+
+if __name__ == "__main__":
+    main()
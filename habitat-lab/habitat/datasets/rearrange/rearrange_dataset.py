@@ -4,18 +4,34 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import copy
 import json
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 import attr
 import numpy as np
 
 import habitat_sim.utils.datasets_download as data_downloader
-from habitat.core.dataset import Episode
+from habitat.core.dataset import ALL_SCENES_MASK, Dataset, Episode
 from habitat.core.logging import logger
 from habitat.core.registry import registry
 from habitat.core.utils import DatasetFloatJSONEncoder
 from habitat.datasets.pointnav.pointnav_dataset import PointNavDatasetV1
+from habitat.datasets.rearrange.episode_store import (
+    EPISODE_STORE_EXT,
+    EpisodeStore,
+    LazyEpisodeIterator,
+    LazyEpisodes,
+)
 from habitat.datasets.utils import check_and_gen_physics_config
 
 if TYPE_CHECKING:
@@ -44,12 +60,22 @@ class RearrangeEpisode(Episode):
 
 @registry.register_dataset(name="RearrangeDataset-v0")
 class RearrangeDatasetV0(PointNavDatasetV1):
-    r"""Class inherited from PointNavDataset that loads Rearrangement dataset."""
+    r"""Class inherited from PointNavDataset that loads Rearrangement dataset.
+
+    If the data path is an episode store (see
+    :ref:`habitat.datasets.rearrange.episode_store`), the episodes are
+    :ref:`LazyEpisodes` decoded on access, and selecting scenes, splitting
+    and iterating the dataset only read the index of the store.
+    """
     episodes: List[RearrangeEpisode] = []  # type: ignore
     content_scenes_path: str = "{data_path}/content/{scene}.json.gz"
 
     def to_json(self) -> str:
-        result = DatasetFloatJSONEncoder().encode(self)
+        dataset = self
+        if isinstance(self.episodes, LazyEpisodes):
+            dataset = copy.copy(self)
+            dataset.episodes = list(self.episodes)
+        result = DatasetFloatJSONEncoder().encode(dataset)
         return result
 
     def __init__(self, config: Optional["DictConfig"] = None) -> None:
@@ -71,7 +97,72 @@ class RearrangeDatasetV0(PointNavDatasetV1):
 
         check_and_gen_physics_config()
 
-        super().__init__(config)
+        if config is not None and config.data_path.format(
+            split=config.split
+        ).endswith(EPISODE_STORE_EXT):
+            self._load_episode_store(config)
+        else:
+            super().__init__(config)
+
+    def _load_episode_store(self, config: "DictConfig") -> None:
+        episodes = LazyEpisodes(
+            EpisodeStore(
+                config.data_path.format(split=config.split),
+                decode_fn=self._episode_from_binary,
+            )
+        )
+        if ALL_SCENES_MASK not in config.content_scenes:
+            episodes = episodes.select_scenes(
+                config.content_scenes, self.scene_from_scene_path
+            )
+        self.episodes = episodes  # type: ignore[assignment]
+
+    @property
+    def scene_ids(self) -> List[str]:
+        if isinstance(self.episodes, LazyEpisodes):
+            return self.episodes.scene_ids
+        return super().scene_ids
+
+    def get_scene_episodes(self, scene_id: str) -> List[RearrangeEpisode]:
+        if isinstance(self.episodes, LazyEpisodes):
+            return list(
+                self.episodes.select_scenes([scene_id], lambda s: s)
+            )
+        return super().get_scene_episodes(scene_id)
+
+    def get_episode_iterator(
+        self, *args: Any, **kwargs: Any
+    ) -> Iterator[RearrangeEpisode]:
+        if isinstance(self.episodes, LazyEpisodes):
+            return LazyEpisodeIterator(self.episodes, *args, **kwargs)
+        return super().get_episode_iterator(*args, **kwargs)
+
+    def filter_episodes(
+        self, filter_fn: Callable[[RearrangeEpisode], bool]
+    ) -> "Dataset":
+        if isinstance(self.episodes, LazyEpisodes):
+            new_dataset = copy.copy(self)
+            new_dataset.episodes = self.episodes.filter(filter_fn)  # type: ignore[assignment]
+            return new_dataset
+        return super().filter_episodes(filter_fn)
+
+    def get_splits(self, *args: Any, **kwargs: Any) -> List["Dataset"]:
+        if not isinstance(self.episodes, LazyEpisodes):
+            return super().get_splits(*args, **kwargs)
+
+        # Split the references of the episodes instead of the episodes.
+        lazy_episodes = self.episodes
+        ref_dataset = copy.copy(self)
+        ref_dataset.episodes = lazy_episodes.refs  # type: ignore[assignment]
+        splits = Dataset.get_splits(ref_dataset, *args, **kwargs)
+        for split in splits:
+            split.episodes = lazy_episodes.select(
+                [ref.index for ref in split.episodes]
+            )
+        self.episodes = lazy_episodes.select(  # type: ignore[assignment]
+            [ref.index for ref in ref_dataset.episodes]
+        )
+        return splits
 
     def from_json(
         self, json_str: str, scenes_dir: Optional[str] = None
@@ -172,33 +263,43 @@ class RearrangeDatasetV0(PointNavDatasetV1):
         """
         all_T = data_dict["all_transforms"]
         idx_to_name = data_dict["idx_to_name"]
-        for i, ep in enumerate(data_dict["all_eps"]):
-            ep["rigid_objs"] = [
-                [idx_to_name[ni], all_T[ti]] for ni, ti in ep["rigid_objs"]
-            ]
-            ep["ao_states"] = {
-                idx_to_name[ni]: v for ni, v in ep["ao_states"].items()
-            }
-            ep["name_to_receptacle"] = {
-                idx_to_name[k]: idx_to_name[v]
-                for k, v in ep["name_to_receptacle"]
-            }
+        for ep in data_dict["all_eps"]:
+            self.episodes.append(
+                self._episode_from_binary(ep, all_T, idx_to_name)
+            )
 
-            new_markers = []
-            for name, mtype, offset, link, obj in ep["markers"]:
-                new_markers.append(
-                    {
-                        "name": idx_to_name[name],
-                        "type": idx_to_name[mtype],
-                        "params": {
-                            "offset": offset,
-                            "link": idx_to_name[link],
-                            "object": idx_to_name[obj],
-                        },
-                    }
-                )
-            ep["markers"] = new_markers
+    @staticmethod
+    def _episode_from_binary(
+        ep: Dict[str, Any], all_T: np.ndarray, idx_to_name: Dict[int, str]
+    ) -> RearrangeEpisode:
+        """
+        Decode an episode of :ref:`to_binary`.
+        """
+        ep["rigid_objs"] = [
+            [idx_to_name[ni], np.array(all_T[ti])]
+            for ni, ti in ep["rigid_objs"]
+        ]
+        ep["ao_states"] = {
+            idx_to_name[ni]: v for ni, v in ep["ao_states"].items()
+        }
+        ep["name_to_receptacle"] = {
+            idx_to_name[k]: idx_to_name[v]
+            for k, v in ep["name_to_receptacle"]
+        }
 
-            rearrangement_episode = RearrangeEpisode(**ep)
-            # rearrangement_episode.episode_id = str(i)
-            self.episodes.append(rearrangement_episode)
+        new_markers = []
+        for name, mtype, offset, link, obj in ep["markers"]:
+            new_markers.append(
+                {
+                    "name": idx_to_name[name],
+                    "type": idx_to_name[mtype],
+                    "params": {
+                        "offset": offset,
+                        "link": idx_to_name[link],
+                        "object": idx_to_name[obj],
+                    },
+                }
+            )
+        ep["markers"] = new_markers
+
+        return RearrangeEpisode(**ep)
@@ -16,7 +16,10 @@ from habitat.tasks.rearrange.actions.actions import (
     BaseVelNonCylinderAction,
     HumanoidJointAction,
 )
-from habitat.tasks.rearrange.utils import place_agent_at_dist_from_pos
+from habitat.tasks.rearrange.utils import (
+    NavPathCache,
+    place_agent_at_dist_from_pos,
+)
 from habitat.tasks.utils import get_angle
 from habitat_sim.physics import VelocityControl
 from habitat.tasks.rearrange.actions.oracle_nav_action import (
@@ -73,12 +76,15 @@ class OracleNavDiffBaseAction(OracleNavAction):
         self.ep_id = None
         self.prev_match_target_id = None
         self.prev_nav_done = False
+        self._path_cache = NavPathCache(
+            tolerance=config.path_cache_tolerance,
+            stats=self._sim.nav_path_cache_stats,
+        )
 
     def _create_pathfinder(self, config):
         """
         Create a pathfinder for the current agent base
         """
-        pf = habitat_sim.nav.PathFinder()
         # deepcopy does not work since NavMeshSettings is non-pickleable
         # modified_settings = deepcopy(self._sim.pathfinder.nav_mesh_settings)
         modified_settings = self._sim.pathfinder.nav_mesh_settings
@@ -100,9 +106,8 @@ class OracleNavDiffBaseAction(OracleNavAction):
         modified_settings.include_static_objects = True
         # Create a new pathfinder with slightly stricter radius to provide nav buffer from collision
         modified_settings.agent_radius += 0.05
-        assert self._sim.recompute_navmesh(
-            pf, modified_settings
-        ), "failed to recompute navmesh"
+        # Agents with the same footprint share a pathfinder, recomputed once per scene layout
+        pf = self._sim.get_agent_pathfinder(modified_settings)
         
         # assert self._sim.recompute_navmesh(
         #     pf, self._sim.pathfinder.nav_mesh_settings
@@ -260,6 +265,7 @@ class OracleNavDiffBaseAction(OracleNavAction):
         super().reset(*args, **kwargs)
         self.prev_nav_done = False
         self.skill_done = False
+        self._path_cache.clear()
         if self._task._episode_id != self._prev_ep_id:
             self._targets = {}
             self._prev_ep_id = self._task._episode_id
@@ -299,17 +305,11 @@ class OracleNavDiffBaseAction(OracleNavAction):
         :param pathfinder: The pathfinder to use for computing the path
         """
         agent_pos = self.cur_articulated_agent.base_pos
-
-        path = habitat_sim.ShortestPath()
-        path.requested_start = agent_pos
-        path.requested_end = point
         if pathfinder is None:
-            found_path = self.pathfinder.find_path(path)
-        else:
-            found_path = pathfinder.find_path(path)
-        if not found_path:
-            return [agent_pos, point]
-        return path.points
+            pathfinder = self.pathfinder
+        return self._path_cache.find_path(
+            pathfinder, agent_pos, point, self._sim.navmesh_version
+        )
 
     def step(self, *args, **kwargs):
         # Get episode id
@@ -15,7 +15,10 @@ from habitat.tasks.rearrange.actions.actions import (
     BaseVelNonCylinderAction,
     HumanoidJointAction,
 )
-from habitat.tasks.rearrange.utils import place_agent_at_dist_from_pos
+from habitat.tasks.rearrange.utils import (
+    NavPathCache,
+    place_agent_at_dist_from_pos,
+)
 from habitat.tasks.utils import get_angle
 from habitat_sim.physics import VelocityControl
 
@@ -57,6 +60,10 @@ class OracleNavAction(BaseVelAction, BaseVelNonCylinderAction, HumanoidJointActi
         self._prev_ep_id = None
         self.skill_done = False
         self._targets = {}
+        self._path_cache = NavPathCache(
+            tolerance=self._config.path_cache_tolerance,
+            stats=self._sim.nav_path_cache_stats,
+        )
 
     @staticmethod
     def _compute_turn(rel, turn_vel, robot_forward):
@@ -132,6 +139,7 @@ class OracleNavAction(BaseVelAction, BaseVelNonCylinderAction, HumanoidJointActi
 
     def reset(self, *args, **kwargs):
         super().reset(*args, **kwargs)
+        self._path_cache.clear()
         if self._task._episode_id != self._prev_ep_id:
             self._targets = {}
             self._prev_ep_id = self._task._episode_id
@@ -170,14 +178,13 @@ class OracleNavAction(BaseVelAction, BaseVelNonCylinderAction, HumanoidJointActi
         :param point: Vector3 indicating the target point
         """
         agent_pos = self.cur_articulated_agent.base_pos
-
-        path = habitat_sim.ShortestPath()
-        path.requested_start = agent_pos
-        path.requested_end = point
-        found_path = self._sim.pathfinder.find_path(path)
-        if not found_path:
-            return [agent_pos, point]
-        return path.points
+        # The path is only searched again when the agent deviates from it
+        return self._path_cache.find_path(
+            self._sim.pathfinder,
+            agent_pos,
+            point,
+            self._sim.navmesh_version,
+        )
 
     def step(self, *args, **kwargs):
         self.skill_done = False
@@ -325,6 +332,14 @@ class OracleNavCoordinateAction(BaseVelAction, BaseVelNonCylinderAction, Humanoi
 
         else:
             raise ValueError("Unrecognized motion type for oracle nav  action")
+        self._path_cache = NavPathCache(
+            tolerance=self._config.path_cache_tolerance,
+            stats=self._sim.nav_path_cache_stats,
+        )
+
+    def reset(self, *args, **kwargs):
+        super().reset(*args, **kwargs)
+        self._path_cache.clear()
 
     @staticmethod
     def _compute_turn(rel, turn_vel, robot_forward):
@@ -448,14 +463,13 @@ class OracleNavCoordinateAction(BaseVelAction, BaseVelNonCylinderAction, Humanoi
         :param point: Vector3 indicating the target point
         """
         agent_pos = self.cur_articulated_agent.base_pos
-
-        path = habitat_sim.ShortestPath()
-        path.requested_start = agent_pos
-        path.requested_end = point
-        found_path = self._sim.pathfinder.find_path(path)
-        if not found_path:
-            return [agent_pos, point]
-        return path.points
+        # The path is only searched again when the agent deviates from it
+        return self._path_cache.find_path(
+            self._sim.pathfinder,
+            agent_pos,
+            point,
+            self._sim.navmesh_version,
+        )
 
     def step(self, *args, **kwargs):
         # mode = 0,1,2
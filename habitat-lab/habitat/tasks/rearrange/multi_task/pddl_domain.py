@@ -16,7 +16,6 @@ from typing import (
     Optional,
     Tuple,
     Union,
-    cast,
 )
 
 import yaml  # type: ignore[import]
@@ -50,6 +49,55 @@ if TYPE_CHECKING:
     from omegaconf import DictConfig
 
 
+def _entity_key(entity: PddlEntity) -> Tuple[str, str]:
+    """
+    Hashable key of an entity, equal for entities that compare equal.
+    """
+    return (entity.name, entity.expr_type.name)
+
+
+class _PredicateSet:
+    """
+    Set of grounded predicates with constant time membership checks, for
+    `LogicalExpr.is_true_from_predicates`.
+    """
+
+    def __init__(self, preds: List[Predicate]):
+        self.keys = {
+            (p.name, tuple(_entity_key(e) for e in p._arg_values))
+            for p in preds
+        }
+
+    def __contains__(self, pred: Predicate) -> bool:
+        return (
+            pred.name,
+            tuple(_entity_key(e) for e in pred._arg_values),
+        ) in self.keys
+
+
+def _get_precond_checks(
+    action: PddlAction,
+) -> List[Tuple[str, List[Union[int, Tuple[str, str]]]]]:
+    """
+    Predicates that must be true for the precondition of `action` to be true,
+    which are the predicates of a top level AND. Each argument is either the
+    index of the action parameter or the key of a fixed entity.
+    """
+    precond = action.precond
+    if precond.expr_type != LogicalExprType.AND:
+        return []
+    param_idxs = {_entity_key(p): i for i, p in enumerate(action.params)}
+    checks = []
+    for sub_expr in precond.sub_exprs:
+        if not isinstance(sub_expr, Predicate):
+            continue
+        arg_keys = [_entity_key(e) for e in sub_expr._arg_values]
+        checks.append(
+            (sub_expr.name, [param_idxs.get(k, k) for k in arg_keys])
+        )
+    return checks
+
+
 class PddlDomain:
     """
     Manages the information from the PDDL domain and task definition.
@@ -98,6 +146,7 @@ class PddlDomain:
 
         self._added_entities: Dict[str, PddlEntity] = {}
         self._added_expr_types: Dict[str, ExprType] = {}
+        self._clear_groundings()
 
         self._parse_expr_types(domain_def)
         self._parse_constants(domain_def)
@@ -111,6 +160,7 @@ class PddlDomain:
     def set_actions(self, actions: Dict[str, PddlAction]) -> None:
         self._orig_actions = actions
         self._actions = dict(actions)
+        self._clear_groundings()
 
     def _parse_actions(self, domain_def) -> None:
         """
@@ -218,6 +268,7 @@ class PddlDomain:
         Add a type to `self.expr_types`. Clears every episode
         """
         self._added_expr_types[expr_type.name] = expr_type
+        self._clear_groundings()
 
     def register_episode_entity(self, pddl_entity: PddlEntity) -> None:
         """
@@ -407,6 +458,7 @@ class PddlDomain:
                 new_ac.set_post_cond_search(assigns)
 
             self._actions[k] = new_ac
+        self._clear_groundings()
 
     @property
     def sim_info(self) -> PddlSimInfo:
@@ -433,25 +485,118 @@ class PddlDomain:
 
         return expr.is_true(self.sim_info)
 
+    def _clear_groundings(self) -> None:
+        """
+        Clears the memoized groundings of the predicates and actions.
+        """
+        self._grounding_signature: Optional[Tuple[Tuple[str, str], ...]] = None
+        self._grounding_entities: List[PddlEntity] = []
+        self._entity_idx: Dict[Tuple[str, str], int] = {}
+        self._type_candidates: Dict[str, List[int]] = {}
+        self._pred_groundings: Dict[str, List[Predicate]] = {}
+        self._action_groundings: Dict[
+            Tuple[str, Tuple[int, ...]], List[Tuple[int, ...]]
+        ] = {}
+
+    def _update_grounding_entities(self) -> List[PddlEntity]:
+        """
+        Indexes the current entities for grounding. The memoized groundings
+        are kept as long as the entities don't change, so typically for the
+        whole episode.
+        """
+        entities = list(self.all_entities.values())
+        signature = tuple(_entity_key(e) for e in entities)
+        if signature != self._grounding_signature:
+            self._clear_groundings()
+            self._grounding_signature = signature
+            self._grounding_entities = entities
+            self._entity_idx = {k: i for i, k in enumerate(signature)}
+        return self._grounding_entities
+
+    def _get_type_candidates(self, expr_type: ExprType) -> List[int]:
+        """
+        Indices of the entities that are compatible with `expr_type`.
+        """
+        if expr_type.name not in self._type_candidates:
+            self._type_candidates[expr_type.name] = [
+                i
+                for i, e in enumerate(self._grounding_entities)
+                if e.expr_type.is_subtype_of(expr_type)
+            ]
+        return self._type_candidates[expr_type.name]
+
+    def _ground_args(
+        self,
+        args: List[PddlEntity],
+        required_idxs: Optional[List[int]] = None,
+    ) -> List[Tuple[int, ...]]:
+        """
+        Returns the tuples of distinct entity indices compatible with the
+        types of `args`, in lexicographic order. Only tuples containing all of
+        `required_idxs` are returned.
+        """
+        candidates = [self._get_type_candidates(arg.expr_type) for arg in args]
+        required = set(required_idxs or [])
+        groundings: List[Tuple[int, ...]] = []
+        assign: List[int] = []
+
+        def extend(pos: int) -> None:
+            if len(required.difference(assign)) > len(args) - pos:
+                # Not enough arguments left for the required entities.
+                return
+            if pos == len(args):
+                groundings.append(tuple(assign))
+                return
+            for idx in candidates[pos]:
+                if idx in assign:
+                    continue
+                assign.append(idx)
+                extend(pos + 1)
+                assign.pop()
+
+        extend(0)
+        return groundings
+
+    def _are_checks_true(
+        self,
+        checks: List[Tuple[str, List[Union[int, Tuple[str, str]]]]],
+        grounding: Tuple[int, ...],
+        true_pred_set: "_PredicateSet",
+    ) -> bool:
+        """
+        Checks the predicates from `_get_precond_checks` against the true
+        predicates, with the action parameters bound to `grounding`.
+        """
+        for name, arg_keys in checks:
+            values_key = tuple(
+                self._grounding_signature[grounding[k]]
+                if isinstance(k, int)
+                else k
+                for k in arg_keys
+            )
+            if (name, values_key) not in true_pred_set.keys:
+                return False
+        return True
+
     def get_true_predicates(self) -> List[Predicate]:
         """
         Get all the predicates that are true in the current simulator state.
         """
 
-        all_entities = self.all_entities.values()
+        entities = self._update_grounding_entities()
         true_preds: List[Predicate] = []
         for pred in self.predicates.values():
-            for entity_input in itertools.permutations(
-                all_entities, pred.n_args
-            ):
-                if not pred.are_args_compatible(list(entity_input)):
-                    continue
-
-                use_pred = pred.clone()
-                use_pred.set_param_values(entity_input)
-
+            if pred.name not in self._pred_groundings:
+                grounded_preds = []
+                for grounding in self._ground_args(pred._args):
+                    use_pred = pred.clone()
+                    use_pred.set_param_values([entities[i] for i in grounding])
+                    grounded_preds.append(use_pred)
+                self._pred_groundings[pred.name] = grounded_preds
+
+            for use_pred in self._pred_groundings[pred.name]:
                 if use_pred.is_true(self.sim_info):
-                    true_preds.append(use_pred)
+                    true_preds.append(use_pred.clone())
         return true_preds
 
     def get_possible_predicates(self) -> List[Predicate]:
@@ -484,18 +629,30 @@ class PddlDomain:
         true_preds: Optional[List[Predicate]] = None,
     ) -> List[PddlAction]:
         """
-        Get all actions that can be applied.
+        Get all actions that can be applied. The arguments are only searched
+        among the entities of compatible types and the groundings are
+        memoized while the entities stay the same.
         :param filter_entities: ONLY actions with entities that contain all
             entities in `filter_entities` are allowed.
         :param allowed_action_names: ONLY action names allowed.
         :param restricted_action_names: Action names NOT allowed.
+        :param true_preds: If specified, ONLY actions with the precondition
+            satisfied by these predicates are allowed.
         """
         if filter_entities is None:
             filter_entities = []
         if restricted_action_names is None:
             restricted_action_names = []
 
-        all_entities = list(self.all_entities.values())
+        entities = self._update_grounding_entities()
+        filter_keys = [_entity_key(e) for e in filter_entities]
+        if any(k not in self._entity_idx for k in filter_keys):
+            return []
+        filter_idxs = tuple(sorted({self._entity_idx[k] for k in filter_keys}))
+        true_pred_set = None
+        if true_preds is not None:
+            true_pred_set = _PredicateSet(true_preds)
+
         matching_actions = []
         for action in self.actions.values():
             if (
@@ -507,31 +664,35 @@ class PddlDomain:
             if action.name in restricted_action_names:
                 continue
 
-            for entity_input in itertools.combinations(
-                all_entities, action.n_args
-            ):
-                # Check that all the filter_entities are in entity_input
-                matches_filter = all(
-                    filter_entity in entity_input
-                    for filter_entity in filter_entities
+            groundings_key = (action.name, filter_idxs)
+            if groundings_key not in self._action_groundings:
+                # Same order as enumerating the combinations of entities, then
+                # the permutations of each combination.
+                self._action_groundings[groundings_key] = sorted(
+                    self._ground_args(action.params, list(filter_idxs)),
+                    key=lambda grounding: (sorted(grounding), grounding),
                 )
-                if not matches_filter:
+            groundings = self._action_groundings[groundings_key]
+
+            if true_pred_set is not None:
+                precond_checks = _get_precond_checks(action)
+            for grounding in groundings:
+                if true_pred_set is not None and not self._are_checks_true(
+                    precond_checks, grounding, true_pred_set
+                ):
+                    # A predicate of the precondition is not true, skip
+                    # binding the action.
                     continue
-
-                for entity_input_perm in itertools.permutations(entity_input):
-                    entity_inputs = cast(List[PddlEntity], entity_input_perm)
-                    if not action.are_args_compatible(entity_inputs):
-                        continue
-                    new_action = action.clone()
-                    new_action.set_param_values(entity_inputs)
-                    if (
-                        true_preds is not None
-                        and not new_action.is_precond_satisfied_from_predicates(
-                            true_preds
-                        )
-                    ):
-                        continue
-                    matching_actions.append(new_action)
+                new_action = action.clone()
+                new_action.set_param_values([entities[i] for i in grounding])
+                if (
+                    true_pred_set is not None
+                    and not new_action.is_precond_satisfied_from_predicates(
+                        true_pred_set
+                    )
+                ):
+                    continue
+                matching_actions.append(new_action)
         return matching_actions
 
     def get_ordered_actions(self) -> List[PddlAction]:
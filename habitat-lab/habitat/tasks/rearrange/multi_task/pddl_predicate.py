@@ -95,28 +95,32 @@ class Predicate:
     def is_true(self, sim_info: PddlSimInfo) -> bool:
         """
         Returns if the predicate is satisfied in the current simulator state.
-        Potentially returns the cached truth value of the predicate depending
-        on `sim_info`.
+        The truth value is cached in `sim_info` until the simulator state
+        changes.
         """
-        self_repr = repr(self)
-        if (
-            sim_info.pred_truth_cache is not None
-            and self_repr in sim_info.pred_truth_cache
-        ):
-            # Return the cached value.
-            return sim_info.pred_truth_cache[self_repr]
-
-        # Recompute and potentially cache the result.
-        result = self._pddl_sim_state.is_true(sim_info)
-        if sim_info.pred_truth_cache is not None:
-            sim_info.pred_truth_cache[self_repr] = result
-        return result
+        sim_info.sync_step_cache()
+        if sim_info.pred_truth_cache is None:
+            return self._pddl_sim_state.is_true(sim_info)
+
+        cache_key = (
+            self._name,
+            tuple(
+                f"{x.name}-{x.expr_type.name}" for x in self._arg_values or []
+            ),
+        )
+        if cache_key not in sim_info.pred_truth_cache:
+            sim_info.pred_truth_cache[
+                cache_key
+            ] = self._pddl_sim_state.is_true(sim_info)
+        return sim_info.pred_truth_cache[cache_key]
 
     def set_state(self, sim_info: PddlSimInfo) -> None:
         """
         Sets the simulator state to satisfy the predicate.
         """
-        return self._pddl_sim_state.set_state(sim_info)
+        self._pddl_sim_state.set_state(sim_info)
+        # The state was changed without stepping the simulator.
+        sim_info.reset_pred_truth_cache()
 
     def clone(self):
         p = Predicate(self._name, self._pddl_sim_state.clone(), self._args)
@@ -571,7 +571,7 @@ def _is_obj_state_true(
             int,
             sim_info.search_for_entity(target),
         )
-        idxs, pos_targs = sim_info.sim.get_targets()
+        idxs, pos_targs = sim_info.get_targets()
         targ_pos = pos_targs[list(idxs).index(targ_idx)]
 
         dist = np.linalg.norm(entity_pos - targ_pos)
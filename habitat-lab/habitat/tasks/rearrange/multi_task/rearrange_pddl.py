@@ -4,7 +4,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
@@ -156,9 +156,13 @@ class PddlSimInfo:
     :property receptacles: Simulator receptacle regions. See `receptacles` in `RearrangeSim`.
     :property filter_colliding_states: Setting used for placing robot predicate state.
     :property num_spawn_attempts: Setting used for placing robot predicate state.
-    :property pred_truth_cache: Used by the task to avoid evaluating the same
-        predicate multiple times.
-
+    :property pred_truth_cache: Truth values of the predicates evaluated in
+        the current simulator state, keyed by the predicate name and the
+        bound entities. Cleared when the simulator state changes (see
+        `RearrangeSim.state_version`): on step, reset and set_state, after
+        each task action and on grasp changes. Code changing the simulator
+        state directly in between must call `reset_pred_truth_cache`. Set to
+        None to disable it.
 
     """
 
@@ -184,15 +188,53 @@ class PddlSimInfo:
     filter_colliding_states: bool
     recep_place_shrink_factor: float
 
-    pred_truth_cache: Optional[Dict[str, bool]] = None
+    pred_truth_cache: Optional[
+        Dict[Tuple[str, Tuple[str, ...]], bool]
+    ] = field(default_factory=dict)
+
+    # Simulator state version the step caches were filled at.
+    _cache_state_version: Optional[int] = field(
+        default=None, init=False, repr=False
+    )
+    # Positions of all the scene objects and the rearrange targets, fetched
+    # once per step.
+    _scene_pos: Optional[np.ndarray] = field(
+        default=None, init=False, repr=False
+    )
+    _targets: Optional[Tuple[np.ndarray, np.ndarray]] = field(
+        default=None, init=False, repr=False
+    )
 
     def reset_pred_truth_cache(self):
         """
-        Task that uses the `pred_truth_cache` is responsible for calling
-        this.
+        Clears the truth values and positions cached for the current
+        simulator state. Called automatically when the simulator state
+        changes, and after setting the state of a predicate.
         """
 
-        self.pred_truth_cache = {}
+        if self.pred_truth_cache is not None:
+            self.pred_truth_cache = {}
+        self._scene_pos = None
+        self._targets = None
+
+    def sync_step_cache(self) -> None:
+        """
+        Clears the step caches if the simulator state changed since they
+        were filled.
+        """
+        state_version = getattr(self.sim, "state_version", None)
+        if state_version is None or state_version != self._cache_state_version:
+            self.reset_pred_truth_cache()
+            self._cache_state_version = state_version
+
+    def get_targets(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cached `RearrangeSim.get_targets` for the current simulator state.
+        """
+        self.sync_step_cache()
+        if self._targets is None:
+            self._targets = self.sim.get_targets()
+        return self._targets
 
     def get_predicate(self, pred_name: str) -> "Predicate":
         """
@@ -224,9 +266,9 @@ class PddlSimInfo:
             entity, SimulatorObjectType.GOAL_ENTITY.value
         ):
             idx = self.target_ids[ename]
-            targ_idxs, pos_targs = self.sim.get_targets()
+            targ_idxs, pos_targs = self.get_targets()
             rel_idx = targ_idxs.tolist().index(idx)
-            return pos_targs[rel_idx]
+            return pos_targs[rel_idx].copy()
         if self.check_type_matches(
             entity, SimulatorObjectType.STATIC_RECEPTACLE_ENTITY.value
         ):
@@ -235,13 +277,12 @@ class PddlSimInfo:
         if self.check_type_matches(
             entity, SimulatorObjectType.MOVABLE_ENTITY.value
         ):
-            rom = self.sim.get_rigid_object_manager()
-            idx = self.obj_ids[ename]
-            abs_obj_id = self.sim.scene_obj_ids[idx]
-            cur_pos = rom.get_object_by_id(
-                abs_obj_id
-            ).transformation.translation
-            return cur_pos
+            # Fetch the positions of all the objects at once, the
+            # predicates of a step typically query many of them.
+            self.sync_step_cache()
+            if self._scene_pos is None:
+                self._scene_pos = self.sim.get_scene_pos()
+            return mn.Vector3(self._scene_pos[self.obj_ids[ename]])
         raise ValueError()
 
     def search_for_entity(
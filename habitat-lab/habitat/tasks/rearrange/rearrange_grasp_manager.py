@@ -119,6 +119,8 @@ class RearrangeGraspManager:
         :param force: If True, reset the collision group of the now released object immediately instead of waiting for its distance from the end effector to reach a threshold.
         """
         self._vis_info = []
+        # Releasing changes the predicates evaluated later in this step.
+        self._sim.state_version += 1
         # if len(self._snap_constraints) == 0:
         #     # No constraints to unsnap
         #     self._snapped_obj_id = None
@@ -189,6 +191,7 @@ class RearrangeGraspManager:
                 f"Tried snapping to {marker_name} when already snapped"
             )
 
+        self._sim.state_version += 1
         marker = self._sim.get_marker(marker_name)
         self._snapped_marker_id = marker_name
         self._managed_articulated_agent.open_gripper()
@@ -315,6 +318,8 @@ class RearrangeGraspManager:
                 f"Tried snapping to {snap_obj_id} when already snapped to {self._snapped_obj_id}"
             )
 
+        # Grasping changes the predicates evaluated later in this step.
+        self._sim.state_version += 1
         if force:
             self._snapped_obj_id = snap_obj_id
             # Set the transformation to be in the robot's hand already.
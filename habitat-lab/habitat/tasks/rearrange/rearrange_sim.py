@@ -3,12 +3,13 @@
 # Copyright (c) Meta Platforms, Inc. and its affiliates.
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
+import hashlib
 import json
 import os
 import re
 import os.path as osp
 import time
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from typing import (
     TYPE_CHECKING,
     Any,
@@ -89,6 +90,20 @@ class RearrangeSim(HabitatSim):
         self.ep_info: Optional[RearrangeEpisode] = None
         self.prev_loaded_navmesh = None
         self.prev_scene_id: Optional[str] = None
+        # Per-footprint pathfinders of the agents, see `get_agent_pathfinder`.
+        self._agent_pathfinder_cache: "OrderedDict[Tuple[str, str, Tuple], habitat_sim.nav.PathFinder]" = OrderedDict()
+        self._agent_pathfinder_cache_size = 16
+        self.agent_pathfinder_cache_stats: Dict[str, int] = defaultdict(int)
+        # Incremented whenever a navmesh is loaded or recomputed, so the paths
+        # cached by the navigation actions (`NavPathCache`) are invalidated.
+        self.navmesh_version = 0
+        # Hits and misses of the navigation actions path caches since the
+        # last call to `get_runtime_perf_stats`.
+        self.nav_path_cache_stats: Dict[str, int] = defaultdict(int)
+        # Incremented whenever the simulator state may have changed (step,
+        # reset, set_state, task actions, grasping), so caches of quantities derived from the state,
+        # like the PDDL predicate truth values, can be invalidated.
+        self.state_version = 0
 
         # Number of physics updates per action
         self.ac_freq_ratio = self.habitat_config.ac_freq_ratio
@@ -276,6 +291,7 @@ class RearrangeSim(HabitatSim):
 
     @add_perf_timing_func()
     def reset(self):
+        self.state_version += 1
         SimulatorBackend.reset(self)
         for i in range(len(self.agents)):
             self.reset_agent(i)
@@ -284,6 +300,7 @@ class RearrangeSim(HabitatSim):
     @add_perf_timing_func()
     def reconfigure(self, config: "DictConfig", ep_info: RearrangeEpisode):
         self._handle_to_goal_name = ep_info.info["object_labels"]
+        self.state_version += 1
 
         self.ep_info = ep_info
         mp3d = 'dataset' in ep_info.info and ep_info.info['dataset'] == 'mp3d'
@@ -544,8 +561,7 @@ class RearrangeSim(HabitatSim):
                 [[transform[j][i] for j in range(4)] for i in range(4)]
             )
 
-    @add_perf_timing_func()
-    def _load_navmesh(self, ep_info):
+    def _get_navmesh_path(self, ep_info) -> str:
         scene_name = ep_info.scene_id.split("/")[-1].split(".")[0]
         base_dir = osp.join(*ep_info.scene_id.split("/")[:2])
 
@@ -554,9 +570,15 @@ class RearrangeSim(HabitatSim):
         if 'dataset' in ep_info.info and ep_info.info['dataset'] == 'mp3d':
             base_dir = ep_info.scene_id.split(".")[:-1][0]
             navmesh_path = base_dir + ".navmesh"
+        return navmesh_path
+
+    @add_perf_timing_func()
+    def _load_navmesh(self, ep_info):
+        navmesh_path = self._get_navmesh_path(ep_info)
 
         if osp.exists(navmesh_path):
             self.pathfinder.load_nav_mesh(navmesh_path)
+            self.navmesh_version += 1
             logger.info(f"Loaded navmesh from {navmesh_path}")
         else:
             logger.warning(
@@ -955,6 +977,7 @@ class RearrangeSim(HabitatSim):
           TODO: This should probably be True by default, but I am not sure the effect
           it will have.
         """
+        self.state_version += 1
         rom = self.get_rigid_object_manager()
 
         if state["articulated_agent_T"] is not None:
@@ -1016,6 +1039,7 @@ class RearrangeSim(HabitatSim):
 
     @add_perf_timing_func()
     def step(self, action: Union[str, int]) -> Observations:
+        self.state_version += 1
         rom = self.get_rigid_object_manager()
 
         if self._debug_render:
@@ -1194,6 +1218,132 @@ class RearrangeSim(HabitatSim):
             ]
         )
 
+    @staticmethod
+    def _navmesh_settings_key(navmesh_settings: NavMeshSettings) -> Tuple:
+        """
+        All the (name, value) fields of the navmesh settings, as a hashable key.
+        """
+        items = []
+        for name in sorted(dir(navmesh_settings)):
+            if name.startswith("_"):
+                continue
+            value = getattr(navmesh_settings, name)
+            if callable(value):
+                continue
+            if isinstance(value, float):
+                value = round(value, 6)
+            elif not isinstance(value, (bool, int, str)):
+                value = repr(value)
+            items.append((name, value))
+        return tuple(items)
+
+    def _get_static_layout_hash(self) -> str:
+        """
+        Hash of the poses of the static rigid objects and the articulated
+        objects, which are baked into navmeshes computed with
+        `include_static_objects`.
+        """
+
+        def _pose(obj) -> Tuple:
+            rot = obj.rotation
+            return (
+                tuple(np.round(np.array(obj.translation), 3).tolist()),
+                tuple(np.round([*rot.vector, rot.scalar], 3).tolist()),
+            )
+
+        layout = []
+        rom = self.get_rigid_object_manager()
+        for handle, ro in sorted(
+            rom.get_objects_by_handle_substring().items()
+        ):
+            if ro.motion_type == MotionType.STATIC:
+                layout.append((handle, _pose(ro)))
+        # the agents themselves are not part of the layout
+        agent_handles = {
+            agent.sim_obj.handle
+            for agent in self.agents_mgr.articulated_agents_iter
+        }
+        aom = self.get_articulated_object_manager()
+        for handle, ao in sorted(
+            aom.get_objects_by_handle_substring().items()
+        ):
+            if handle in agent_handles:
+                continue
+            layout.append(
+                (
+                    handle,
+                    _pose(ao),
+                    tuple(np.round(ao.joint_positions, 3).tolist()),
+                )
+            )
+        return hashlib.sha1(repr(layout).encode()).hexdigest()
+
+    def get_agent_pathfinder(
+        self, navmesh_settings: NavMeshSettings
+    ) -> habitat_sim.nav.PathFinder:
+        """
+        Returns a pathfinder for an agent footprint (radius, height, climb,
+        slope, ...) given by `navmesh_settings`, for the current scene.
+
+        Pathfinders are cached by (scene id, static object layout hash,
+        navmesh settings), in memory (LRU) and on disk next to the scene
+        navmesh loaded by `_load_navmesh`, so the navmesh of each robot type
+        is recomputed once per scene. The returned pathfinder is shared and
+        should not be modified.
+        """
+        assert self.ep_info is not None, "Call reconfigure first"
+        settings_key = self._navmesh_settings_key(navmesh_settings)
+        layout_hash = (
+            self._get_static_layout_hash()
+            if navmesh_settings.include_static_objects
+            else ""
+        )
+        key = (self.ep_info.scene_id, layout_hash, settings_key)
+
+        pf = self._agent_pathfinder_cache.get(key)
+        if pf is not None:
+            self._agent_pathfinder_cache.move_to_end(key)
+            self.agent_pathfinder_cache_stats["memory_hits"] += 1
+            return pf
+
+        pf = habitat_sim.nav.PathFinder()
+        key_hash = hashlib.sha1(
+            repr((layout_hash, settings_key)).encode()
+        ).hexdigest()[:16]
+        navmesh_path = self._get_navmesh_path(self.ep_info)
+        cache_path = (
+            navmesh_path[: -len(".navmesh")] + f".{key_hash}.navmesh"
+        )
+        if osp.exists(cache_path) and pf.load_nav_mesh(cache_path):
+            self.navmesh_version += 1
+            self.agent_pathfinder_cache_stats["disk_hits"] += 1
+        else:
+            assert self.recompute_navmesh(
+                pf, navmesh_settings
+            ), "failed to recompute navmesh"
+            self.agent_pathfinder_cache_stats["recomputes"] += 1
+            try:
+                os.makedirs(osp.dirname(cache_path), exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                pf.save_nav_mesh(tmp_path)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                logger.warning(
+                    f"Failed to cache the agent navmesh to {cache_path}: {e}"
+                )
+
+        self._agent_pathfinder_cache[key] = pf
+        while (
+            len(self._agent_pathfinder_cache)
+            > self._agent_pathfinder_cache_size
+        ):
+            self._agent_pathfinder_cache.popitem(last=False)
+        return pf
+
+    def recompute_navmesh(self, *args, **kwargs) -> bool:
+        self.navmesh_version += 1
+        return super().recompute_navmesh(*args, **kwargs)
+
     def add_perf_timing(self, desc: str, t_start: float) -> None:
         """
         Records a duration since `t_start` into the perf stats. Note that this
@@ -1212,8 +1362,17 @@ class RearrangeSim(HabitatSim):
         stats_dict = {}
         for name, value in self._extra_runtime_perf_stats.items():
             stats_dict[name] = value
-        # clear this dict so we don't accidentally collect these twice
+        num_path_queries = sum(self.nav_path_cache_stats.values())
+        if num_path_queries > 0:
+            for name, value in self.nav_path_cache_stats.items():
+                stats_dict[f"nav_path_cache.{name}"] = value
+            stats_dict["nav_path_cache.hit_rate"] = (
+                self.nav_path_cache_stats["hits"] / num_path_queries
+            )
+        # clear these dicts so we don't accidentally collect these twice
         self._extra_runtime_perf_stats = defaultdict(float)
+        # cleared in place, the path caches hold a reference to it
+        self.nav_path_cache_stats.clear()
 
         return stats_dict
 
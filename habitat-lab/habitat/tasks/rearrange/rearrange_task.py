@@ -329,6 +329,19 @@ class RearrangeTask(NavigationTask):
             and min_dist < self._obj_succ_thresh
         )
 
+    def _step_single_action(
+        self,
+        action_name: Any,
+        action: Dict[str, Any],
+        episode: Episode,
+    ):
+        obs = super()._step_single_action(action_name, action, episode)
+        # The action may have changed the simulator state (base, arm,
+        # grasp, PDDL post conditions) before the simulator is stepped, so
+        # the following actions must not see the state cached before it.
+        self._sim.state_version += 1
+        return obs
+
     def step(self, action: Dict[str, Any], episode: Episode):
         action_args = action["action_args"]
         if self._enable_safe_drop and self._is_violating_safe_drop(
@@ -318,6 +318,127 @@ def batch_transform_point(
     return np.array(transformed_points, dtype=dtype)
 
 
+class NavPathCache:
+    """
+    Caches the paths found by an agent navigation action, so that the
+    pathfinder is only queried again when the cached path is no longer valid.
+
+    A cached path is reused while the agent stays within a corridor of
+    `tolerance` meters (in the XZ plane) around the remaining segment of the
+    path, and the waypoints the agent reached or passed are dropped. A new
+    path is searched when the agent leaves the corridor, the target changes
+    or the navmesh changes (`navmesh_version`).
+
+    :param tolerance: Max horizontal distance of the agent to the path.
+    :param height_tolerance: Max vertical deviation of the agent from the path,
+        e.g. when falling to another floor.
+    :param reach_dist: Distance at which a waypoint counts as reached.
+    :param stats: Optional dict the "hits" and "misses" counts are added to.
+    """
+
+    def __init__(
+        self,
+        tolerance: float = 0.2,
+        height_tolerance: float = 0.5,
+        reach_dist: float = 0.05,
+        stats: Optional[dict] = None,
+    ):
+        self.tolerance = tolerance
+        self.height_tolerance = height_tolerance
+        self.reach_dist = reach_dist
+        self.stats = stats
+        # Cached path per pathfinder:
+        # id(pathfinder) -> (navmesh version, target, points, next waypoint index, height offset)
+        self._paths: dict = {}
+
+    def clear(self) -> None:
+        self._paths = {}
+
+    def _count(self, key: str) -> None:
+        if self.stats is not None:
+            self.stats[key] += 1
+
+    def find_path(
+        self,
+        pathfinder: habitat_sim.nav.PathFinder,
+        agent_pos: np.ndarray,
+        target: np.ndarray,
+        navmesh_version: int = 0,
+    ) -> List[np.ndarray]:
+        """
+        Returns the path from `agent_pos` to `target`, starting at `agent_pos`.
+        Like `pathfinder.find_path`, the straight line `[agent_pos, target]`
+        is returned if no path is found.
+        """
+        agent_pos = np.array(agent_pos, dtype=np.float32)
+        target = np.array(target, dtype=np.float32)
+        entry = self._paths.get(id(pathfinder))
+        if (
+            entry is not None
+            and entry[0] == navmesh_version
+            and np.allclose(entry[1], target, atol=1e-4)
+        ):
+            remaining = self._follow(entry, agent_pos)
+            if remaining is not None:
+                self._count("hits")
+                return [agent_pos] + remaining
+        self._count("misses")
+
+        path = habitat_sim.ShortestPath()
+        path.requested_start = agent_pos
+        path.requested_end = target
+        if not pathfinder.find_path(path) or len(path.points) < 2:
+            self._paths.pop(id(pathfinder), None)
+            return [agent_pos, target]
+        points = [np.array(p, dtype=np.float32) for p in path.points]
+        # The path starts at the agent position snapped to the navmesh
+        height_offset = agent_pos[1] - points[0][1]
+        self._paths[id(pathfinder)] = [
+            navmesh_version,
+            target,
+            points,
+            1,
+            height_offset,
+        ]
+        return [agent_pos] + points[1:]
+
+    def _follow(
+        self, entry: list, agent_pos: np.ndarray
+    ) -> Optional[List[np.ndarray]]:
+        """
+        Advances the next waypoint of the cached path `entry` past the ones
+        reached by the agent, returns the remaining waypoints or None if the
+        agent left the corridor of the path.
+        """
+        _, _, points, next_idx, height_offset = entry
+        pos = agent_pos - np.array([0.0, height_offset, 0.0], dtype=np.float32)
+        while True:
+            start, end = points[next_idx - 1], points[next_idx]
+            seg = (end - start)[[0, 2]]
+            seg_len_sq = float(np.dot(seg, seg))
+            if seg_len_sq > 0:
+                t = float(np.dot((pos - start)[[0, 2]], seg)) / seg_len_sq
+            else:
+                t = 1.0
+            reached = t >= 1.0 or (
+                np.linalg.norm((end - pos)[[0, 2]]) < self.reach_dist
+            )
+            if reached and next_idx < len(points) - 1:
+                next_idx += 1
+                continue
+            break
+
+        t = min(max(t, 0.0), 1.0)
+        closest = start + t * (end - start)
+        if (
+            np.linalg.norm((pos - closest)[[0, 2]]) > self.tolerance
+            or abs(pos[1] - closest[1]) > self.height_tolerance
+        ):
+            return None
+        entry[3] = next_idx
+        return points[next_idx:]
+
+
 try:
     import pybullet as p
 except ImportError:
@@ -9,6 +9,7 @@ __all__ = [
     "geometry_utils",
     "common",
     "env_utils",
+    "event_log",
     "pickle5_multiprocessing",
     "profiling_wrapper",
 ]
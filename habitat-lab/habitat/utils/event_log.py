@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+r"""Append-only JSONL event log for experiment outputs (episode step counts,
+LLM chat histories, token usage, ...).
+
+Instead of re-reading and rewriting a whole JSON file on every update, each
+update is appended as one JSON line to a per-process shard
+``events.<host>.<pid>.<start_ms>.jsonl`` by a background writer thread, with
+a periodic fsync. Processes never write to the same file, so vector env
+workers do not race. The JSON files are rebuilt from the shards every
+``compact_interval`` seconds and when the :ref:`EventLog` is closed, so a
+killed run loses at most the last interval. They can also be rebuilt by
+hand with::
+
+    python -m habitat.utils.event_log <log_dir> [--remove-shards]
+
+Events:
+
+- ``json_update``: set ``key`` to ``value`` in the JSON dict at ``path``.
+- ``json_extend``: append ``items`` to the JSON list at ``path``, starting
+  from an empty list on the first event of ``path`` or if ``reset`` is set.
+
+An event log is opened and closed by its owner, e.g. an :ref:`Env` for its
+episode logs or an evaluator for the chat histories of its run, and passed
+explicitly to the code logging to it. Logging to a closed event log raises
+:py:`ValueError`.
+"""
+
+import argparse
+import atexit
+import fcntl
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type
+
+from habitat.core.logging import logger
+
+SHARD_PATTERN = "events.*.jsonl"
+COMPACT_LOCK_NAME = "compact.lock"
+
+_STOP = object()
+
+
+class EventLog:
+    r"""Per-process writer of a JSONL event log shard.
+
+    :param log_dir: directory of the shards.
+    :param fsync_interval: seconds between fsyncs of written events.
+    :param compact_interval: seconds between rebuilds of the JSON files of
+        log_dir while events are written, never if :py:`None`.
+    :param compact_on_close: rebuild the JSON files of log_dir on
+        :ref:`close`.
+    """
+
+    def __init__(
+        self,
+        log_dir: str,
+        fsync_interval: float = 5.0,
+        compact_interval: Optional[float] = 60.0,
+        compact_on_close: bool = True,
+    ) -> None:
+        self.log_dir = os.path.abspath(log_dir)
+        self.fsync_interval = fsync_interval
+        self.compact_interval = compact_interval
+        self.compact_on_close = compact_on_close
+        self.pid = os.getpid()
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.shard_path = os.path.join(
+            self.log_dir,
+            f"events.{socket.gethostname()}.{self.pid}.{int(time.time() * 1000)}.jsonl",
+        )
+        self._file = open(self.shard_path, "a", encoding="utf-8")
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="event-log-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(
+        self,
+        event_type: str,
+        json_encoder: Optional[Type[json.JSONEncoder]] = None,
+        **payload: Any,
+    ) -> None:
+        r"""Append an event. The payload is serialized right away, so it may
+        be modified after the call.
+        """
+        event = {"type": event_type, "time": time.time(), **payload}
+        line = json.dumps(event, cls=json_encoder) + "\n"
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Event log {self.log_dir} is closed")
+            self._queue.put(line)
+
+    def json_update(self, path: str, key: str, value: Any, indent: int = 4, **kwargs: Any) -> None:
+        self.log(
+            "json_update",
+            path=os.path.abspath(path),
+            key=key,
+            value=value,
+            indent=indent,
+            **kwargs,
+        )
+
+    def json_extend(
+        self,
+        path: str,
+        items: List[Any],
+        reset: bool = False,
+        indent: int = 4,
+        **kwargs: Any,
+    ) -> None:
+        self.log(
+            "json_extend",
+            path=os.path.abspath(path),
+            items=items,
+            reset=reset,
+            indent=indent,
+            **kwargs,
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        r"""Block until all events logged so far are written and fsynced."""
+        with self._lock:
+            if self._closed:
+                return
+            barrier = threading.Event()
+            self._queue.put(barrier)
+        barrier.wait(timeout)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        r"""Write the remaining events and rebuild the JSON files of the log
+        directory if :p:`compact_on_close`.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+        atexit.unregister(self.close)
+        if self.compact_on_close:
+            compact_event_log(self.log_dir)
+
+    def _run(self) -> None:
+        last_fsync = last_compact = time.time()
+        unsynced = uncompacted = False
+        while True:
+            try:
+                items = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                items = []
+            # write everything queued so far in one go
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [item for item in items if isinstance(item, str)]
+            if lines:
+                self._file.write("".join(lines))
+                self._file.flush()
+                unsynced = uncompacted = True
+
+            barriers = [item for item in items if isinstance(item, threading.Event)]
+            stop = any(item is _STOP for item in items)
+            if unsynced and (
+                barriers or stop or time.time() - last_fsync >= self.fsync_interval
+            ):
+                os.fsync(self._file.fileno())
+                last_fsync = time.time()
+                unsynced = False
+            for barrier in barriers:
+                barrier.set()
+            if stop:
+                return
+            if (
+                uncompacted
+                and self.compact_interval is not None
+                and time.time() - last_compact >= self.compact_interval
+            ):
+                try:
+                    compact_event_log(self.log_dir)
+                except Exception as e:
+                    # keep writing events, the next compaction retries
+                    logger.warning(
+                        f"Compacting event log {self.log_dir} failed: {e}"
+                    )
+                last_compact = time.time()
+                uncompacted = False
+
+
+def _read_shard(shard_path: str) -> List[Dict[str, Any]]:
+    events = []
+    with open(shard_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                # last line of a process that was killed while writing
+                continue
+    return events
+
+
+def compact_event_log(log_dir: str, remove_shards: bool = False) -> List[str]:
+    r"""Rebuild the JSON files from the events of all shards in log_dir, in
+    the order the events were logged. Processes compacting the same
+    log_dir take turns, so the last one writes the events of all of them.
+    Compacting again gives the same files, so it can run while events are
+    still being written.
+
+    :return: paths of the written JSON files.
+    """
+    if not os.path.isdir(log_dir):
+        return []
+    with open(os.path.join(log_dir, COMPACT_LOCK_NAME), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            return _compact_event_log(log_dir, remove_shards)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _compact_event_log(log_dir: str, remove_shards: bool) -> List[str]:
+    shard_paths = sorted(glob.glob(os.path.join(log_dir, SHARD_PATTERN)))
+    events = []
+    for shard_idx, shard_path in enumerate(shard_paths):
+        for event_idx, event in enumerate(_read_shard(shard_path)):
+            events.append((event["time"], shard_idx, event_idx, event))
+    events.sort(key=lambda item: item[:3])
+
+    outputs: Dict[str, Any] = {}
+    indents: Dict[str, int] = {}
+    for _, _, _, event in events:
+        path = event["path"]
+        indents[path] = event.get("indent", 4)
+        if event["type"] == "json_update":
+            if path not in outputs:
+                outputs[path] = {}
+                if os.path.exists(path):
+                    with open(path, "r") as f:
+                        outputs[path] = json.load(f)
+            outputs[path][event["key"]] = event["value"]
+        elif event["type"] == "json_extend":
+            # the file may hold the items of a previous compaction already
+            if event.get("reset", False) or path not in outputs:
+                outputs[path] = []
+            outputs[path].extend(event["items"])
+        else:
+            raise ValueError(f"Unknown event type {event['type']}")
+
+    for path, data in outputs.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=indents[path])
+        os.replace(tmp_path, path)
+
+    if remove_shards:
+        for shard_path in shard_paths:
+            os.remove(shard_path)
+    return list(outputs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Rebuild JSON outputs from the JSONL event log shards"
+    )
+    parser.add_argument("log_dir")
+    parser.add_argument(
+        "--remove-shards",
+        action="store_true",
+        help="Delete the shards after compaction",
+    )
+    args = parser.parse_args()
+    paths = compact_event_log(args.log_dir, remove_shards=args.remove_shards)
+    print(f"Wrote {len(paths)} files from {args.log_dir}")
+
+
+if __name__ == "__main__":
+    main()
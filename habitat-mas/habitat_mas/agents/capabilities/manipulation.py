@@ -1,77 +1,164 @@
-from typing import Tuple
+from typing import Dict, List, Tuple
+import hashlib
 import os
+import tempfile
 import numpy as np
-from habitat.config.default_structured_configs import ThirdRGBSensorConfig, HeadRGBSensorConfig
-from habitat.config.default_structured_configs import AgentConfig
-from habitat.config.default_structured_configs import (   
-    ArmActionConfig,
-    BaseVelocityNonCylinderActionConfig,
-    OracleNavActionConfig
-)
-from habitat.tasks.rearrange.rearrange_sim import RearrangeSim
-from habitat.articulated_agents.robots.fetch_robot import FetchRobot
-from habitat.articulated_agents.robots.spot_robot import SpotRobot
-from habitat.articulated_agents.robots.stretch_robot import StretchRobot
+import magnum as mn
 from habitat.tasks.rearrange.rearrange_sim import RearrangeSim
-from habitat.tasks.rearrange.utils import IkHelper
 
-from habitat_mas.agents.sim_utils import make_cfg, default_sim_settings
+from habitat_mas.agents.capabilities.parse_urdf import (
+    parse_urdf,
+    get_joint_by_child_link,
+    sample_joint_positions,
+    BatchedChainFK
+)
 from habitat_mas.agents.robots.defaults import (
-    data_dir,
     robot_urdf_paths,
-    robot_arm_urdf_paths
+    robot_arm_params,
+    robot_base_offset_map,
+    get_robot_link_id2name_map
 )
-from habitat_mas.test.data_utils import init_rearrange_env
+from habitat_mas.dataset.defaults import habitat_mas_cache_dir
+
+# cache of end effector positions computed by forward kinematics, keyed by URDF hash and sampling
+arm_workspace_cache_dir = os.path.join(habitat_mas_cache_dir, "arm_workspace")
+_ee_positions_cache: Dict[str, np.ndarray] = {}
+
+# URDF is z-up, habitat is y-up: (x, y, z) -> (x, z, -y), the -pi/2 rotation around x that 
+# the base transformation of the agents in the simulator includes
+urdf_to_habitat_rotation = np.array([
+    [1.0, 0.0, 0.0],
+    [0.0, 0.0, 1.0],
+    [0.0, -1.0, 0.0],
+])
+
+def compute_ee_positions(
+    robot_type: str,
+    urdf_path: str = None,
+    arm_link_names: List[str] = None,
+    ee_link_name: str = None,
+    ee_offset: np.ndarray = None,
+    num_bins=5,
+    num_samples=None,
+    sampling="grid",
+    seed=0,
+    use_cache=True,
+) -> np.ndarray:
+    """
+    Compute end effector positions of the robot arm over sampled arm joint positions, 
+    by batched forward kinematics of the robot URDF without a simulator.
+    
+    Results are cached per URDF content and sampling settings, in memory and on disk.
+    
+    Arguments:
+        robot_type: FetchRobot, SpotRobot or StretchRobot, or any name if the arm chain is given
+        urdf_path: path to the robot URDF, the default URDF of the robot type if None
+        arm_link_names: child links of the arm joints, from robot_arm_params if None
+        ee_link_name: end effector link, from robot_arm_params if None
+        ee_offset: end effector offset in the end effector link frame, from robot_arm_params if None
+        num_bins, num_samples, sampling, seed: see sample_joint_positions
+        use_cache: whether to read and write the cache
+    Returns:
+        end_effector_positions: np.ndarray (N, 3), w.r.t. the robot base link in URDF 
+            coordinates (z-up)
+    """
+    if urdf_path is None:
+        urdf_path = robot_urdf_paths[robot_type]
+    if arm_link_names is None or ee_link_name is None or ee_offset is None:
+        arm_params = robot_arm_params[robot_type]
+        link_id2name = get_robot_link_id2name_map(robot_type)
+        if arm_link_names is None:
+            arm_link_names = [link_id2name[link_id] for link_id in arm_params["arm_link_ids"]]
+        if ee_link_name is None:
+            ee_link_name = link_id2name[arm_params["ee_link_id"]]
+        if ee_offset is None:
+            ee_offset = arm_params["ee_offset"]
+    ee_offset = np.asarray(ee_offset, dtype=np.float64)
+
+    with open(urdf_path, "rb") as f:
+        urdf_hash = hashlib.sha1(f.read()).hexdigest()
+    cache_key = hashlib.sha1(
+        repr((
+            "urdf_frame", urdf_hash, list(arm_link_names), ee_link_name, ee_offset.tolist(), 
+            num_bins, num_samples, sampling, seed
+        )).encode()
+    ).hexdigest()
+    cache_path = os.path.join(arm_workspace_cache_dir, f"{cache_key}.npy")
+    if use_cache:
+        if cache_key in _ee_positions_cache:
+            return _ee_positions_cache[cache_key].copy()
+        if os.path.exists(cache_path):
+            _ee_positions_cache[cache_key] = np.load(cache_path)
+            return _ee_positions_cache[cache_key].copy()
+    
+    urdf = parse_urdf(urdf_path)
+    arm_joint_names = [
+        get_joint_by_child_link(urdf, link_name).name for link_name in arm_link_names
+    ]
+    fk = BatchedChainFK(urdf, ee_link_name, arm_joint_names)
+    
+    joint_limits_lower, joint_limits_upper = fk.get_joint_limits()
+    joint_positions = sample_joint_positions(
+        joint_limits_lower, joint_limits_upper, num_bins=num_bins, 
+        num_samples=num_samples, sampling=sampling, seed=seed
+    )
+    end_effector_positions = fk.link_positions(joint_positions, offset=ee_offset)
+    
+    if use_cache:
+        _ee_positions_cache[cache_key] = end_effector_positions
+        # write to a temporary file first so concurrent readers never see partial files
+        os.makedirs(arm_workspace_cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=arm_workspace_cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, end_effector_positions)
+        os.replace(tmp_path, cache_path)
+        end_effector_positions = end_effector_positions.copy()
+    
+    return end_effector_positions
 
 def sample_ee_positions(
     sim: RearrangeSim,
     agent_id: int,
     num_bins=5,
     subtract_base=True,
+    sampling="grid",
+    num_samples=None,
 ) -> np.ndarray:
     """
     Sample end effector positions of the robot arm.
+    
+    The positions are computed by forward kinematics of the agent URDF (other joints than 
+    the arm joints at zero), then transformed by the current agent base transformation, 
+    which also rotates the z-up URDF frame to the y-up habitat frame.
+    The arm joints and end effector are the ones of the agent params, named by the simulator, 
+    so that robot variants with other link ids (e.g. FetchRobotNoWheels) are supported.
     """
-    end_effector_positions = []
-    ik_helper: IkHelper = sim.agents_mgr[agent_id].ik_helper
     agent = sim.agents_mgr[agent_id].articulated_agent
-    joint_limits_lower, joint_limits_uppper = ik_helper.get_joint_limits()
-
-    # Generate all joint position combinations, which is an N-dimensional grid, N is the number of joints
-    joint_positions = np.meshgrid(
-        *[
-            np.linspace(
-                joint_limits_lower[i], joint_limits_uppper[i], num_bins
-            )
-            for i in range(len(joint_limits_lower))
-        ]
+    params = agent.params
+    end_effector_positions = compute_ee_positions(
+        type(agent).__name__, 
+        urdf_path=agent.urdf_path, 
+        # the joint of each link has the id of the link
+        arm_link_names=[agent.sim_obj.get_link_name(link_id) for link_id in params.arm_joints],
+        ee_link_name=agent.sim_obj.get_link_name(params.ee_links[0]),
+        ee_offset=np.array(params.ee_offset[0]),
+        num_bins=num_bins, 
+        num_samples=num_samples, 
+        sampling=sampling,
     )
-
-    # Flatten the joint positions
-    joint_positions = np.array(
-        [joint_position.flatten() for joint_position in joint_positions]
-    ).T
-
-    # Iterate over the joint positions
-    for joint_position in joint_positions:
-
-        # Calculate the end effector position
-        agent.arm_joint_pos = joint_position
-        agent.fix_joint_values = joint_position
-        end_effector_position = agent.ee_transform().translation
-        # end_effector_position = agent.base_transformation.transform_point(ik_helper.calc_fk(joint_position))
-
-        # Append the end effector position to the list
-        end_effector_positions.append(end_effector_position)
-
-    # Convert the end effector positions to a numpy array
-    end_effector_positions = np.array(end_effector_positions)
+    
+    # transform from URDF base link frame to world frame, as base_transformation.transform_point
+    base_transformation = agent.base_transformation
+    base_rotation = np.stack([
+        np.array(base_transformation.transform_vector(mn.Vector3(*axis)))
+        for axis in np.eye(3)
+    ], axis=1)
+    base_pos = np.array(base_transformation.translation)
+    end_effector_positions = end_effector_positions @ base_rotation.T + base_pos
     
     # get robot feet position 
     if subtract_base:
-        base_pos = sim.agents_mgr[agent_id].articulated_agent.base_transformation.translation + \
-            sim.agents_mgr[agent_id].articulated_agent.params.base_offset
-        end_effector_positions -= base_pos
+        end_effector_positions -= base_pos + np.array(agent.params.base_offset)
         
     return end_effector_positions
 
@@ -131,84 +218,22 @@ def get_arm_workspace(
         raise ValueError("Invalid geometry")
 
 
-def get_all_robot_arm_workspace():
-    # Define the settings for the simulator
-    produce_debug_video = False
-    observations = []
-    cfg_settings = default_sim_settings.copy()
-    cfg_settings["scene"] = "NONE"
-    cfg_settings["enable_physics"] = True
-
-    # Create the simulator configuration
-    hab_cfg = make_cfg(cfg_settings)
-    # Define the robots to initialize
-
-    
+def get_all_robot_arm_workspace(num_bins=5, sampling="grid", num_samples=None):
+    """
+    Compute the ego-centric arm workspace of all robots w.r.t. their feet, 
+    by forward kinematics of their URDF without a simulator.
+    """
     robot_arm_workspace = {}
     
-    agent_configs = {
-        "FetchRobot": {
-            "arm_len": 7,
-            "pb_link_idx": 7
-        },
-        "SpotRobot": {
-            "arm_len": 7,
-            "pb_link_idx": 7
-        },
-        "StretchRobot": {
-            "arm_len": 8,
-            "pb_link_idx": 14
-        }
-    }
-    
-    for robot_type, robot_arm_urdf_path in robot_arm_urdf_paths.items():
-        # Get the robot class
-        robot_type = "FetchRobot"
-        robot_arm_urdf_path = os.path.join(data_dir, "robots/hab_fetch/robots/fetch_onlyarm.urdf")
-        # robot_type = "SpotRobot"
-        # robot_arm_urdf_path = os.path.join(data_dir, "robots/hab_spot_arm/urdf/hab_spot_onlyarm_dae.urdf")
-        # robot_type = "StretchRobot"
-        # robot_arm_urdf_path = os.path.join(data_dir, "robots/hab_stretch/urdf/hab_stretch_onlyarm.urdf")
-
-        # Define the agent configuration
-        agent_config = AgentConfig()
-        agent_config.articulated_agent_urdf = robot_urdf_paths[robot_type]
-        agent_config.articulated_agent_type = robot_type
-        agent_config.ik_arm_urdf = robot_arm_urdf_path
-        agent_config.arm_len = agent_configs[robot_type]["arm_len"]
-        agent_config.pb_link_idx = agent_configs[robot_type]["pb_link_idx"]
-
-
-        # Define sensors that will be attached to this agent, here a third_rgb sensor and a head_rgb.
-        # We will later talk about why we are giving the sensors these names
-        agent_config.sim_sensors = {
-            "third_rgb": ThirdRGBSensorConfig(),
-            "head_rgb": HeadRGBSensorConfig(),
-        }
-        agent_dict = {"main_agent": agent_config}
-        action_dict = {
-            "arm_ee_action": ArmActionConfig(
-                arm_controller="ArmEEAction",
-                grip_controller="MagicGraspAction",
-                # grip_controller="SuctionGraspAction",
-                # render_ee_target=True
-            ),
-            "base_velocity_non_cylinder_action": BaseVelocityNonCylinderActionConfig(),
-            "oracle_coord_action": OracleNavActionConfig(type="OracleNavCoordinateAction", 
-                spawn_max_dist_to_obj=1.0,
-                motion_control="base_velocity_non_cylinder",
-                navmesh_offset=[[0.0, 0.0], [0.25, 0.0], [-0.25, 0.0]]
-            )
-        }
-        
-        env = init_rearrange_env(agent_dict, action_dict)
-        # Initialize pybullet ikhelper
-        env.reset()
-        
-        # compute the both the  sphere and box arm workspace of the robot
-        end_effector_positions = sample_ee_positions(
-           env.sim, 0, num_bins=5, subtract_base=True
+    for robot_type in robot_arm_params.keys():
+        # compute the both the sphere and box arm workspace of the robot
+        end_effector_positions = compute_ee_positions(
+            robot_type, num_bins=num_bins, num_samples=num_samples, sampling=sampling
         )
+        # y-up w.r.t. the robot feet
+        end_effector_positions = end_effector_positions @ urdf_to_habitat_rotation.T
+        end_effector_positions -= robot_base_offset_map[robot_type]
+        
         # Calculate the center of the sphere
         center = np.mean(end_effector_positions, axis=0)
 
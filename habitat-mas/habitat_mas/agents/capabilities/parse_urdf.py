@@ -1,5 +1,5 @@
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 import magnum as mn
 from openai import OpenAI
@@ -176,6 +176,166 @@ def save_urdf_with_cameras(urdf_file_path: str, camera_params: Dict[str, Articul
     save_urdf(urdf, file_path)
 
 
+################# Batched Forward Kinematics #################
+
+def get_joint_by_child_link(urdf: URDF, link_name: str) -> Joint:
+    """Get the joint connecting a link to its parent link"""
+    for joint in urdf.joints:
+        if joint.child == link_name:
+            return joint
+    raise KeyError(f"No joint with child link {link_name} in URDF {urdf.name}")
+
+
+def _batched_rotations(axis, angles) -> np.ndarray:
+    """Homogeneous rotation matrices (N, 4, 4) about a unit axis by angles (N,), Rodrigues' formula"""
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis)
+    cross = np.array([
+        [0.0, -axis[2], axis[1]],
+        [axis[2], 0.0, -axis[0]],
+        [-axis[1], axis[0], 0.0],
+    ])
+    sin, cos = np.sin(angles)[:, None, None], np.cos(angles)[:, None, None]
+    transforms = np.tile(np.eye(4), (len(angles), 1, 1))
+    transforms[:, :3, :3] = np.eye(3) + sin * cross + (1 - cos) * (cross @ cross)
+    return transforms
+
+
+class BatchedChainFK:
+    """
+    Batched forward kinematics of the kinematic chain from the URDF base link to a link.
+    All joint configurations are evaluated at once with NumPy, without a simulator.
+    
+    Joints of the chain that are not in joint_names stay at zero, mimic joints follow
+    the joint they mimic.
+    """
+    
+    def __init__(self, urdf: URDF, link_name: str, joint_names: Optional[List[str]] = None):
+        # path from the link to the base link, as in urdf.link_fk
+        path = urdf._paths_to_base[urdf.link_map[link_name]]
+        self.chain: List[Joint] = [
+            urdf._G.get_edge_data(child, parent)["joint"]
+            for child, parent in zip(path[:-1], path[1:])
+        ][::-1]
+        
+        movable_joint_names = [joint.name for joint in self.chain if joint.joint_type != "fixed"]
+        if joint_names is None:
+            joint_names = [
+                joint.name for joint in self.chain 
+                if joint.joint_type != "fixed" and joint.mimic is None
+            ]
+        for joint_name in joint_names:
+            if joint_name not in movable_joint_names:
+                raise ValueError(f"Joint {joint_name} is not a movable joint between the base and {link_name}")
+        self.joint_names = list(joint_names)
+    
+    def get_joint_limits(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Lower and upper limits of the joints, continuous joints span [-pi, pi]"""
+        joint_map = {joint.name: joint for joint in self.chain}
+        lower, upper = [], []
+        for joint_name in self.joint_names:
+            joint = joint_map[joint_name]
+            if joint.joint_type == "continuous" or joint.limit is None:
+                lower.append(-np.pi)
+                upper.append(np.pi)
+            else:
+                lower.append(joint.limit.lower)
+                upper.append(joint.limit.upper)
+        return np.array(lower, dtype=np.float64), np.array(upper, dtype=np.float64)
+    
+    def link_transforms(self, joint_positions) -> np.ndarray:
+        """
+        Compute the link poses w.r.t. the base link.
+        
+        Arguments:
+            joint_positions: np.ndarray (N, J), positions of the joints in joint_names
+        Returns:
+            transforms: np.ndarray (N, 4, 4)
+        """
+        joint_positions = np.asarray(joint_positions, dtype=np.float64).reshape(-1, len(self.joint_names))
+        num_samples = len(joint_positions)
+        joint_columns = {name: joint_positions[:, i] for i, name in enumerate(self.joint_names)}
+        
+        transforms = np.tile(np.eye(4), (num_samples, 1, 1))
+        # consecutive static transforms are merged before the batched product
+        static = np.eye(4)
+        for joint in self.chain:
+            static = static @ joint.origin
+            if joint.joint_type == "fixed":
+                continue
+            
+            if joint.mimic is not None and joint.mimic.joint in joint_columns:
+                q = joint.mimic.multiplier * joint_columns[joint.mimic.joint] + joint.mimic.offset
+            elif joint.name in joint_columns:
+                q = joint_columns[joint.name]
+            else:
+                # joints at zero do not move the chain
+                continue
+            
+            if joint.joint_type in ["revolute", "continuous"]:
+                motion = _batched_rotations(joint.axis, q)
+            elif joint.joint_type == "prismatic":
+                motion = np.tile(np.eye(4), (num_samples, 1, 1))
+                motion[:, :3, 3] = q[:, None] * np.asarray(joint.axis, dtype=np.float64)
+            else:
+                raise NotImplementedError(f"Joint type {joint.joint_type} not supported")
+            transforms = transforms @ static @ motion
+            static = np.eye(4)
+        
+        return transforms @ static
+    
+    def link_positions(self, joint_positions, offset=None) -> np.ndarray:
+        """Positions (N, 3) of the link, or of a point at offset in the link frame, w.r.t. the base link"""
+        transforms = self.link_transforms(joint_positions)
+        if offset is None:
+            return transforms[:, :3, 3].copy()
+        return transforms[:, :3, :3] @ np.asarray(offset, dtype=np.float64) + transforms[:, :3, 3]
+
+
+def sample_joint_positions(
+    joint_limits_lower, 
+    joint_limits_upper, 
+    num_bins=5, 
+    num_samples=None, 
+    sampling="grid", 
+    seed=0
+) -> np.ndarray:
+    """
+    Sample joint positions within the joint limits.
+    
+    Arguments:
+        joint_limits_lower, joint_limits_upper: np.ndarray (J,)
+        num_bins: number of bins per joint of the grid
+        num_samples: number of samples of the sobol and random sampling, num_bins^J by default
+        sampling: "grid" for the full joint grid, "sobol" for a scrambled low-discrepancy 
+            sequence or "random" for uniform samples
+        seed: random seed of the sobol and random sampling
+    Returns:
+        joint_positions: np.ndarray (N, J)
+    """
+    lower = np.asarray(joint_limits_lower, dtype=np.float64)
+    upper = np.asarray(joint_limits_upper, dtype=np.float64)
+    num_joints = len(lower)
+    
+    if sampling == "grid":
+        # all joint position combinations, which is an N-dimensional grid, N is the number of joints
+        joint_positions = np.meshgrid(
+            *[np.linspace(lower[i], upper[i], num_bins) for i in range(num_joints)]
+        )
+        return np.array([joint_position.flatten() for joint_position in joint_positions]).T
+    
+    if num_samples is None:
+        num_samples = num_bins ** num_joints
+    if sampling == "sobol":
+        from scipy.stats import qmc
+        unit_samples = qmc.Sobol(d=num_joints, scramble=True, seed=seed).random(num_samples)
+    elif sampling == "random":
+        unit_samples = np.random.default_rng(seed).random((num_samples, num_joints))
+    else:
+        raise ValueError(f"Invalid sampling {sampling}")
+    return lower + unit_samples * (upper - lower)
+
+
 ################# LLM URDF Understanding #################
 
 def generate_tree_text_with_edge_types(graph, root):
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Hashable, List, Optional, Tuple
 
 from .crab_core import Action
 from ..utils.models import OpenAIModel
@@ -20,16 +20,20 @@ ROBOT_EXECUTION_SYSTEM_PROMPT_TEMPLATE = (
 
 
 class CrabAgent:
-    message_pipe: dict[str, list[str]] = {}
+    # requests between agents, keyed by (message scope, target agent name)
+    message_pipe: dict[Tuple[Hashable, str], list[str]] = {}
 
     def __init__(
         self,
         name: str,
         actions: List[Action],
         code_execution: bool = False,
+        message_scope: Hashable = None,
         **kwargs,
     ):
         self.name = name
+        # agents only exchange requests within the same scope, e.g. the same environment
+        self.message_scope = message_scope
         self.actions = actions
         self.code_execution = code_execution
         self.enable_logging =  kwargs.get("enable_logging", False)
@@ -52,6 +56,7 @@ class CrabAgent:
         chat_history: Optional[List] = None,
         enable_logging: bool = False,
         logging_file: str = "",
+        event_log=None,
     ):
         """This function is a hack to initialize agent after the object is created"""
         self.robot_type = robot_type
@@ -71,7 +76,8 @@ class CrabAgent:
             code_execution=self.code_execution,
             enable_logging=enable_logging,
             logging_file=logging_file,
-            agent_name=self.name
+            agent_name=self.name,
+            event_log=event_log,
         )
         
         # Inject chat history from group discussion phase
@@ -84,6 +90,8 @@ class CrabAgent:
 
         self.initialized = True
         self.start_act = False
+        # drop requests left over from the previous episode
+        CrabAgent.message_pipe.pop((self.message_scope, self.name), None)
 
         # Guide agent to decouple subtasks into actions
         if len(subtask_description) > 0:
@@ -107,10 +115,11 @@ class CrabAgent:
         print(response)
 
     def chat(self, observation: str) -> Optional[dict]:
-        if self.name in CrabAgent.message_pipe and CrabAgent.message_pipe[self.name]:
-            prompt = " ".join(CrabAgent.message_pipe[self.name])
+        pipe_key = (self.message_scope, self.name)
+        if pipe_key in CrabAgent.message_pipe and CrabAgent.message_pipe[pipe_key]:
+            prompt = " ".join(CrabAgent.message_pipe[pipe_key])
             observation = str(observation) + " " + prompt
-            CrabAgent.message_pipe[self.name] = []
+            CrabAgent.message_pipe[pipe_key] = []
 
         action_name, parameters = self.llm_model.chat(str(observation))
         if action_name == "send_request":
@@ -118,10 +127,11 @@ class CrabAgent:
             if target_agent == self.name:  # send request to itself
                 return None
             request = parameters["request"]
-            if target_agent not in CrabAgent.message_pipe:
-                CrabAgent.message_pipe[target_agent] = []
+            target_key = (self.message_scope, target_agent)
+            if target_key not in CrabAgent.message_pipe:
+                CrabAgent.message_pipe[target_key] = []
             prompt = REQUEST_TEMPLATE.format(source_agent=self.name, request=request)
-            CrabAgent.message_pipe[target_agent].append(prompt)
+            CrabAgent.message_pipe[target_key].append(prompt)
             return {"name": "wait", "arguments": ["500"]}
         if action_name == "wait":
             return {"name": "wait", "arguments": ["500"]}
@@ -41,6 +41,26 @@ robot_base_offset_map = {
     "DJIDrone": np.array([0, -1.5, 0]),
 }
 
+# The arm links (link ids in the simulator, the joint of each link is an arm joint) and the 
+# end effector link and offset of the robots, same as their MobileManipulatorParams.
+robot_arm_params = {
+    "FetchRobot": {
+        "arm_link_ids": list(range(15, 22)),
+        "ee_link_id": 22,
+        "ee_offset": np.array([0.08, 0, 0]),
+    },
+    "SpotRobot": {
+        "arm_link_ids": list(range(0, 7)),
+        "ee_link_id": 7,
+        "ee_offset": np.array([0.08, 0, 0]),
+    },
+    "StretchRobot": {
+        "arm_link_ids": [23, 25, 26, 27, 28, 31, 33, 34],
+        "ee_link_id": 37,
+        "ee_offset": np.array([0.08, 0, 0]),
+    },
+}
+
 # Pre-computed ego-centric arm workspace, w.r.t. base footprint link. TOO SLOW to compute in real-time.
 robot_arm_workspaces = {
     'FetchRobot': {
@@ -3,3 +3,12 @@ import os
 cur_dir = os.path.dirname(__file__)
 # habitat data dir 
 habitat_mas_data_dir = os.path.join(cur_dir, "../data")
+# cache dir for derived artifacts, e.g. navmesh adjacency and segmentation, 
+# HABITAT_MAS_CACHE_DIR or the user cache dir, never inside the installed package
+habitat_mas_cache_dir = os.environ.get(
+    "HABITAT_MAS_CACHE_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), 
+        "habitat_mas"
+    ),
+)
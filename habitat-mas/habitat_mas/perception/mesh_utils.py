@@ -2,10 +2,80 @@ import os
 from typing import Optional, Dict, List
 import numpy as np
 import open3d as o3d 
-from collections import deque
 import networkx as nx
 
 
+def compute_triangle_adjacency_csr(triangles):
+    """
+    Computes the triangle adjacency of a mesh based on shared edges, in CSR format.
+
+    Every triangle contributes its three undirected edges (vertex ids sorted), the edges
+    are hashed to a single integer key and sorted, so triangles sharing an edge end up
+    in the same group. This runs in O(T log T) instead of comparing all triangle pairs.
+    Two triangles are neighbors if they share exactly two vertices, same as before.
+
+    :param triangles: An array-like of shape (T, 3) with the vertex indices of each triangle.
+    :return: A tuple (indptr, indices), where the neighbors of triangle i are
+        indices[indptr[i]:indptr[i + 1]], sorted in ascending order.
+    """
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    num_triangles = len(triangles)
+    if num_triangles == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Three undirected edges per triangle, with sorted vertex ids
+    edges = np.sort(triangles[:, [[0, 1], [1, 2], [2, 0]]].reshape(-1, 2), axis=1)
+    edge_triangles = np.repeat(np.arange(num_triangles, dtype=np.int64), 3)
+
+    # Hash each edge to a scalar key, drop degenerate edges and repeated edges of the same triangle
+    num_vertices = int(triangles.max()) + 1
+    edge_keys = edges[:, 0] * num_vertices + edges[:, 1]
+    valid = edges[:, 0] != edges[:, 1]
+    edge_keys, edge_triangles = edge_keys[valid], edge_triangles[valid]
+    if len(edge_keys) == 0:
+        # Only degenerate triangles, none of them has a neighbor
+        return np.zeros(num_triangles + 1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    order = np.lexsort((edge_triangles, edge_keys))
+    edge_keys, edge_triangles = edge_keys[order], edge_triangles[order]
+    is_first = np.r_[True, (edge_keys[1:] != edge_keys[:-1]) | (edge_triangles[1:] != edge_triangles[:-1])]
+    edge_keys, edge_triangles = edge_keys[is_first], edge_triangles[is_first]
+
+    # Group triangles sharing the same edge (rows are already sorted by edge key)
+    group_starts = np.flatnonzero(np.r_[True, edge_keys[1:] != edge_keys[:-1]])
+    group_sizes = np.diff(np.r_[group_starts, len(edge_keys)])
+    element_group = np.repeat(np.arange(len(group_starts)), group_sizes)
+
+    # Emit all ordered triangle pairs within each group
+    repeats = group_sizes[element_group]
+    src = np.repeat(np.arange(len(edge_keys)), repeats)
+    offsets = np.arange(len(src)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    dst = np.repeat(group_starts[element_group], repeats) + offsets
+    pair_src, pair_dst = edge_triangles[src], edge_triangles[dst]
+    not_self = pair_src != pair_dst
+    pair_keys = pair_src[not_self] * num_triangles + pair_dst[not_self]
+
+    # Triangles sharing more than one edge share all three vertices, they are not neighbors
+    pair_keys, pair_counts = np.unique(pair_keys, return_counts=True)
+    pair_keys = pair_keys[pair_counts == 1]
+
+    indices = pair_keys % num_triangles
+    indptr = np.zeros(num_triangles + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_keys // num_triangles, minlength=num_triangles), out=indptr[1:])
+    return indptr, indices
+
+
+def csr_to_adjacency_list(indptr, indices):
+    """
+    Converts a CSR-style adjacency (indptr, indices) to a list of neighbor lists.
+
+    :param indptr: An array of shape (T + 1,) with the row offsets into indices.
+    :param indices: An array with the neighbor indices of all rows.
+    :return: A list of lists, where each list contains the neighbor indices of each row.
+    """
+    indices = np.asarray(indices)
+    return [indices[start:end].tolist() for start, end in zip(indptr[:-1], indptr[1:])]
+
+
 def compute_triangle_adjacency(triangles):
     """
     Computes the adjacency list for triangles in a mesh based on shared edges.
@@ -13,92 +83,184 @@ def compute_triangle_adjacency(triangles):
     :param triangles: A list of triangles, where each triangle is represented by a tuple or list of vertex indices.
     :return: A list of lists, where each list contains the indices of neighboring triangles for each triangle.
     """
-    # TODO: Improve the algorithm for better performance
-    adjacency_list = []
-    for i, triangle in enumerate(triangles):
-        triangle_neighbors = []
-        for j, other_triangle in enumerate(triangles):
-            if i != j:
-                shared_vertices = set(triangle).intersection(other_triangle)
-                if len(shared_vertices) == 2:
-                    triangle_neighbors.append(j)
-                    
-        adjacency_list.append(triangle_neighbors)
-    return adjacency_list
-
-def propagate_triangle_region_ids(triangle_region_ids, adjacency_list):
+    return csr_to_adjacency_list(*compute_triangle_adjacency_csr(triangles))
+
+def adjacency_list_to_csr(adjacency_list):
+    """
+    Converts a list of neighbor lists to a CSR-style adjacency (indptr, indices).
+
+    :param adjacency_list: A list of lists, where each list contains the neighbor indices of each row.
+    :return: A tuple (indptr, indices).
+    """
+    degrees = np.array([len(neighbors) for neighbors in adjacency_list], dtype=np.int64)
+    indptr = np.zeros(len(adjacency_list) + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    indices = np.fromiter(
+        (neighbor for neighbors in adjacency_list for neighbor in neighbors),
+        dtype=np.int64,
+        count=int(indptr[-1]),
+    )
+    return indptr, indices
+
+
+def _as_csr(adjacency):
+    """Accept either a (indptr, indices) pair or a list of neighbor lists"""
+    if (
+        isinstance(adjacency, tuple)
+        and len(adjacency) == 2
+        and isinstance(adjacency[0], np.ndarray)
+    ):
+        return adjacency
+    return adjacency_list_to_csr(adjacency)
+
+
+def compute_vertex_adjacency_csr(triangles, num_vertices):
+    """
+    Computes the vertex adjacency of a mesh from its triangle edges, in CSR format.
+
+    :param triangles: An array-like of shape (T, 3) with the vertex indices of each triangle.
+    :param num_vertices: The number of vertices in the mesh.
+    :return: A tuple (indptr, indices), neighbors of each vertex sorted in ascending order.
+    """
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    edges = triangles[:, [[0, 1], [1, 2], [2, 0]]].reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    # both directions, deduplicated and sorted by (src, dst)
+    edge_keys = np.unique(
+        np.concatenate([edges[:, 0] * num_vertices + edges[:, 1],
+                        edges[:, 1] * num_vertices + edges[:, 0]])
+    )
+    indices = edge_keys % num_vertices
+    indptr = np.zeros(num_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edge_keys // num_vertices, minlength=num_vertices), out=indptr[1:])
+    return indptr, indices
+
+
+def _gather_neighbors(indptr, indices, nodes):
+    """Return (src, dst) for all edges going out of nodes"""
+    starts = indptr[nodes]
+    degrees = indptr[nodes + 1] - starts
+    src = np.repeat(nodes, degrees)
+    offsets = np.arange(len(src)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+    dst = indices[np.repeat(starts, degrees) + offsets]
+    return src, dst
+
+
+def propagate_labels(indptr, indices, labels, mode="bfs", node_positions=None):
+    """
+    Propagates labels from labeled nodes to unlabeled nodes (-1) of a graph in CSR format.
+
+    In "bfs" mode, a multi-source breadth-first search expands the whole frontier with
+    NumPy operations on each wave. Every unlabeled node takes the label of its nearest
+    labeled node in hops; ties are broken deterministically by the smallest neighbor index.
+    In "geodesic" mode, every unlabeled node takes the label of the labeled node with the
+    shortest path, where edges are weighted by the euclidean distance between node_positions.
+    Nodes not connected to any labeled node keep -1.
+
+    :param indptr: An array of shape (N + 1,) with the row offsets into indices.
+    :param indices: An array with the neighbor indices of all nodes.
+    :param labels: An array of shape (N,) of labels, with -1 indicating no label.
+    :param mode: "bfs" or "geodesic".
+    :param node_positions: An array of shape (N, 3) of node positions, required in "geodesic" mode.
+    :return: A new array with the propagated labels.
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    labels = np.array(labels, dtype=np.int64, copy=True)
+    seeds = np.flatnonzero(labels != -1)
+    if len(seeds) == 0 or len(seeds) == len(labels):
+        return labels
+
+    if mode == "bfs":
+        frontier = seeds
+        while len(frontier) > 0:
+            src, dst = _gather_neighbors(indptr, indices, frontier)
+            is_unlabeled = labels[dst] == -1
+            src, dst = src[is_unlabeled], dst[is_unlabeled]
+            if len(dst) == 0:
+                break
+            # keep the smallest labeled neighbor of each newly reached node
+            order = np.lexsort((src, dst))
+            src, dst = src[order], dst[order]
+            is_first = np.r_[True, dst[1:] != dst[:-1]]
+            src, dst = src[is_first], dst[is_first]
+            labels[dst] = labels[src]
+            frontier = dst
+        return labels
+
+    elif mode == "geodesic":
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import dijkstra
+
+        assert node_positions is not None, "node_positions are required in geodesic mode"
+        node_positions = np.asarray(node_positions)
+        rows = np.repeat(np.arange(len(labels)), np.diff(indptr))
+        weights = np.linalg.norm(node_positions[indices] - node_positions[rows], axis=1)
+        # zero-length edges would be dropped as missing edges by csgraph
+        weights = np.maximum(weights, np.finfo(float).eps)
+        graph = csr_matrix((weights, indices, indptr), shape=(len(labels), len(labels)))
+        _, _, sources = dijkstra(
+            graph, directed=False, indices=seeds, min_only=True, return_predecessors=True
+        )
+        reached = sources >= 0
+        labels[reached] = labels[sources[reached]]
+        return labels
+
+    else:
+        raise ValueError(f"Unknown propagation mode {mode}")
+
+
+def propagate_triangle_region_ids(triangle_region_ids, adjacency_list, mode="bfs", triangle_centers=None):
     """
     Propagates region IDs from triangles with known region IDs to neighboring triangles
     that have no region ID (default -1), using a breadth-first search approach.
     
     :param triangle_region_ids: A list of region IDs corresponding to each triangle, with -1 indicating no region ID.
-    :param adjacency_list: A list of lists, where each list contains the indices of neighboring triangles for each triangle.
+    :param adjacency_list: A list of lists, where each list contains the indices of neighboring triangles for each triangle,
+        or the adjacency as a CSR (indptr, indices) pair.
+    :param mode: "bfs" for hop-nearest region, or "geodesic" for the nearest region along the mesh surface.
+    :param triangle_centers: An array of shape (T, 3) of triangle centers, required in "geodesic" mode.
     :return: The updated list of region IDs after propagation.
     """
-    
-    can_propagate = True
-    while can_propagate:
-        # For each iteration, we check all triangles can be propagated, and them batch assign region IDs
-        propagated_triangle_ids = []
-        propagated_region_ids = []
-        # For each non-labeled triangle, check if it can be labeled
-        for triangle_id, region_id in enumerate(triangle_region_ids):
-            if region_id == -1:
-                # Get the neighboring triangles regions ids from adjacency_list
-                neighbor_region_id_list = [
-                    triangle_region_ids[neighbor_id] for neighbor_id in adjacency_list[triangle_id]
-                ]
-                # if there is a neighbor with a region ID, propagate it
-                if len(neighbor_region_id_list) > 0 and max(neighbor_region_id_list) != -1:
-                    # random pick a non-negative region id from neighbors
-                    neighbor_region_id_list = [x for x in neighbor_region_id_list if x != -1]
-                    region_id = neighbor_region_id_list[0]
-                    propagated_triangle_ids.append(triangle_id)
-                    propagated_region_ids.append(region_id)
-            
-        # If no triangle can be propagated, stop the loop
-        if len(propagated_triangle_ids) == 0:
-            can_propagate = False
-        else:  
-            # Batch assign region IDs
-            for triangle_id, region_id in zip(propagated_triangle_ids, propagated_region_ids):
-                triangle_region_ids[triangle_id] = region_id
-                        
-    return triangle_region_ids
-
-
-def propagate_vertex_region_ids(mesh: o3d.geometry.TriangleMesh, vertex_region_ids: np.ndarray):
+    indptr, indices = _as_csr(adjacency_list)
+    return propagate_labels(
+        indptr, indices, triangle_region_ids, mode=mode, node_positions=triangle_centers
+    )
+
+
+def propagate_vertex_region_ids(mesh: o3d.geometry.TriangleMesh, vertex_region_ids: np.ndarray, mode="bfs"):
     """
     Propagates region IDs from vertices with known region IDs to neighboring vertices
     that have no region ID (default -1), using a breadth-first search approach.
     
     :param mesh: An Open3D TriangleMesh object.
     :param vertex_region_ids: A list of region IDs corresponding to each vertex, with -1 indicating no region ID.
+    :param mode: "bfs" for hop-nearest region, or "geodesic" for the nearest region along the mesh edges.
     :return: The updated list of region IDs after propagation.
     """
-    # Compute the adjacency list for the vertices in the mesh
-    mesh.compute_adjacency_list()
-    
-    # Initialize a queue for BFS
-    queue = deque()
-    
-    # Enqueue all vertices with known region IDs
-    for i, region_id in enumerate(vertex_region_ids):
-        if region_id != -1:
-            queue.append(i)
-    
-    # Perform BFS to propagate region IDs
-    while queue:
-        current_vertex = queue.popleft()
-        current_region_id = vertex_region_ids[current_vertex]
-        
-        for neighbor in mesh.adjacency_list[current_vertex]:
-            # If the neighbor vertex has no region ID, assign it the current region ID and enqueue it
-            if vertex_region_ids[neighbor] == -1:
-                vertex_region_ids[neighbor] = current_region_id
-                queue.append(neighbor)
-    
-    return vertex_region_ids
+    vertices = np.asarray(mesh.vertices)
+    indptr, indices = compute_vertex_adjacency_csr(np.asarray(mesh.triangles), len(vertices))
+    return propagate_labels(
+        indptr, indices, vertex_region_ids, mode=mode, node_positions=vertices
+    )
+
+
+def region_adjacency_pairs(triangle_region_ids, adjacency_list)->np.ndarray:
+    """
+    Find all pairs of different regions that share at least one triangle edge.
+
+    :param triangle_region_ids: np.ndarray, a list of region IDs corresponding to each triangle
+    :param adjacency_list: A list of lists of neighboring triangles, or a CSR (indptr, indices) pair
+    :return: np.ndarray of shape (E, 2), unique region id pairs with the smaller id first
+    """
+    indptr, indices = _as_csr(adjacency_list)
+    triangle_region_ids = np.asarray(triangle_region_ids)
+    src, dst = _gather_neighbors(indptr, indices, np.arange(len(indptr) - 1))
+    src_regions, dst_regions = triangle_region_ids[src], triangle_region_ids[dst]
+    valid = (src_regions != dst_regions) & (src_regions >= 0) & (dst_regions >= 0)
+    pairs = np.sort(np.stack([src_regions[valid], dst_regions[valid]], axis=1), axis=1)
+    return np.unique(pairs, axis=0)
+
 
 def build_region_triangle_adjacency_graph(triangle_region_ids, adjacency_list)->nx.Graph:
     """
@@ -106,7 +268,8 @@ def build_region_triangle_adjacency_graph(triangle_region_ids, adjacency_list)->
 
     Parameters:
         triangle_region_ids: np.ndarray, a list of region IDs corresponding to each triangle
-        adjacency_list: A list of lists, where each list contains the indices of neighboring triangles for each triangle
+        adjacency_list: A list of lists, where each list contains the indices of neighboring triangles for each triangle,
+            or the adjacency as a CSR (indptr, indices) pair
     Returns:
         G: networkx.Graph, a graph where each node represents a region and edges represent adjacency
     """
@@ -118,17 +281,38 @@ def build_region_triangle_adjacency_graph(triangle_region_ids, adjacency_list)->
         if region_id >= 0:
             graph.add_node(region_id)
 
-    # Check adjacency between triangles and add edges between corresponding regions
-    for i, neighbors in enumerate(adjacency_list):
-        current_region = triangle_region_ids[i]
-        for neighbor in neighbors:
-            neighbor_region = triangle_region_ids[neighbor]
-            if current_region != neighbor_region and current_region >= 0 and neighbor_region >= 0:
-                graph.add_edge(current_region, neighbor_region)
+    # Add edges between regions with adjacent triangles
+    graph.add_edges_from(
+        region_adjacency_pairs(triangle_region_ids, adjacency_list).tolist()
+    )
 
     return graph
 
 
+def vote_vertex_colors(triangles, triangle_colors, num_vertices)->np.ndarray:
+    """
+    Assign vertex colors by voting of the colors of the triangles sharing each vertex.
+
+    :param triangles: np.ndarray of shape (T, 3), vertex indices of each triangle
+    :param triangle_colors: np.ndarray of shape (T, 3), color of each triangle
+    :param num_vertices: number of vertices of the mesh
+    :return: np.ndarray of shape (num_vertices, 3), sum of the colors of the adjacent triangles,
+        normalized to unit length (NaN for vertices without triangles)
+    """
+    triangles = np.asarray(triangles).reshape(-1, 3)
+    triangle_colors = np.asarray(triangle_colors, dtype=np.float64).reshape(-1, 3)
+    vertex_ids = triangles.ravel()
+    vertex_colors = np.stack([
+        np.bincount(vertex_ids, weights=np.repeat(triangle_colors[:, c], 3), minlength=num_vertices)
+        for c in range(3)
+    ], axis=1)
+    
+    # Normalize the vertex colors
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vertex_colors /= np.linalg.norm(vertex_colors, axis=1)[:, None]
+    return vertex_colors
+
+
 ############# Visualization ###############
 
 def visualize_triangle_region_segmentation(
@@ -155,13 +339,9 @@ def visualize_triangle_region_segmentation(
     triangle_colors[triangle_region_ids == -1] = [1, 1, 1]
     
     # Assign vertex colors by max voting of triangle colors
-    vertex_colors = np.zeros_like(np.asarray(mesh.vertices))
-    for i, triangle in enumerate(mesh.triangles):
-        for j in range(3):
-            vertex_colors[triangle[j]] += triangle_colors[i]
-    
-    # Normalize the vertex colors
-    vertex_colors /= np.linalg.norm(vertex_colors, axis=1)[:, None]
+    vertex_colors = vote_vertex_colors(
+        np.asarray(mesh.triangles), triangle_colors, len(mesh.vertices)
+    )
     
     # Set the vertex colors
     mesh.vertex_colors = o3d.utility.Vector3dVector(vertex_colors)
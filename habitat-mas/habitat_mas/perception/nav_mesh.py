@@ -1,59 +1,288 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
 import numpy as np
 import open3d as o3d
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+from scipy.spatial import cKDTree
+from habitat_mas.dataset.defaults import habitat_mas_cache_dir
 from habitat_mas.perception.mesh_utils import (
-    compute_triangle_adjacency, 
-    propagate_triangle_region_ids
+    compute_triangle_adjacency_csr,
+    csr_to_adjacency_list,
+    propagate_triangle_region_ids,
+    vote_vertex_colors
 )
 
+# environment variable enabling the process-wide navmesh cache, see get_default_navmesh_cache()
+NAVMESH_CACHE_ENV = "HABITAT_MAS_NAVMESH_CACHE"
+
+
+class NavMeshCache:
+    """
+    Persistent cache of derived navmesh artifacts (cleaned geometry, triangle adjacency,
+    flat-ground mask, propagated region ids), keyed by a hash of the navmesh buffers and settings.
+    
+    Each entry is a directory of .npy files under cache_dir, loaded memory-mapped. Entries are 
+    evicted least-recently-used once the directory grows over max_size_bytes. Recently used 
+    entries are also kept in memory so repeated scenes in the same process skip disk access.
+    """
+    
+    def __init__(
+        self, 
+        cache_dir: str = os.path.join(habitat_mas_cache_dir, "navmesh"), 
+        max_size_bytes: int = 2 * 1024**3,
+        max_memory_entries: int = 16,
+    ):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Dict[str, np.ndarray]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash arrays and settings into a cache key"""
+        hasher = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                hasher.update(str((part.dtype.str, part.shape)).encode())
+                hasher.update(np.ascontiguousarray(part).tobytes())
+            elif isinstance(part, dict):
+                for key in sorted(part):
+                    hasher.update(NavMeshCache.make_key(key, part[key]).encode())
+            else:
+                hasher.update(repr(part).encode())
+        return hasher.hexdigest()
+    
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+    
+    def load(self, key: str, names=None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Load all artifacts of an entry. Return None and count a miss if the entry does not 
+        exist, or if it lacks one of the artifact names (e.g. being written by another process).
+        """
+        names = set(names or ())
+        if key in self._memory and names.issubset(self._memory[key]):
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        
+        entry_dir = self._entry_dir(key)
+        try:
+            artifacts = {
+                file_name[:-len(".npy")]: np.load(os.path.join(entry_dir, file_name), mmap_mode="r")
+                for file_name in os.listdir(entry_dir) if file_name.endswith(".npy")
+            }
+            # mark the entry as recently used for the LRU eviction
+            os.utime(entry_dir)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        if not names.issubset(artifacts):
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self._remember(key, artifacts)
+        return artifacts
+    
+    def save(self, key: str, artifacts: Dict[str, np.ndarray]):
+        """Save the artifacts of an entry, adding them to the entry if it already exists"""
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        for name, array in artifacts.items():
+            # write to a temporary file first so concurrent readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(array))
+            os.replace(tmp_path, os.path.join(entry_dir, f"{name}.npy"))
+        
+        if key in self._memory:
+            self._memory[key].update(artifacts)
+        else:
+            self._remember(key, dict(artifacts))
+        self.evict()
+    
+    def _remember(self, key: str, artifacts: Dict[str, np.ndarray]):
+        self._memory[key] = artifacts
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+    
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._list_entries())
+    
+    def _list_entries(self):
+        """Return (last_used, key, size) of all entries on disk"""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(key)
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry_dir, file_name))
+                    for file_name in os.listdir(entry_dir)
+                )
+                entries.append((os.path.getmtime(entry_dir), key, size))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        return entries
+    
+    def evict(self):
+        """Remove least-recently-used entries until the cache fits in max_size_bytes"""
+        entries = sorted(self._list_entries())
+        total_size = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            self._memory.pop(key, None)
+            total_size -= size
+    
+    def clear(self):
+        for _, key, _ in self._list_entries():
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        self._memory.clear()
+
+
+_default_navmesh_cache: Optional[NavMeshCache] = None
+
+
+def get_default_navmesh_cache() -> Optional[NavMeshCache]:
+    """
+    Return the process-wide navmesh cache, enabled by setting HABITAT_MAS_NAVMESH_CACHE to a 
+    cache directory, or to 1 for the navmesh dir under habitat_mas_cache_dir. None if not set.
+    """
+    global _default_navmesh_cache
+    cache_dir = os.environ.get(NAVMESH_CACHE_ENV)
+    if not cache_dir or cache_dir == "0":
+        return None
+    if cache_dir == "1":
+        cache_dir = os.path.join(habitat_mas_cache_dir, "navmesh")
+    if _default_navmesh_cache is None or _default_navmesh_cache.cache_dir != cache_dir:
+        _default_navmesh_cache = NavMeshCache(cache_dir)
+    return _default_navmesh_cache
+
+
 class NavMesh:
     """Wrapper for navmesh stored as triangle meshes and helper function"""
     
-    def __init__(self, vertices, triangles, **kwargs):
+    _CACHED_ARTIFACTS = {
+        "vertices", "triangles", "adjacency_indptr", "adjacency_indices", 
+        "is_flat_ground"
+    }
+    
+    def __init__(self, vertices, triangles, cache: Optional[NavMeshCache] = None, **kwargs):
         self.vertices = vertices
         self.triangles = triangles.reshape(-1, 3)
+        self.slope_threshold = kwargs.get("slope_threshold", 30)
+        self.triangle_region_ids = None
+        # slope segmentation colors are only computed for visualization
+        self._slope_vertex_colors = None
         
-        # build the triangle mesh
-        self._build_triangle_mesh(vertices, self.triangles)
-        
-        # compute triangle adjacency list
-        self._triangle_adjacency_list = compute_triangle_adjacency(self.triangles)
-        self.mesh.compute_adjacency_list()
-        
-        # create raycasting scene for localization
-        self._raycasting_scene = o3d.t.geometry.RaycastingScene()
-        self._mesh_tensor = o3d.t.geometry.TriangleMesh.from_legacy(self.mesh)
-        self._raycasting_scene.add_triangles(self._mesh_tensor)
+        # look up derived artifacts of the same navmesh and settings 
+        self.cache = cache
+        self.cache_key = None
+        artifacts = None
+        if self.cache is not None:
+            self.cache_key = self.cache.make_key(
+                np.asarray(vertices, dtype=np.float32), 
+                np.asarray(self.triangles, dtype=np.int64), 
+                {"slope_threshold": self.slope_threshold},
+            )
+            artifacts = self.cache.load(self.cache_key, self._CACHED_ARTIFACTS)
         
-        # self._vertex_adjaceny_list = self.mesh.adjacency_list
+        if artifacts is None:
+            # build the triangle mesh
+            self._build_triangle_mesh(vertices, self.triangles)
+            
+            # compute triangle adjacency in CSR format, the adjacency list is built lazily
+            self._triangle_adjacency_csr = compute_triangle_adjacency_csr(self.triangles)
+            
+            # by default, compute navmesh sgementation 
+            self.is_flat_ground = self.segment_by_slope(slope_threshold=self.slope_threshold)
+            
+            if self.cache is not None:
+                self.cache.save(self.cache_key, {
+                    "vertices": self.vertices,
+                    "triangles": self.triangles,
+                    "adjacency_indptr": self._triangle_adjacency_csr[0],
+                    "adjacency_indices": self._triangle_adjacency_csr[1],
+                    "is_flat_ground": self.is_flat_ground,
+                })
+        else:
+            # cleaned geometry is cached, skip the mesh cleanup 
+            self._build_triangle_mesh(artifacts["vertices"], artifacts["triangles"], cleanup=False)
+            self._triangle_adjacency_csr = (
+                artifacts["adjacency_indptr"], artifacts["adjacency_indices"]
+            )
+            self.is_flat_ground = artifacts["is_flat_ground"]
         
-        # by default, compute navmesh sgementation 
-        self.slope_threshold = kwargs.get("slope_threshold", 30)
-        self.is_flat_ground = self.segment_by_slope(slope_threshold=self.slope_threshold)
-        self.triangle_region_ids = None
+        self._triangle_adjacency_list = None
+        self._vertex_adjacency_computed = False
+        # raycasting scene for localization is created on first use
+        self._raycasting_scene = None
+        self._triangle_centers = None
+        self._triangle_kdtree = None
     
     @property
     def triangle_adjacency_list(self):
+        if self._triangle_adjacency_list is None:
+            self._triangle_adjacency_list = csr_to_adjacency_list(*self._triangle_adjacency_csr)
         return self._triangle_adjacency_list
     
+    @property
+    def triangle_adjacency_csr(self):
+        """Triangle adjacency as a (indptr, indices) pair"""
+        return self._triangle_adjacency_csr
+    
     @property
     def vertex_adjacency_list(self):
+        if not self._vertex_adjacency_computed:
+            self.mesh.compute_adjacency_list()
+            self._vertex_adjacency_computed = True
         return self.mesh.adjacency_list
+    
+    @property
+    def raycasting_scene(self) -> o3d.t.geometry.RaycastingScene:
+        if self._raycasting_scene is None:
+            self._raycasting_scene = o3d.t.geometry.RaycastingScene()
+            self._mesh_tensor = o3d.t.geometry.TriangleMesh.from_legacy(self.mesh)
+            self._raycasting_scene.add_triangles(self._mesh_tensor)
+        return self._raycasting_scene
+    
+    @property
+    def triangle_centers(self) -> np.ndarray:
+        if self._triangle_centers is None:
+            self._triangle_centers = np.mean(self.vertices[self.triangles], axis=1)
+        return self._triangle_centers
+    
+    @property
+    def triangle_kdtree(self) -> cKDTree:
+        """KD-tree over triangle centers, used for points not above the navmesh"""
+        if self._triangle_kdtree is None:
+            self._triangle_kdtree = cKDTree(self.triangle_centers)
+        return self._triangle_kdtree
        
-    def _build_triangle_mesh(self, vertices, triangles) -> o3d.geometry.TriangleMesh:
+    def _build_triangle_mesh(self, vertices, triangles, cleanup=True) -> o3d.geometry.TriangleMesh:
         """Build a triangle mesh from vertices and triangles"""
         self.mesh = o3d.geometry.TriangleMesh()
-        self.mesh.vertices = o3d.utility.Vector3dVector(vertices)
-        self.mesh.triangles = o3d.utility.Vector3iVector(triangles)
+        self.mesh.vertices = o3d.utility.Vector3dVector(np.asarray(vertices, dtype=np.float64))
+        self.mesh.triangles = o3d.utility.Vector3iVector(np.asarray(triangles, dtype=np.int32))
         
-        # Remove duplicated vertices
-        self.mesh = self.mesh.remove_duplicated_vertices()
+        if cleanup:
+            # Remove duplicated vertices
+            self.mesh = self.mesh.remove_duplicated_vertices()
 
-        # Remove degenerated triangles
-        self.mesh = self.mesh.remove_degenerate_triangles()
+            # Remove degenerated triangles
+            self.mesh = self.mesh.remove_degenerate_triangles()
 
-        # Remove duplicated triangles
-        self.mesh = self.mesh.remove_duplicated_triangles()
+            # Remove duplicated triangles
+            self.mesh = self.mesh.remove_duplicated_triangles()
         
         self.mesh.compute_vertex_normals()
         self.mesh.compute_triangle_normals()
@@ -63,7 +292,7 @@ class NavMesh:
         self.triangles = np.asarray(self.mesh.triangles)
     
     def segment_by_slope(self, slope_threshold=30):
-        """Segment the navmesh by slope angle"""
+        """Segment the navmesh by slope angle, return the flat-ground mask of triangles"""
         
         assert self.mesh is not None, "Mesh is not initialized"
         
@@ -73,34 +302,33 @@ class NavMesh:
         # Get the triangle normals as a NumPy array
         triangle_normals = np.asarray(self.mesh.triangle_normals)
         
-        # Create a list to store the triangle colors
-        triangle_colors = []
-        
         # Compute the angle between the triangle normal and the up direction for all triangles
         angles = np.degrees(np.arccos(np.dot(triangle_normals, up)))
 
         # Check if the angles are within the flat-ground threshold
         is_flat_ground = angles < slope_threshold
-
-        # Flat-ground surfaces (green color)
-        triangle_colors = np.where(is_flat_ground[:, None], [0, 1, 0], [1, 0, 0])
         
-        
-        # Assign vertex colors by max voting of triangle colors
-        vertex_colors = np.zeros_like(np.asarray(self.mesh.vertices))
-        for i, triangle in enumerate(self.mesh.triangles):
-            for j in range(3):
-                vertex_colors[triangle[j]] += triangle_colors[i]
-        
-        # Normalize the vertex colors
-        vertex_colors /= np.linalg.norm(vertex_colors, axis=1)[:, None]
-        
-        # Set the vertex colors
-        self.mesh.vertex_colors = o3d.utility.Vector3dVector(vertex_colors)
+        # vertex colors are recomputed from the new segmentation when next requested
+        self._slope_vertex_colors = None
         
         return is_flat_ground
     
-
+    @property
+    def slope_vertex_colors(self) -> np.ndarray:
+        """Vertex colors of the slope segmentation, green for flat ground and red for slopes"""
+        if self._slope_vertex_colors is None:
+            # Flat-ground surfaces (green color)
+            triangle_colors = np.where(self.is_flat_ground[:, None], [0, 1, 0], [1, 0, 0])
+            # Assign vertex colors by max voting of triangle colors
+            self._slope_vertex_colors = vote_vertex_colors(
+                self.triangles, triangle_colors, len(self.vertices)
+            )
+        return self._slope_vertex_colors
+    
+    def paint_slope_colors(self) -> o3d.geometry.TriangleMesh:
+        """Color the mesh by the slope segmentation for visualization and return it"""
+        self.mesh.vertex_colors = o3d.utility.Vector3dVector(self.slope_vertex_colors)
+        return self.mesh
 
     def segment_by_region_bbox(self, 
                                region_bbox_dict: Dict[int, np.ndarray],
@@ -117,7 +345,7 @@ class NavMesh:
         
         """
         # calculate triangle centers 
-        triangle_centers = np.mean(self.vertices[self.triangles], axis=1)
+        triangle_centers = self.triangle_centers
         # default region id is -1
         self.triangle_region_ids = -np.ones(len(self.triangles), dtype=int)
         
@@ -138,25 +366,97 @@ class NavMesh:
             self.triangle_region_ids[is_inside] = region_id
             
 
-    def propagate_region_ids(self):
-        """Propagate region ids to all connected triangles"""
+    def propagate_region_ids(self, mode="bfs"):
+        """Propagate region ids to all connected triangles
+        
+        Arguments:
+            mode: "bfs" assigns the region with fewest triangle hops, 
+                "geodesic" assigns the nearest region along the navmesh surface
+        """
         assert self.triangle_region_ids is not None, "Region ids are not initialized"
+        
+        # the seeded region ids are determined by the region bboxes, use them in the cache key
+        artifact_name = None
+        if self.cache is not None:
+            artifact_name = "region_ids_" + self.cache.make_key(self.triangle_region_ids, mode)
+            artifacts = self.cache.load(self.cache_key, [artifact_name])
+            if artifacts is not None:
+                self.triangle_region_ids = np.array(artifacts[artifact_name])
+                return
+        
         self.triangle_region_ids = propagate_triangle_region_ids(
-            self.triangle_region_ids, self.triangle_adjacency_list
+            self.triangle_region_ids, 
+            self.triangle_adjacency_csr,
+            mode=mode,
+            triangle_centers=self.triangle_centers if mode == "geodesic" else None,
         )
+        if artifact_name is not None:
+            self.cache.save(self.cache_key, {artifact_name: self.triangle_region_ids})
         
-    def find_triangle_agent_on(self, agent_pos: np.ndarray):
-        """Find the triangle the agent is on"""
-        # build the ray pointing down from the agent position, -y direction
-        ray = o3d.core.Tensor([[*agent_pos, 0, -1, 0]], dtype=o3d.core.Dtype.Float32)
-        # ['primitive_uvs', 'primitive_ids', 'geometry_ids', 'primitive_normals', 't_hit']
-        ans = self._raycasting_scene.cast_rays(ray)
-        triangle_ids = ans['primitive_ids'].numpy()
+    def locate(self, points: np.ndarray, ray_offset: float = 0.1) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Find the navmesh triangles below a batch of points, and their region ids.
         
-        # collect all triangles hit by the ray
-        triangle_centers = np.mean(self.vertices[self.triangles], axis=1)
+        All rays pointing down (-y direction) are cast in one call. Points with no 
+        triangle below fall back to the triangle with the nearest center.
         
-        # find the triangle below the agent
-        triangle_id = np.argmin(np.linalg.norm(triangle_centers - agent_pos, axis=1)[triangle_ids])
+        Arguments:
+            points: np.ndarray (N, 3), query points, e.g. agent base positions or object centers
+            ray_offset: float, rays start this far above the points, so points lying 
+                exactly on the navmesh still hit it
+        Returns:
+            triangle_ids: np.ndarray (N,) of triangle indices
+            region_ids: np.ndarray (N,) of triangle region ids, None if regions are not initialized
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        triangle_ids = np.zeros(len(points), dtype=np.int64)
+        if len(points) > 0:
+            # build the rays pointing down from the points, -y direction
+            rays = np.zeros((len(points), 6), dtype=np.float32)
+            rays[:, :3] = points
+            rays[:, 1] += ray_offset
+            rays[:, 4] = -1
+            # ['primitive_uvs', 'primitive_ids', 'geometry_ids', 'primitive_normals', 't_hit']
+            ans = self.raycasting_scene.cast_rays(o3d.core.Tensor(rays))
+            hit_ids = ans['primitive_ids'].numpy().astype(np.int64)
+            missed = ~np.isfinite(ans['t_hit'].numpy())
+            triangle_ids[~missed] = hit_ids[~missed]
+            if missed.any():
+                _, triangle_ids[missed] = self.triangle_kdtree.query(points[missed])
         
-        return triangle_id
\ No newline at end of file
+        region_ids = None
+        if self.triangle_region_ids is not None:
+            region_ids = self.triangle_region_ids[triangle_ids]
+        return triangle_ids, region_ids
+
+    def snap_points(
+        self, points: np.ndarray, search_extents: Tuple[float, float, float] = (2.0, 4.0, 2.0)
+    ) -> np.ndarray:
+        """
+        Find the nearest navigable points of a batch of points, on any navmesh island.
+
+        All points are queried in one call on the triangle BVH of the raycasting scene.
+        Like PathFinder.snap_point, points with no navmesh surface within search_extents
+        (half sizes of the search box in x, y, z) snap to NaN.
+
+        Arguments:
+            points: np.ndarray (N, 3), query points, e.g. object centers
+            search_extents: half sizes of the search box around each point
+        Returns:
+            snapped_points: np.ndarray (N, 3), NaN rows where no navigable point is found
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if len(points) == 0 or len(self.triangles) == 0:
+            return np.full_like(points, np.nan)
+        ans = self.raycasting_scene.compute_closest_points(
+            o3d.core.Tensor(points.astype(np.float32))
+        )
+        snapped_points = ans['points'].numpy().astype(np.float64)
+        too_far = np.any(np.abs(snapped_points - points) > np.asarray(search_extents), axis=1)
+        snapped_points[too_far] = np.nan
+        return snapped_points
+
+    def find_triangle_agent_on(self, agent_pos: np.ndarray):
+        """Find the triangle the agent is on"""
+        triangle_ids, _ = self.locate(np.asarray(agent_pos)[None])
+        return triangle_ids[0]
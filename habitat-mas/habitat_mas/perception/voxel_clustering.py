@@ -0,0 +1,155 @@
+from typing import Dict, List, Set
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+
+def _reduce_voxels(keys, counts, sums, mins, maxs):
+    """
+    Merge entries with the same voxel key, keeping point count, sum, min and max per voxel.
+    Also returns the index of the merged voxel of each entry.
+    """
+    _, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    return (
+        keys[order[starts]],
+        np.add.reduceat(counts[order], starts),
+        np.add.reduceat(sums[order], starts, axis=0),
+        np.minimum.reduceat(mins[order], starts, axis=0),
+        np.maximum.reduceat(maxs[order], starts, axis=0),
+    ), inverse
+
+
+class ClassVoxelMap:
+    """
+    Semantic point cloud accumulated from streaming chunks and voxel-downsampled per class.
+
+    Each voxel keeps the count, sum, min and max of its points, so that cluster statistics
+    computed from voxels are the same as from the raw points. With voxel_size None, every
+    point is kept as its own voxel.
+
+    Inserting points may merge and reorder the voxels of a class, voxel_remaps[class_label]
+    holds the new index of each voxel of the class before the last insert.
+    """
+
+    _FIELDS = ["keys", "counts", "sums", "mins", "maxs"]
+
+    def __init__(self, voxel_size=0.05):
+        self.voxel_size = voxel_size
+        self.class_voxels: Dict[int, Dict[str, np.ndarray]] = {}
+        self.voxel_remaps: Dict[int, np.ndarray] = {}
+
+    def insert(self, xyz, class_labels) -> Set[int]:
+        """Insert a chunk of points, return the classes whose voxels changed"""
+        xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+        class_labels = np.asarray(class_labels).reshape(-1)
+        if len(xyz) == 0:
+            return set()
+
+        # group points by class with one sort
+        order = np.argsort(class_labels, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(class_labels[order]) != 0])
+        for class_points in np.split(order, starts[1:]):
+            self._insert_class(int(class_labels[class_points[0]]), xyz[class_points])
+        return set(int(label) for label in class_labels[order[starts]])
+
+    def _insert_class(self, class_label, xyz):
+        if self.voxel_size:
+            keys = np.floor(xyz / self.voxel_size).astype(np.int64)
+        else:
+            keys = np.zeros((len(xyz), 3), dtype=np.int64)
+        voxels = {
+            "keys": keys, "counts": np.ones(len(xyz), dtype=np.int64),
+            "sums": xyz, "mins": xyz, "maxs": xyz
+        }
+
+        num_previous = 0
+        if class_label in self.class_voxels:
+            num_previous = len(self.class_voxels[class_label]["counts"])
+            voxels = {
+                field: np.concatenate([self.class_voxels[class_label][field], voxels[field]], axis=0)
+                for field in self._FIELDS
+            }
+        remap = np.arange(num_previous)
+        if self.voxel_size:
+            reduced, inverse = _reduce_voxels(*[voxels[field] for field in self._FIELDS])
+            voxels = dict(zip(self._FIELDS, reduced))
+            # previous voxels come first in the concatenation
+            remap = inverse[:num_previous]
+        self.class_voxels[class_label] = voxels
+        self.voxel_remaps[class_label] = remap
+
+    def get_centroids(self, class_label) -> np.ndarray:
+        voxels = self.class_voxels[class_label]
+        return voxels["sums"] / voxels["counts"][:, None]
+
+
+def _cluster_voxels(args):
+    """DBSCAN on voxel centroids weighted by point counts, top-level to run in a process pool"""
+    centroids, counts, eps, min_samples = args
+    return DBSCAN(eps=eps, min_samples=min_samples).fit(centroids, sample_weight=counts).labels_
+
+
+def compute_cluster_stats(cluster_labels, counts, sums, mins, maxs):
+    """
+    Compute per-cluster statistics with a single sort, noise (-1) is dropped.
+
+    Returns:
+        cluster_ids: np.ndarray (K,), sorted
+        num_points, centers, min_bounds, max_bounds: np.ndarray (K,), (K, 3), (K, 3), (K, 3)
+        members: list of K arrays, indices of the voxels in each cluster
+    """
+    valid = np.flatnonzero(cluster_labels >= 0)
+    order = valid[np.argsort(cluster_labels[valid], kind="stable")]
+    if len(order) == 0:
+        empty = np.zeros((0, 3))
+        return np.zeros(0, dtype=int), np.zeros(0), empty, empty, empty, []
+    starts = np.flatnonzero(np.r_[True, np.diff(cluster_labels[order]) != 0])
+
+    num_points = np.add.reduceat(counts[order], starts)
+    centers = np.add.reduceat(sums[order], starts, axis=0) / num_points[:, None]
+    min_bounds = np.minimum.reduceat(mins[order], starts, axis=0)
+    max_bounds = np.maximum.reduceat(maxs[order], starts, axis=0)
+    members = np.split(order, starts[1:])
+    return cluster_labels[order[starts]], num_points, centers, min_bounds, max_bounds, members
+
+
+def match_clusters(cluster_ids, cluster_labels, counts, previous_members: List[np.ndarray]) -> np.ndarray:
+    """
+    Match clusters one to one to the previous clusters they share the most points with,
+    largest overlaps first.
+
+    Arguments:
+        cluster_ids: np.ndarray (K,), sorted ids of the clusters, see compute_cluster_stats
+        cluster_labels: np.ndarray (V,), cluster of each voxel, -1 for noise
+        counts: np.ndarray (V,), point count of each voxel
+        previous_members: list of P arrays, voxel indices of the previous clusters
+    Returns:
+        matches: np.ndarray (K,), index of the matched previous cluster, -1 if none
+    """
+    num_clusters, num_previous = len(cluster_ids), len(previous_members)
+    matches = np.full(num_clusters, -1, dtype=int)
+    if num_clusters == 0 or num_previous == 0:
+        return matches
+
+    previous_idx = np.repeat(np.arange(num_previous), [len(m) for m in previous_members])
+    voxels = np.concatenate(previous_members).astype(int)
+    labels = cluster_labels[voxels]
+    valid = labels >= 0
+    overlaps = np.zeros((num_clusters, num_previous))
+    np.add.at(
+        overlaps,
+        (np.searchsorted(cluster_ids, labels[valid]), previous_idx[valid]),
+        counts[voxels[valid]]
+    )
+
+    matched_previous = np.zeros(num_previous, dtype=bool)
+    for flat_idx in np.argsort(-overlaps, axis=None, kind="stable"):
+        cluster_idx, prev_idx = divmod(int(flat_idx), num_previous)
+        if overlaps[cluster_idx, prev_idx] <= 0:
+            break
+        if matches[cluster_idx] < 0 and not matched_previous[prev_idx]:
+            matches[cluster_idx] = prev_idx
+            matched_previous[prev_idx] = True
+    return matches
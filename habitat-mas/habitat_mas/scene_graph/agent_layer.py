@@ -29,9 +29,8 @@ class AgentNode:
         assert navmesh.triangle_region_ids is not None, "Exception in locate_region_by_position: Navmesh region ids are not available"
         # project the agent position to the navmesh
         agent_position = np.array(self.position)
-        agent_position[1] = navmesh.vertices[:, 1].min()
-        triangle_id = navmesh.find_triangle_agent_on(agent_position)
-        region_id = navmesh.triangle_region_ids[triangle_id]
+        triangle_ids, region_ids = navmesh.locate(agent_position[None])
+        triangle_id, region_id = triangle_ids[0], region_ids[0]
         
         if visualize: 
             # visualize the agent position
@@ -47,7 +46,7 @@ class AgentNode:
             for i in navmesh.triangles[triangle_id]:
                 triangle_mesh.vertex_colors[i] = [0, 0, 1]
              
-            o3d.visualization.draw_geometries([navmesh.mesh, agent_pos])
+            o3d.visualization.draw_geometries([navmesh.paint_slope_colors(), agent_pos])
         
         return region_id
 
@@ -77,10 +76,27 @@ class AgentLayer:
         return agent
     
 
+    def update_agent(self, agent_id, position, orientation, atol=1e-3):
+        """
+        Update the pose of an existing agent.
+        Returns True if the agent moved or turned by more than atol.
+        """
+        agent = self.agent_dict[agent_id]
+        position = np.array(position)
+        orientation = np.array(orientation)
+        changed = not (
+            np.allclose(agent.position, position, atol=atol)
+            and np.allclose(agent.orientation, orientation, atol=atol)
+        )
+        agent.position = position
+        agent.orientation = orientation
+        return changed
+
     def get_agents_region_ids(self, navmesh: NavMesh)->Dict[int, int]:
         """Get all agents' region ids"""
-        agents_region_ids = {}
-        for agent_id, agent in self.agent_dict.items():
-            region_id = agent.locate_region_by_position(navmesh)
-            agents_region_ids[agent_id] = region_id
-        return agents_region_ids
\ No newline at end of file
+        assert navmesh.triangle_region_ids is not None, "Exception in get_agents_region_ids: Navmesh region ids are not available"
+        if len(self.agent_ids) == 0:
+            return {}
+        agent_positions = np.stack([self.agent_dict[agent_id].position for agent_id in self.agent_ids])
+        _, region_ids = navmesh.locate(agent_positions)
+        return dict(zip(self.agent_ids, region_ids.tolist()))
\ No newline at end of file
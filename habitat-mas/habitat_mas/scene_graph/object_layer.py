@@ -2,7 +2,26 @@ import copy
 
 import numpy as np
 import open3d as o3d
-from habitat_mas.scene_graph.utils import project_points_to_grid_xz
+from scipy.spatial import cKDTree
+from habitat_mas.scene_graph.utils import (
+    project_bboxes_to_grid_slices_xz,
+    grid_slice_to_mask,
+    rasterize_grid_slices
+)
+
+
+class NodeVector(np.ndarray):
+    """
+    Copy of a center, rotation or size row of an object layer. Item assignments, e.g. 
+    node.center[1] = y, are written back to the node, which updates the layer and its KD-tree.
+    Writing through the node keeps working when the row moves or the columns grow.
+    """
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        node = getattr(self, "_node", None)
+        if node is not None and node._layer is not None:
+            setattr(node, self._attr, np.asarray(self))
 
 
 class ObjectNode:
@@ -22,6 +41,9 @@ class ObjectNode:
         colors=None,
         normals=None,
     ):
+        # layer holding the columnar copy of the node attributes, set by ObjectLayer.add_object
+        self._layer = None
+        self._row = None
 
         # required attributes
         self.id = id
@@ -43,6 +65,92 @@ class ObjectNode:
         self.colors = colors
         self.normals = normals
 
+        # segment on the layer grid map, stored as slice bounds of the grid
+        self.grid_slice = None
+        self.grid_shape = None
+        self.grid_size = None
+
+    @property
+    def grid_map(self):
+        """Boolean mask of the object segment on the layer grid map, built on demand"""
+        if self.grid_slice is None:
+            return None
+        return grid_slice_to_mask(self.grid_slice, self.grid_shape)
+
+    # center, rotation, size, label and parent region are stored in the object layer columns 
+    # once the node is added to a layer, and in the node itself otherwise
+    def _get_vector(self, name):
+        value = self._layer._get_vector(name, self._row)
+        if value is None:
+            return None
+        value = value.view(NodeVector)
+        value._node, value._attr = self, name
+        return value
+
+    @property
+    def center(self):
+        if self._layer is None:
+            return self._center
+        return self._get_vector("center")
+
+    @center.setter
+    def center(self, center):
+        if self._layer is None:
+            self._center = center
+        else:
+            self._layer._set_vector("center", self._row, center)
+
+    @property
+    def rotation(self):
+        if self._layer is None:
+            return self._rotation
+        return self._get_vector("rotation")
+
+    @rotation.setter
+    def rotation(self, rotation):
+        if self._layer is None:
+            self._rotation = rotation
+        else:
+            self._layer._set_vector("rotation", self._row, rotation)
+
+    @property
+    def size(self):
+        if self._layer is None:
+            return self._size
+        return self._get_vector("size")
+
+    @size.setter
+    def size(self, size):
+        if self._layer is None:
+            self._size = size
+        else:
+            self._layer._set_vector("size", self._row, size)
+
+    @property
+    def label(self):
+        if self._layer is None:
+            return self._label
+        return self._layer._labels[self._row]
+
+    @label.setter
+    def label(self, label):
+        if self._layer is None:
+            self._label = label
+        else:
+            self._layer._labels[self._row] = label
+
+    @property
+    def parent_region(self):
+        return self._parent_region
+
+    @parent_region.setter
+    def parent_region(self, parent_region):
+        self._parent_region = parent_region
+        if self._layer is not None:
+            self._layer._parent_region_ids[self._row] = (
+                -1 if parent_region is None else parent_region.region_id
+            )
+
     def add_point_clouds(self, vertices, colors, normals):
 
         self.vertices = vertices
@@ -51,14 +159,65 @@ class ObjectNode:
 
 
 class ObjectLayer:
-    def __init__(self):
+    """
+    Object nodes of the scene graph.
+    
+    Besides the ObjectNode dict, centers, sizes, rotations, labels and parent region ids of all 
+    objects are kept in contiguous numpy columns (one row per object, see _id_to_row), with 
+    a KD-tree over the centers for query_radius, query_aabb and k_nearest. The KD-tree is 
+    rebuilt lazily: objects added, moved or removed since the last build are tracked in 
+    _index_dirty_ids and checked exactly at query time, until there are too many of them.
+    """
+
+    # vector columns: (attribute name, dimension)
+    _VECTOR_COLUMNS = {"center": 3, "rotation": 4, "size": 3}
+
+    def __init__(self, index_rebuild_min=64, index_rebuild_ratio=0.25):
 
         self.flag_grid_map = False
-        self.obj_ids = []
         self.obj_dict = {}
 
+        # columnar storage, rows [0, len(self)) are valid
+        self._capacity = 0
+        self._columns = {
+            name: np.zeros((0, dim)) for name, dim in self._VECTOR_COLUMNS.items()
+        }
+        self._labels = np.empty(0, dtype=object)
+        self._parent_region_ids = np.zeros(0, dtype=int)
+        self._row_ids = []
+        self._id_to_row = {}
+        self._obj_ids = None
+        self._next_id = 0
+
+        # spatial index over object centers
+        self.index_rebuild_min = index_rebuild_min
+        self.index_rebuild_ratio = index_rebuild_ratio
+        self._kdtree = None
+        self._kdtree_ids = np.zeros(0, dtype=int)
+        self._index_dirty_ids = set()
+
     def __len__(self):
-        return len(self.obj_ids)
+        return len(self._row_ids)
+
+    def __contains__(self, id):
+        return id in self.obj_dict
+
+    @property
+    def obj_ids(self):
+        """Object ids in insertion order"""
+        if self._obj_ids is None:
+            self._obj_ids = list(self.obj_dict)
+        return self._obj_ids
+
+    @property
+    def centers(self) -> np.ndarray:
+        """(N, 3) centers of all objects in row order, see row_ids"""
+        return self._columns["center"][: len(self)]
+
+    @property
+    def row_ids(self):
+        """Object ids in row order of the columns"""
+        return self._row_ids
 
     def init_map(self, bounds, grid_size, free_space_grid, project_mode="xz"):
 
@@ -95,16 +254,13 @@ class ObjectLayer:
         height=None,
     ):
         # add object node
-        if id == None or id in self.obj_ids:
-            new_id = 0
-            if len(self.obj_ids) > 0:
-                new_id = max(self.obj_ids) + 1
+        if id == None or id in self.obj_dict:
+            new_id = self._next_id
             print(
                 f"Warning: object id {id} already exists in object layer. Assign id {new_id} instead"
             )
             id = new_id
 
-        self.obj_ids.append(id)
         obj_node = ObjectNode(
             id, center, rotation, size, 
             class_name=class_name, 
@@ -120,57 +276,295 @@ class ObjectLayer:
                 vertices, colors, normals
             )
 
+        # attach first, it raises on invalid values before the layer is modified
+        self._attach_node(obj_node)
         self.obj_dict[id] = obj_node
+        self._obj_ids = None
+        if isinstance(id, (int, np.integer)):
+            self._next_id = max(self._next_id, int(id) + 1)
 
         # add object segment on layer free space grid map
         if self.flag_grid_map and bbox is not None:
             if self.project_mode == "xz":
-                obj_grid_map = self.segment_object_on_grid_map_xz(id, bbox)
+                self.segment_object_on_grid_map_xz(id, bbox)
             else:  # TODO: if there are other datasets ...
                 raise NotImplementedError
-            obj_node.grid_size = self.grid_size
-            obj_node.grid_map = obj_grid_map
 
         return obj_node
 
+    def update_object(self, id, center=None, rotation=None, atol=1e-3, **attributes):
+        """
+        Update the pose and attributes of an existing object node.
+        Returns True if the object moved by more than atol or any attribute changed.
+        """
+        obj_node = self.obj_dict[id]
+        changed = False
+        if center is not None:
+            if obj_node.center is None or np.linalg.norm(
+                np.asarray(center, dtype=float) - np.asarray(obj_node.center, dtype=float)
+            ) > atol:
+                changed = True
+            obj_node.center = center
+        if rotation is not None:
+            if obj_node.rotation is None or not np.allclose(
+                np.asarray(rotation, dtype=float), np.asarray(obj_node.rotation, dtype=float), atol=atol
+            ):
+                changed = True
+            obj_node.rotation = rotation
+        for name, value in attributes.items():
+            if getattr(obj_node, name) != value:
+                changed = True
+                setattr(obj_node, name, value)
+        return changed
+
+    def remove_object(self, id):
+        obj_node = self.obj_dict.pop(id)
+        self._obj_ids = None
+        self._detach_node(obj_node)
+        if self.flag_grid_map and obj_node.grid_slice is not None:
+            # the object can only be painted within its slice
+            row_start, row_stop, col_start, col_stop = obj_node.grid_slice
+            segment = self.segment_grid[row_start:row_stop, col_start:col_stop]
+            segment[segment == id] = -1
+        return obj_node
+
+    def _attach_node(self, obj_node: ObjectNode):
+        """Move the node attributes into a new row of the columns"""
+        row = len(self._row_ids)
+        if row == self._capacity:
+            self._grow(max(16, 2 * self._capacity))
+        # convert the values first, so that an invalid value leaves the layer unchanged
+        values = {
+            name: self._as_vector(name, getattr(obj_node, name)) for name in self._VECTOR_COLUMNS
+        }
+        label, parent_region = obj_node.label, obj_node.parent_region
+
+        self._row_ids.append(obj_node.id)
+        self._id_to_row[obj_node.id] = row
+        obj_node._layer, obj_node._row = self, row
+        for name, value in values.items():
+            setattr(obj_node, name, value)
+        obj_node.label = label
+        obj_node.parent_region = parent_region
+        self._index_dirty_ids.add(obj_node.id)
+
+    def _detach_node(self, obj_node: ObjectNode):
+        """Copy the node attributes back to the node and free its row, moving the last row into it"""
+        values = {name: self._get_vector(name, obj_node._row) for name in self._VECTOR_COLUMNS}
+        label = obj_node.label
+        row, last_row = obj_node._row, len(self._row_ids) - 1
+        if row != last_row:
+            last_id = self._row_ids[last_row]
+            for column in self._columns.values():
+                column[row] = column[last_row]
+            self._labels[row] = self._labels[last_row]
+            self._parent_region_ids[row] = self._parent_region_ids[last_row]
+            self._row_ids[row] = last_id
+            self._id_to_row[last_id] = row
+            self.obj_dict[last_id]._row = row
+        self._labels[last_row] = None
+        self._row_ids.pop()
+        del self._id_to_row[obj_node.id]
+        self._index_dirty_ids.add(obj_node.id)
+
+        obj_node._layer, obj_node._row = None, None
+        for name, value in values.items():
+            setattr(obj_node, name, value)
+        obj_node.label = label
+
+    def _grow(self, capacity):
+        num_rows = len(self._row_ids)
+        for name, column in self._columns.items():
+            new_column = np.full((capacity, column.shape[1]), np.nan)
+            new_column[:num_rows] = column[:num_rows]
+            self._columns[name] = new_column
+        labels = np.empty(capacity, dtype=object)
+        labels[:num_rows] = self._labels[:num_rows]
+        self._labels = labels
+        parent_region_ids = -np.ones(capacity, dtype=int)
+        parent_region_ids[:num_rows] = self._parent_region_ids[:num_rows]
+        self._parent_region_ids = parent_region_ids
+        self._capacity = capacity
+
+    def _get_vector(self, name, row):
+        value = self._columns[name][row]
+        # missing values, e.g. objects without size, are stored as nan
+        if np.isnan(value).all():
+            return None
+        return value.copy()
+
+    def _as_vector(self, name, value):
+        """Convert a value to a row of the column, e.g. a rotation to its [x, y, z, w] coefficients"""
+        if value is None:
+            return None
+        try:
+            vector = np.asarray(value, dtype=float)
+        except (TypeError, ValueError) as e:
+            raise TypeError(f"Object {name} must be an array of {self._VECTOR_COLUMNS[name]} floats, got {value!r}") from e
+        if vector.shape != (self._VECTOR_COLUMNS[name],):
+            raise ValueError(f"Object {name} must have shape ({self._VECTOR_COLUMNS[name]},), got {vector.shape}")
+        return vector
+
+    def _set_vector(self, name, row, value):
+        value = self._as_vector(name, value)
+        self._columns[name][row] = np.nan if value is None else value
+        if name == "center":
+            self._index_dirty_ids.add(self._row_ids[row])
+
+    def _get_rows(self, ids=None) -> np.ndarray:
+        if ids is None:
+            return np.arange(len(self))
+        return np.array([self._id_to_row[id] for id in ids], dtype=int)
+
+    def _update_index(self):
+        """Rebuild the KD-tree if too many objects changed since the last build"""
+        num_rows = len(self)
+        num_dirty = len(self._index_dirty_ids)
+        if num_dirty == 0 or num_dirty <= max(self.index_rebuild_min, self.index_rebuild_ratio * num_rows):
+            return
+        # cKDTree keeps a reference to its data, copy since rows are moved on removal
+        self._kdtree = cKDTree(self.centers.copy()) if num_rows > 0 else None
+        self._kdtree_ids = np.array(self._row_ids)
+        self._index_dirty_ids = set()
+
+    def _dirty_rows(self):
+        """Rows of the objects whose centers are not (correctly) in the KD-tree"""
+        return self._get_rows([id for id in self._index_dirty_ids if id in self._id_to_row])
+
+    def _filter_tree_results(self, tree_idx) -> np.ndarray:
+        """Map KD-tree point indices to current rows, dropping the objects changed since the build"""
+        tree_idx = np.asarray(tree_idx, dtype=int)
+        if self._kdtree is None or len(tree_idx) == 0:
+            return np.zeros(0, dtype=int)
+        ids = self._kdtree_ids[tree_idx]
+        if self._index_dirty_ids:
+            ids = [id for id in ids if id not in self._index_dirty_ids]
+        return self._get_rows(ids)
+
+    def query_radius(self, center, radius):
+        """
+        Return the ids of objects whose centers are within radius of center.
+        
+        Arguments:
+            center: (3,) query position 
+            radius: float, search radius in meters
+        """
+        self._update_index()
+        center = np.asarray(center, dtype=float)
+        rows = np.zeros(0, dtype=int)
+        if self._kdtree is not None:
+            rows = self._filter_tree_results(self._kdtree.query_ball_point(center, radius))
+        dirty_rows = self._dirty_rows()
+        if len(dirty_rows) > 0:
+            dists = np.linalg.norm(self._columns["center"][dirty_rows] - center, axis=1)
+            rows = np.concatenate([rows, dirty_rows[dists <= radius]])
+        return [self._row_ids[row] for row in np.sort(rows)]
+
+    def query_aabb(self, min_bound, max_bound):
+        """
+        Return the ids of objects whose centers are inside the axis-aligned box [min_bound, max_bound].
+        """
+        self._update_index()
+        min_bound = np.asarray(min_bound, dtype=float)
+        max_bound = np.asarray(max_bound, dtype=float)
+        rows = np.zeros(0, dtype=int)
+        if self._kdtree is not None:
+            # candidates in the cube around the box center, then exact box test
+            box_center = (min_bound + max_bound) / 2
+            half_extent = np.max(max_bound - min_bound) / 2
+            rows = self._filter_tree_results(
+                self._kdtree.query_ball_point(box_center, half_extent, p=np.inf)
+            )
+        rows = np.concatenate([rows, self._dirty_rows()])
+        centers = self._columns["center"][rows]
+        inside = np.all((centers >= min_bound) & (centers <= max_bound), axis=1)
+        return [self._row_ids[row] for row in np.sort(rows[inside])]
+
+    def k_nearest(self, point, k=1):
+        """
+        Return the ids of the k objects with centers closest to point, and their distances, 
+        sorted from nearest to farthest.
+        """
+        self._update_index()
+        point = np.asarray(point, dtype=float)
+        k = min(k, len(self))
+        if k <= 0:
+            return [], np.zeros(0)
+        rows = np.zeros(0, dtype=int)
+        if self._kdtree is not None:
+            # query extra neighbors to make up for stale tree entries
+            num_query = min(k + len(self._index_dirty_ids), self._kdtree.n)
+            _, tree_idx = self._kdtree.query(point, k=num_query)
+            rows = self._filter_tree_results(np.atleast_1d(tree_idx))
+        rows = np.concatenate([rows, self._dirty_rows()])
+        dists = np.linalg.norm(self._columns["center"][rows] - point, axis=1)
+        order = np.argsort(dists, kind="stable")[:k]
+        return [self._row_ids[row] for row in rows[order]], dists[order]
+
     def segment_object_on_grid_map_xz(self, obj_id, obj_bbox):
+        """Paint the object bbox on the grid map, return its grid slice"""
+        return self.segment_objects_on_grid_map_xz([obj_id], [obj_bbox])[0]
+
+    def segment_objects_on_grid_map_xz(self, obj_ids, obj_bboxes):
+        """
+        Paint the bboxes of objects on the grid map in one pass, later objects over earlier ones.
+        
+        Arguments:
+            obj_ids: ids of objects in the layer
+            obj_bboxes: np.ndarray (N, 2, 3), [min, max] corners of the object bboxes
+        Returns:
+            grid_slices: np.ndarray (N, 4), [row_start, row_stop, col_start, col_stop] of the
+                object segments, also stored in the object nodes
+        """
         assert (
             self.flag_grid_map
-        ), "called 'segment_region_on_grid_map_xz()' before grid map being initialized"
-        # get region bbox on 2d grid map
-        # object_2d_bbox: np.array: [[x_min, y_min],[x_max, y_max]]
-        obj_2d_bbox = project_points_to_grid_xz(
-            self.bounds, obj_bbox, self.grid_size
+        ), "called 'segment_objects_on_grid_map_xz()' before grid map being initialized"
+        # get object bbox on 2d grid map
+        grid_slices = project_bboxes_to_grid_slices_xz(
+            self.bounds, obj_bboxes, self.grid_size, self.segment_grid.shape
         )
+        # color the objects on global grid map
+        is_overlapped = rasterize_grid_slices(self.segment_grid, grid_slices, np.asarray(obj_ids))
+        for obj_id, grid_slice, overlapped in zip(obj_ids, grid_slices, is_overlapped):
+            if overlapped:
+                print(f"Warning: object {obj_id} overlap with other objects")
+            obj_node = self.obj_dict[obj_id]
+            obj_node.grid_slice = grid_slice
+            obj_node.grid_shape = self.segment_grid.shape
+            obj_node.grid_size = self.grid_size
 
-        obj_mask = np.zeros_like(self.free_space_grid).astype(bool)
-        # NOTE: (row_idx, col_idx) corresponds to (y, x) in 2d grid map
-        obj_mask[
-            int(np.ceil(obj_2d_bbox[0][1])) : int(np.floor(obj_2d_bbox[1][1])),
-            int(np.ceil(obj_2d_bbox[0][0])) : int(np.floor(obj_2d_bbox[1][0])),
-        ] = True
-        # color the region on global grid map
-        if (self.segment_grid[obj_mask] == -1).all():
-            self.segment_grid[obj_mask] = obj_id
-        else:
-            print(
-                f"Warning: object {obj_id} overlap with object {self.segment_grid[obj_mask]}"
-            )
-            self.segment_grid[obj_mask] = obj_id
-
-        return obj_mask
+        return grid_slices
 
     def get_objects_by_ids(self, ids):
         return [self.obj_dict[id] for id in ids]
 
     def get_centers(self, ids):
-        centers = np.array([self.obj_dict[id].center for id in ids])
+        centers = self._columns["center"][self._get_rows(ids)]
         return centers
 
+    def get_sizes(self, ids):
+        return self._columns["size"][self._get_rows(ids)]
+
+    def get_rotations(self, ids):
+        return self._columns["rotation"][self._get_rows(ids)]
+
     def get_labels(self, ids):
-        labels = [self.obj_dict[id].label for id in ids]
+        labels = self._labels[self._get_rows(ids)].tolist()
         return labels
 
+    def get_parent_region_ids(self, ids):
+        return self._parent_region_ids[self._get_rows(ids)]
+
     def get_class_names(self, ids):
         names = [self.obj_dict[id].class_name for id in ids]
         return names
+
+    def get_objects_region_ids(self, navmesh, ids=None):
+        """Locate the navmesh regions of objects (all objects by default) in one batched query"""
+        assert navmesh.triangle_region_ids is not None, "Exception in get_objects_region_ids: Navmesh region ids are not available"
+        if ids is None:
+            ids = self.obj_ids
+        if len(ids) == 0:
+            return {}
+        _, region_ids = navmesh.locate(self.get_centers(ids))
+        return dict(zip(ids, region_ids.tolist()))
@@ -5,7 +5,12 @@ import numpy as np
 # from utils.open3d_utils import
 # local import
 from habitat_mas.scene_graph.object_layer import ObjectNode
-from habitat_mas.scene_graph.utils import project_points_to_grid_xz
+from habitat_mas.scene_graph.utils import (
+    project_bboxes_to_grid_slices_xz,
+    grid_slice_to_mask,
+    rasterize_grid_slices
+)
+from habitat_mas.perception.mesh_utils import region_adjacency_pairs
 from scipy.spatial import cKDTree
 import networkx as nx
 
@@ -25,7 +30,12 @@ class RegionNode:
         self.bbox: np.ndarray = bbox # (2,3)
 
         # optional field
-        self.grid_map = grid_map
+        # segment on the layer grid map, stored as slice bounds of the grid restricted to 
+        # the free space grid, unless a dense grid_map is given
+        self._grid_map = grid_map
+        self.grid_slice = None
+        self.grid_shape = None
+        self.free_space_grid = None
         self.grid_size = grid_size
         self.class_name = class_name
         self.label = label
@@ -33,6 +43,17 @@ class RegionNode:
         self.parent_level = parent_level
         return
 
+    @property
+    def grid_map(self):
+        """Boolean mask of the region segment on the layer grid map, built on demand"""
+        if self._grid_map is None and self.grid_slice is not None:
+            return grid_slice_to_mask(self.grid_slice, self.grid_shape, self.free_space_grid)
+        return self._grid_map
+
+    @grid_map.setter
+    def grid_map(self, grid_map):
+        self._grid_map = grid_map
+
     def add_object(self, obj: ObjectNode):
 
         self.objects.append(obj)
@@ -45,6 +66,8 @@ class RegionLayer(nx.Graph):
         self.flag_grid_map = False
         self.region_ids = []
         self.region_dict: Dict[int, RegionNode] = {}
+        # stacked region bounding boxes, built on first query
+        self._region_bboxes = None
         return
 
     # TODO: consider creating a standalone map class?
@@ -80,15 +103,14 @@ class RegionLayer(nx.Graph):
         region_node = RegionNode(region_id, bbox, parent_level=parent_level)
         self.region_dict[region_id] = region_node
         self.add_node(region_node)
+        self._region_bboxes = None
 
         # add segment on layer free space grid map
         if self.flag_grid_map:
             if self.project_mode == "xz":
-                region_grid_map = self.segment_region_on_grid_map_xz(region_id, bbox)
+                self.segment_region_on_grid_map_xz(region_id, bbox)
             else:  # TODO: if there are other datasets ...
                 raise NotImplementedError
-            region_node.grid_size = self.grid_size
-            region_node.grid_map = region_grid_map
 
         # add semantic info
         region_node.class_name = class_name
@@ -96,31 +118,85 @@ class RegionLayer(nx.Graph):
 
         return region_node
 
+    @property
+    def region_bboxes(self) -> np.ndarray:
+        """Bounding boxes of all regions, (num_regions, 2, 3) in the order of region_ids"""
+        if self._region_bboxes is None:
+            self._region_bboxes = np.array(
+                [self.region_dict[region_id].bbox for region_id in self.region_ids], dtype=np.float64
+            ).reshape(-1, 2, 3)
+        return self._region_bboxes
+
+    def find_regions(self, points, chunk_size=4096) -> np.ndarray:
+        """
+        Find the region containing each point, testing all points against all region
+        bounding boxes at once.
+        
+        Arguments:
+            points: np.ndarray (N, 3), e.g. object centers or agent positions
+            chunk_size: number of points tested at once, bounds the (chunk_size, num_regions) 
+                containment mask
+        Returns:
+            region_ids: np.ndarray (N,), id of the first region in region_ids whose bounding box 
+                contains the point (boundary included), -1 if there is none
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        region_ids = np.full(len(points), -1, dtype=int)
+        if len(self.region_ids) == 0:
+            return region_ids
+        
+        bboxes = self.region_bboxes
+        all_region_ids = np.asarray(self.region_ids)
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size, None, :]
+            is_inside = np.all(
+                (chunk >= bboxes[None, :, 0]) & (chunk <= bboxes[None, :, 1]), axis=2
+            )
+            found = is_inside.any(axis=1)
+            first_region = is_inside.argmax(axis=1)
+            region_ids[start:start + chunk_size][found] = all_region_ids[first_region[found]]
+        return region_ids
+
     def segment_region_on_grid_map_xz(self, region_id, region_bbox):
+        """Paint the region bbox on the free space of the grid map, return its grid slice"""
+        return self.segment_regions_on_grid_map_xz([region_id], [region_bbox])[0]
+
+    def segment_regions_on_grid_map_xz(self, region_ids=None, region_bboxes=None):
+        """
+        Paint the bboxes of regions on the free space of the grid map in one pass, later 
+        regions over earlier ones.
+        
+        Arguments:
+            region_ids: ids of regions in the layer, all regions by default
+            region_bboxes: np.ndarray (N, 2, 3), bboxes of the regions, the region node bboxes
+                by default
+        Returns:
+            grid_slices: np.ndarray (N, 4), [row_start, row_stop, col_start, col_stop] of the
+                region segments, also stored in the region nodes
+        """
         assert (
             self.flag_grid_map
-        ), "called 'segment_region_on_grid_map_xz()' before grid map being initialized"
+        ), "called 'segment_regions_on_grid_map_xz()' before grid map being initialized"
+        if region_ids is None:
+            region_ids = self.region_ids
+        if region_bboxes is None:
+            region_bboxes = [self.region_dict[region_id].bbox for region_id in region_ids]
         # get region bbox on 2d grid map
-        # region_2d_bbox: np.array: [[x_min, y_min],[x_max, y_max]]
-        region_2d_bbox = project_points_to_grid_xz(
-            self.bounds, region_bbox, self.grid_size
+        grid_slices = project_bboxes_to_grid_slices_xz(
+            self.bounds, region_bboxes, self.grid_size, self.segment_grid.shape
         )
+        # color the regions on global grid map
+        rasterize_grid_slices(
+            self.segment_grid, grid_slices, np.asarray(region_ids), self.free_space_grid
+        )
+        for region_id, grid_slice in zip(region_ids, grid_slices):
+            region_node = self.region_dict[region_id]
+            region_node.grid_slice = grid_slice
+            region_node.grid_shape = self.segment_grid.shape
+            region_node.free_space_grid = self.free_space_grid
+            region_node.grid_size = self.grid_size
 
-        region_mask = np.zeros_like(self.free_space_grid).astype(bool)
-        # NOTE: (row_idx, col_idx) corresponds to (y, x) in 2d grid map
-        region_mask[
-            int(np.ceil(region_2d_bbox[0][1])) : int(
-                np.floor(region_2d_bbox[1][1])
-            ),
-            int(np.ceil(region_2d_bbox[0][0])) : int(
-                np.floor(region_2d_bbox[1][0])
-            ),
-        ] = True
-        # color the region on global grid map
-        region_mask = np.logical_and(region_mask, self.free_space_grid)
-        self.segment_grid[region_mask] = region_id
-
-        return region_mask
+        return grid_slices
 
 
     def add_region_adjacency_edges(self, triangle_region_ids, adjacency_list)->nx.Graph:
@@ -129,18 +205,16 @@ class RegionLayer(nx.Graph):
         
         Parameters:
             triangle_region_ids: np.ndarray, a list of region IDs corresponding to each triangle
-            adjacency_list: A list of lists, where each list contains the indices of neighboring triangles for each triangle
+            adjacency_list: A list of lists, where each list contains the indices of neighboring triangles for each triangle,
+                or the triangle adjacency as a CSR (indptr, indices) pair
         """
 
-        region_ids = np.unique(triangle_region_ids)
         # assert len(region_ids>=0) == len(self.region_ids), "Exception in add_region_adjacency_edges: Region number mismatch"
 
         # Check adjacency between triangles and add edges between corresponding regions
-        for i, neighbors in enumerate(adjacency_list):
-            current_region_id = triangle_region_ids[i]
-            for neighbor in neighbors:
-                neighbor_region_id = triangle_region_ids[neighbor]
-                if current_region_id != neighbor_region_id and current_region_id >= 0 and neighbor_region_id >= 0:
-                    current_region = self.region_dict[current_region_id]
-                    neighbor_region = self.region_dict[neighbor_region_id]
-                    self.add_edge(current_region, neighbor_region)
+        for current_region_id, neighbor_region_id in region_adjacency_pairs(
+            triangle_region_ids, adjacency_list
+        ):
+            current_region = self.region_dict[current_region_id]
+            neighbor_region = self.region_dict[neighbor_region_id]
+            self.add_edge(current_region, neighbor_region)
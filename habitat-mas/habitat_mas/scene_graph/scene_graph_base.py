@@ -61,6 +61,20 @@ class SceneGraphBase:
         """Return the full scene graph"""
         raise NotImplementedError
 
+    def assign_objects_to_regions(self, ids=None):
+        """Assign objects to the navmesh regions under them in one batched lookup"""
+        assert self.nav_mesh is not None, "Navmesh is not initialized"
+        objects_region_ids = self.object_layer.get_objects_region_ids(self.nav_mesh, ids)
+        for obj_id, region_id in objects_region_ids.items():
+            region_node = self.region_layer.region_dict.get(region_id)
+            if region_node is None:
+                continue
+            obj = self.object_layer.obj_dict[obj_id]
+            obj.parent_region = region_node
+            if obj not in region_node.objects:
+                region_node.add_object(obj)
+        return objects_region_ids
+
     def build_nx_region_graph(self):
         assert self.nav_mesh is not None, "Navmesh is not initialized"
         
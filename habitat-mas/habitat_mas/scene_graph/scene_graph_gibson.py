@@ -57,6 +57,8 @@ class SceneGraphGibson(SceneGraphBase):
         )
         
         semantic_scene = self.sim.semantic_scene
+        # object segments are painted on the object grid map at once after loading
+        segment_obj_ids, segment_obj_bboxes = [], []
         # 2. load region layer from habitat simulator
         if self.enable_region_layer: # matterport 3D has region annotations 
             for region in semantic_scene.regions:
@@ -104,8 +106,9 @@ class SceneGraphGibson(SceneGraphBase):
                             id=object_id,
                             class_name=obj.category.name(),
                             label=obj.category.index(),
-                            bbox=node_bbox,
                         )
+                        segment_obj_ids.append(object_node.id)
+                        segment_obj_bboxes.append(node_bbox)
 
                         # connect object to region
                         region_node.add_object(object_node)
@@ -137,6 +140,10 @@ class SceneGraphGibson(SceneGraphBase):
                         id=object_id,
                         class_name=obj.category.name(),
                         label=obj.category.index(),
-                        bbox=node_bbox,
-                    )                
+                    )
+                    segment_obj_ids.append(object_node.id)
+                    segment_obj_bboxes.append(node_bbox)
+        
+        if len(segment_obj_ids) > 0:
+            self.object_layer.segment_objects_on_grid_map_xz(segment_obj_ids, segment_obj_bboxes)
         return
@@ -157,4 +157,4 @@ if __name__ == "__main__":
     sg.load_gt_scene_graph(sim)
     
     # TODO: add visualization tools here: 
-    o3d.visualization.draw_geometries([sg.nav_mesh.mesh], mesh_show_back_face=True)
+    o3d.visualization.draw_geometries([sg.nav_mesh.paint_slope_colors()], mesh_show_back_face=True)
@@ -10,12 +10,16 @@ import open3d as o3d
 import copy 
 import plotly.graph_objects as go
 from scipy import stats
+import magnum as mn
+from habitat_sim.utils.common import quat_from_magnum, quat_to_coeffs
 from habitat.tasks.rearrange.rearrange_sim import RearrangeSim
 from habitat.tasks.rearrange.articulated_agent_manager import ArticulatedAgentData
 from habitat.articulated_agents.mobile_manipulator import MobileManipulator
 
 from habitat_mas.utils.constants import coco_categories, coco_label_mapping
 from habitat_mas.scene_graph.scene_graph_base import SceneGraphBase
+from habitat_mas.scene_graph.object_layer import ObjectLayer
+from habitat_mas.scene_graph.agent_layer import AgentLayer
 from habitat_mas.scene_graph.utils import (
     visualize_scene_graph,
     # generate_region_adjacency_description,
@@ -24,7 +28,7 @@ from habitat_mas.scene_graph.utils import (
     generate_agents_description
 )
 from habitat_mas.perception.grid_map import GridMap
-from habitat_mas.perception.nav_mesh import NavMesh
+from habitat_mas.perception.nav_mesh import NavMesh, get_default_navmesh_cache
 
 class SceneGraphHSSD(SceneGraphBase):
 
@@ -36,13 +40,23 @@ class SceneGraphHSSD(SceneGraphBase):
         self.meters_per_grid = kwargs.get('meters_per_grid', 0.05)
         self.object_grid_scale = kwargs.get('object_grid_scale', 1)
         self.aligned_bbox = kwargs.get('aligned_bbox', True)
+        # reuse derived navmesh artifacts across scene graph builds of the same scene,
+        # if the navmesh cache is enabled with HABITAT_MAS_NAVMESH_CACHE
+        self.use_navmesh_cache = kwargs.get('use_navmesh_cache', True)
         self.enable_region_layer = False
+        # objects and agents moving less than update_atol are not marked as dirty
+        self.update_atol = kwargs.get('update_atol', 1e-3)
+        self.scene_id = None
+        # (kind, id in simulator) -> object node id
+        self._object_keys = {}
+        self.clear_dirty()
         # Util habitat-sim v0.3.1, HM3D region annotation missing
         # self.compute_region_bbox = kwargs.get('compute_region_bbox', True)
 
     def load_gt_scene_graph(self, sim: RearrangeSim):
         # register habitat simulator
         self.sim = sim
+        self.scene_id = sim.ep_info.scene_id if sim.ep_info is not None else None
         # get boundary of the scene (one-layer) and initialize map
         self.scene_bounds = self.sim.pathfinder.get_bounds()
         self.current_height = sim.get_agent(0).state.position[1]
@@ -53,33 +67,69 @@ class SceneGraphHSSD(SceneGraphBase):
         self.nav_mesh = NavMesh(
             vertices=np.stack(navmesh_vertices, axis=0),
             triangles=np.array(navmesh_indices).reshape(-1, 3),
+            cache=get_default_navmesh_cache() if self.use_navmesh_cache else None,
         )
             
         # 3. load object layer from habitat simulator
-        rom = self.sim.get_rigid_object_manager()
+        # 4. load targets and goal receptacles
+        # 5. load agents from habitat simulator
+        self._sync_objects()
+        self._sync_agents()
+
+    def update_scene_graph(self, sim: RearrangeSim) -> bool:
+        """
+        Refresh the scene graph from the simulator, rebuilding it only if the scene changed.
+        Otherwise only object poses, targets / goal receptacles and agent poses are refreshed, 
+        and the changed nodes are recorded in dirty_object_ids and dirty_agent_ids.
+        
+        Returns True if anything changed since the last call of clear_dirty().
+        """
+        scene_id = sim.ep_info.scene_id if sim.ep_info is not None else None
+        if self.sim is not sim or self.nav_mesh is None or self.scene_id != scene_id:
+            # new scene: start from empty layers
+            removed_object_ids = list(self.object_layer.obj_ids)
+            self.object_layer = ObjectLayer()
+            self.agent_layer = AgentLayer()
+            self._object_keys = {}
+            self.load_gt_scene_graph(sim)
+            self.removed_object_ids.update(removed_object_ids)
+        else:
+            self._sync_objects()
+            self._sync_agents()
+        return self.is_dirty
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.dirty_object_ids or self.removed_object_ids or self.dirty_agent_ids)
+
+    def clear_dirty(self):
+        self.dirty_object_ids = set()
+        self.removed_object_ids = set()
+        self.dirty_agent_ids = set()
+
+    def _sync_objects(self):
+        """Add, update or remove object nodes to match the objects and targets in the simulator"""
+        sim = self.sim
+        rom = sim.get_rigid_object_manager()
+        
+        # collect the current objects, keyed by what identifies them across steps
+        current_objects = {}
         for object_handle, obj_id in sim.handle_to_object_id.items():
             # alias name for object
-            if obj_id in self.object_layer.obj_ids:
+            if ("object", obj_id) in current_objects:
                 #TODO: add alias to object node
                 continue
             
+            abs_obj_id = sim.scene_obj_ids[obj_id]
+            obj = rom.get_object_by_id(abs_obj_id)
             
-            abs_obj_id = self.sim.scene_obj_ids[obj_id]
-            cur_pos = rom.get_object_by_id(
-                abs_obj_id
-            ).transformation.translation
-            cur_rot = rom.get_object_by_id(
-                abs_obj_id
-            ).transformation.rotation
-
             obj_label = None
             if object_handle in sim._handle_to_goal_name:
                 obj_label = sim._handle_to_goal_name[object_handle]
             
-            self.object_layer.add_object(
-                cur_pos,
-                cur_rot,
-                # size,
+            current_objects[("object", obj_id)] = dict(
+                center=np.array(obj.translation),
+                rotation=quat_to_coeffs(quat_from_magnum(obj.rotation)),
                 id=obj_id,
                 label=obj_label,
                 full_name=object_handle,
@@ -87,34 +137,68 @@ class SceneGraphHSSD(SceneGraphBase):
                 # bbox=node_bbox,
             )
         
-        target_trans = self.sim._get_target_trans()
+        target_trans = sim._get_target_trans()
         if len(target_trans):
             targets = {}
             for id, (target_id, trans) in enumerate(target_trans):
                 targets[id] = trans
 
-            if self.sim.ep_info.goal_receptacles and len(self.sim.ep_info.goal_receptacles):
-                for target_id, goal_recep in enumerate(self.sim.ep_info.goal_receptacles):
+            if sim.ep_info.goal_receptacles and len(sim.ep_info.goal_receptacles):
+                for target_id, goal_recep in enumerate(sim.ep_info.goal_receptacles):
                     goal_recep_handle = goal_recep[0]
                     assert target_id in targets
                     target = targets[target_id]
-                    target_pos = target.translation
-                    target_rot = target.rotation
-
                     goal_recep = rom.get_object_by_handle(goal_recep_handle)
-                    abs_obj_id = goal_recep.object_id + self.sim.habitat_config.object_ids_start
-                    self.object_layer.add_object(
-                        target_pos,
-                        target_rot,
+                    abs_obj_id = goal_recep.object_id + sim.habitat_config.object_ids_start
+                    current_objects[("target", target_id)] = dict(
+                        center=np.array(target.translation),
+                        rotation=quat_to_coeffs(
+                            quat_from_magnum(mn.Quaternion.from_matrix(target.rotation()))
+                        ),
                         id=abs_obj_id,
                         full_name=goal_recep_handle,
                         label=f"TARGET_any_targets|{target_id}"
                     )
+        
+        # remove objects that are gone, e.g. after a new episode in the same scene
+        for key in list(self._object_keys):
+            if key not in current_objects:
+                obj_id = self._object_keys.pop(key)
+                self.object_layer.remove_object(obj_id)
+                self.dirty_object_ids.discard(obj_id)
+                self.removed_object_ids.add(obj_id)
+        
+        for key, obj_info in current_objects.items():
+            if key in self._object_keys:
+                obj_id = self._object_keys[key]
+                if self.object_layer.update_object(
+                    obj_id,
+                    center=obj_info["center"],
+                    rotation=obj_info["rotation"],
+                    atol=self.update_atol,
+                    label=obj_info["label"],
+                    full_name=obj_info["full_name"],
+                ):
+                    self.dirty_object_ids.add(obj_id)
+            else:
+                obj_node = self.object_layer.add_object(
+                    obj_info.pop("center"), obj_info.pop("rotation"), **obj_info
+                )
+                self._object_keys[key] = obj_node.id
+                self.dirty_object_ids.add(obj_node.id)
 
-        # 5. load agents from habitat simulator
+    def _sync_agents(self):
+        """Add or update agent nodes to match the articulated agents in the simulator"""
+        sim = self.sim
         for i, agent_name in enumerate(sim.agents_mgr.agents_order):
             agent: MobileManipulator = sim.agents_mgr[i].articulated_agent
-            agent_name = agent_name
+            
+            if i in self.agent_layer.agent_dict:
+                if self.agent_layer.update_agent(
+                    i, agent.base_pos, agent.base_rot, atol=self.update_atol
+                ):
+                    self.dirty_agent_ids.add(i)
+                continue
             
             # Assuming agent_layer.add_agent is modified to accept more parameters
             self.agent_layer.add_agent(
@@ -125,7 +209,7 @@ class SceneGraphHSSD(SceneGraphBase):
                 # Add more parameters here
                 description=sim.agents_mgr[i].cfg['articulated_agent_type']
             )
-                    
+            self.dirty_agent_ids.add(i)
                     
     def load_gt_geometry(self):
         # load the ply file of the scene
@@ -172,7 +256,7 @@ if __name__ == "__main__":
     ############ Generate scene description ###########
 
     # Generate scene descriptions
-    objects_description = generate_objects_description(env.sim, sg.object_layer)
+    objects_description = generate_objects_description(env.sim, sg.object_layer, sg.nav_mesh)
     agent_description = generate_agents_description(sg.agent_layer, sg.region_layer, sg.nav_mesh)
         
     # print(region_scene_graph_description)
@@ -6,6 +6,7 @@ from typing import List
 import pathlib
 import numpy as np
 import pickle
+import magnum as mn
 import open3d as o3d
 import copy 
 import plotly.graph_objects as go
@@ -13,6 +14,7 @@ from scipy import stats
 from habitat_sim import Simulator
 from habitat.tasks.rearrange.rearrange_sim import RearrangeSim
 from habitat_sim.agent import AgentState
+from habitat_sim.utils.common import quat_from_magnum, quat_to_coeffs
 from habitat.articulated_agents.mobile_manipulator import MobileManipulator
 
 from habitat_mas.utils.constants import coco_categories, coco_label_mapping
@@ -24,7 +26,7 @@ from habitat_mas.scene_graph.utils import (
     generate_agents_description
 )
 from habitat_mas.perception.grid_map import GridMap
-from habitat_mas.perception.nav_mesh import NavMesh
+from habitat_mas.perception.nav_mesh import NavMesh, get_default_navmesh_cache
 class SceneGraphMP3D(SceneGraphBase):
 
     def __init__(self, **kwargs) -> None:
@@ -35,6 +37,9 @@ class SceneGraphMP3D(SceneGraphBase):
         self.meters_per_grid = kwargs.get('meters_per_grid', 0.05)
         self.object_grid_scale = kwargs.get('object_grid_scale', 1)
         self.aligned_bbox = kwargs.get('aligned_bbox', True)
+        # reuse derived navmesh artifacts across scene graph builds of the same scene,
+        # if the navmesh cache is enabled with HABITAT_MAS_NAVMESH_CACHE
+        self.use_navmesh_cache = kwargs.get('use_navmesh_cache', True)
         self.enable_region_layer = kwargs.get('enable_region_layer', True)
         # Util habitat-sim v0.3.1, HM3D region annotation missing
         # self.compute_region_bbox = kwargs.get('compute_region_bbox', True)
@@ -52,6 +57,7 @@ class SceneGraphMP3D(SceneGraphBase):
         self.nav_mesh = NavMesh(
             vertices=np.stack(navmesh_vertices, axis=0),
             triangles=np.array(navmesh_indices).reshape(-1, 3),
+            cache=get_default_navmesh_cache() if self.use_navmesh_cache else None,
         )
         
         rom = self.sim.get_rigid_object_manager()
@@ -60,6 +66,7 @@ class SceneGraphMP3D(SceneGraphBase):
         semantic_scene = self.sim.semantic_scene
         # 2. load region layer from habitat simulator
         if self.enable_region_layer: # matterport 3D has region annotations 
+            level_heights = {}
             for region in semantic_scene.regions:
             # add region node to region layer
                 region_id = int(region.id.split("_")[-1]) # counting from 0, -1 for background
@@ -82,7 +89,6 @@ class SceneGraphMP3D(SceneGraphBase):
                     region_label = region.category.index()
                 
                 parent_level = region.level.id
-                level_height = region.level.aabb.center[1]
 
                 region_node = self.region_layer.add_region(
                     region_bbox,
@@ -91,74 +97,80 @@ class SceneGraphMP3D(SceneGraphBase):
                     label=region_label,
                     parent_level=parent_level
                 )
+                level_heights[region_node.region_id] = region.level.aabb.center[1]
 
-                # 3. load object layer from habitat simulator
-                for object_handle, entity_name in self.sim._handle_to_goal_name.items():
-                    assert object_handle in all_object_handles
-                    obj = rom.get_object_by_handle(object_handle)
-                    abs_obj_id = obj.semantic_id
-                    pos = obj.translation
-                    pos = np.array([pos.x, pos.y, pos.z])
-
-                    rot = obj.rotation
-
-                    is_inside = np.all(pos >= region_bbox[0]) and np.all(
-                        pos <= region_bbox[1]
-                    )
-                    if is_inside and abs_obj_id not in self.object_layer.obj_ids:
-                        snap_pos = sim.safe_snap_point(pos)
-                        if np.isnan(snap_pos[0]):
-                            height_to_floor = pos[1] - level_height
-                        else:
-                            height_to_floor = pos[1] - snap_pos[1]
-                        if height_to_floor < 0:
-                            height_to_floor = 0
-                        object_node = self.object_layer.add_object(
-                            center=pos,
-                            rotation=rot,
-                            id=abs_obj_id,
-                            full_name=object_handle,
-                            label=entity_name,
-                            parent_region=region_node,
-                            height=height_to_floor
-                        )
-                        region_node.add_object(object_node)
-                
-                target_trans = self.sim._get_target_trans()
-                targets= {}
-                for target_id, trans in target_trans:
-                    targets[target_id] = trans
-
-                if self.sim.ep_info.goal_receptacles and len(self.sim.ep_info.goal_receptacles):
-                    for target_id, goal_recep in enumerate(self.sim.ep_info.goal_receptacles):
-                        goal_recep_handle = goal_recep[0]
-                        assert goal_recep_handle in all_object_handles
-                        obj = rom.get_object_by_handle(goal_recep_handle)
-                        abs_obj_id = obj.semantic_id
-                        
-                        target = targets[target_id]
-                        target_pos = np.array(target.translation)
-                        target_rot = target.rotation
+            # 3. load object layer from habitat simulator
+            # goal objects, then goal receptacles at their targets
+            candidates = []
+            for object_handle, entity_name in self.sim._handle_to_goal_name.items():
+                assert object_handle in all_object_handles
+                obj = rom.get_object_by_handle(object_handle)
+                pos = obj.translation
+                candidates.append(dict(
+                    center=np.array([pos.x, pos.y, pos.z]),
+                    rotation=quat_to_coeffs(quat_from_magnum(obj.rotation)),
+                    id=obj.semantic_id,
+                    full_name=object_handle,
+                    label=entity_name,
+                    clamp_height=True,
+                ))
+            
+            target_trans = self.sim._get_target_trans()
+            targets= {}
+            for target_id, trans in target_trans:
+                targets[target_id] = trans
 
-                        is_inside = np.all(target_pos >= region_bbox[0]) and np.all(
-                            target_pos <= region_bbox[1]
-                        )
-                        if is_inside and abs_obj_id not in self.object_layer.obj_ids:
-                            snap_pos = sim.safe_snap_point(target_pos)
-                            if np.isnan(snap_pos[0]):
-                                height_to_floor = target_pos[1] - level_height
-                            else:
-                                height_to_floor = target_pos[1] - snap_pos[1]
-                            object_node = self.object_layer.add_object(
-                                center=target_pos,
-                                rotation=target_rot,
-                                id=abs_obj_id,
-                                full_name=goal_recep_handle,
-                                label=f"TARGET_any_targets|{target_id}",
-                                parent_region=region_node,
-                                height=height_to_floor
-                            )
-                            region_node.add_object(object_node)
+            if self.sim.ep_info.goal_receptacles and len(self.sim.ep_info.goal_receptacles):
+                for target_id, goal_recep in enumerate(self.sim.ep_info.goal_receptacles):
+                    goal_recep_handle = goal_recep[0]
+                    assert goal_recep_handle in all_object_handles
+                    obj = rom.get_object_by_handle(goal_recep_handle)
+                    target = targets[target_id]
+                    candidates.append(dict(
+                        center=np.array(target.translation),
+                        rotation=quat_to_coeffs(
+                            quat_from_magnum(mn.Quaternion.from_matrix(target.rotation()))
+                        ),
+                        id=obj.semantic_id,
+                        full_name=goal_recep_handle,
+                        label=f"TARGET_any_targets|{target_id}",
+                        clamp_height=False,
+                    ))
+            
+            # assign all candidates to the first region containing them in one query,
+            # then add them region by region
+            candidate_region_ids = self.region_layer.find_regions(
+                [candidate["center"] for candidate in candidates]
+            )
+            region_order = {region_id: i for i, region_id in enumerate(self.region_layer.region_ids)}
+            candidate_order = sorted(
+                (region_order[region_id], i)
+                for i, region_id in enumerate(candidate_region_ids) if region_id >= 0
+            )
+            for _, i in candidate_order:
+                candidate = candidates[i]
+                if candidate["id"] in self.object_layer:
+                    continue
+                region_node = self.region_layer.region_dict[candidate_region_ids[i]]
+                pos = candidate["center"]
+                # snap once per added object
+                snap_pos = sim.safe_snap_point(pos)
+                if np.isnan(snap_pos[0]):
+                    height_to_floor = pos[1] - level_heights[region_node.region_id]
+                else:
+                    height_to_floor = pos[1] - snap_pos[1]
+                if candidate["clamp_height"] and height_to_floor < 0:
+                    height_to_floor = 0
+                object_node = self.object_layer.add_object(
+                    center=pos,
+                    rotation=candidate["rotation"],
+                    id=candidate["id"],
+                    full_name=candidate["full_name"],
+                    label=candidate["label"],
+                    parent_region=region_node,
+                    height=height_to_floor
+                )
+                region_node.add_object(object_node)
                     
             # 4. build region triangle adjacency graph
             # algorithm to build abstract scene graph:
@@ -168,7 +180,7 @@ class SceneGraphMP3D(SceneGraphBase):
             )
             self.nav_mesh.propagate_region_ids()
             self.region_layer.add_region_adjacency_edges(
-                self.nav_mesh.triangle_region_ids, self.nav_mesh.triangle_adjacency_list
+                self.nav_mesh.triangle_region_ids, self.nav_mesh.triangle_adjacency_csr
             )
             
         # TODO: load agent externally from habitat-lab API
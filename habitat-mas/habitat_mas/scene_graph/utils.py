@@ -41,6 +41,86 @@ def grid_xz_to_points(bounds, grids, height, meters_per_pixel):
     return np.stack([points_x, points_y, points_z], axis=1)
 
 
+def project_bboxes_to_grid_slices_xz(bounds, bboxes, meters_per_pixel, grid_shape):
+    """
+    @bounds: ((min_x, min_y, min_z), (max_x, max_y, max_z))
+    @bboxes: numpy array with shape (N, 2, 3), [min, max] corners
+    @grid_shape: (num_rows, num_cols) of the grid map
+    return: grid_slices, numpy array (N, 4) [row_start, row_stop, col_start, col_stop] of the 
+        grid cells covered by each bbox, normalized like python slices of the grid
+    """
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 2, 3)
+    # (N, 2, 2), [min, max] x [x, y] on the 2d grid map
+    grid_bboxes = project_points_to_grid_xz(
+        bounds, bboxes.reshape(-1, 3), meters_per_pixel
+    ).reshape(-1, 2, 2)
+    # NOTE: (row_idx, col_idx) corresponds to (y, x) in 2d grid map
+    grid_slices = np.stack(
+        [grid_bboxes[:, 0, 1], grid_bboxes[:, 1, 1], grid_bboxes[:, 0, 0], grid_bboxes[:, 1, 0]], 
+        axis=1
+    )
+    # negative indices count from the end and indices are clipped to the grid, as in slicing
+    lengths = np.array([grid_shape[0], grid_shape[0], grid_shape[1], grid_shape[1]])
+    grid_slices = np.where(grid_slices < 0, grid_slices + lengths, grid_slices)
+    return np.clip(grid_slices, 0, lengths)
+
+
+def grid_slice_to_mask(grid_slice, grid_shape, free_space_grid=None):
+    """
+    @grid_slice: [row_start, row_stop, col_start, col_stop]
+    @free_space_grid: optional boolean grid the mask is restricted to
+    return: boolean mask with shape grid_shape
+    """
+    mask = np.zeros(grid_shape, dtype=bool)
+    mask[grid_slice[0]:grid_slice[1], grid_slice[2]:grid_slice[3]] = True
+    if free_space_grid is not None:
+        mask &= free_space_grid
+    return mask
+
+
+def rasterize_grid_slices(segment_grid, grid_slices, labels, free_space_grid=None):
+    """
+    Paint the labels of all grid slices on segment_grid in place in one pass, later slices 
+    over earlier ones. Only the covered cells are visited, no per-slice mask is allocated.
+    
+    @segment_grid: int grid map, -1 for unlabeled cells
+    @grid_slices: numpy array (N, 4), see project_bboxes_to_grid_slices_xz
+    @labels: numpy array (N,), label painted by each slice
+    @free_space_grid: optional boolean grid, cells outside it are not painted
+    return: is_overlapped, boolean numpy array (N,), whether a slice covers a cell that is also
+        covered by another slice or already labeled
+    """
+    grid_slices = np.asarray(grid_slices, dtype=int).reshape(-1, 4)
+    labels = np.asarray(labels)
+    num_cols = segment_grid.shape[1]
+    heights = np.maximum(grid_slices[:, 1] - grid_slices[:, 0], 0)
+    widths = np.maximum(grid_slices[:, 3] - grid_slices[:, 2], 0)
+    areas = heights * widths
+    
+    # flat indices of all covered cells, grouped by slice
+    slice_idx = np.repeat(np.arange(len(grid_slices)), areas)
+    offsets = np.arange(areas.sum()) - np.repeat(np.cumsum(areas) - areas, areas)
+    widths = np.maximum(widths, 1)[slice_idx]
+    rows = grid_slices[slice_idx, 0] + offsets // widths
+    cols = grid_slices[slice_idx, 2] + offsets % widths
+    if free_space_grid is not None:
+        is_free = free_space_grid[rows, cols]
+        slice_idx, rows, cols = slice_idx[is_free], rows[is_free], cols[is_free]
+    flat_idx = rows * num_cols + cols
+    
+    # label count reduction: the last slice covering a cell wins, cells covered twice overlap
+    unique_idx, last_reversed, counts = np.unique(
+        flat_idx[::-1], return_index=True, return_counts=True
+    )
+    last = len(flat_idx) - 1 - last_reversed
+    is_overlapped_cell = (counts > 1) | (segment_grid.flat[unique_idx] != -1)
+    is_overlapped = np.zeros(len(grid_slices), dtype=bool)
+    is_overlapped[slice_idx[np.isin(flat_idx, unique_idx[is_overlapped_cell])]] = True
+    
+    segment_grid.flat[unique_idx] = labels[slice_idx[last]]
+    return is_overlapped
+
+
 ################ bounding box ######################################
 
 # vertices order of box for visualization
@@ -176,46 +256,81 @@ def generate_region_objects_description(region_layer, region_id):
         
     return description
 
-def generate_objects_description(sim, object_layer):
+def compute_navigable_distances(sim, points, nav_mesh=None):
+    """
+    Horizontal distances of points to their nearest navigable points, inf if none is found.
+    
+    With a nav_mesh, all points are snapped in one batched query on the navmesh triangles.
+    Otherwise they are snapped with the simulator pathfinder, island by island.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if nav_mesh is not None:
+        snap_pos = nav_mesh.snap_points(points)
+    else:
+        snap_pos = np.full_like(points, np.nan)
+        num_islands = sim.pathfinder.num_islands
+        for i, point in enumerate(points):
+            for nav_island in range(num_islands):
+                island_snap_pos = np.array(sim.pathfinder.snap_point(point, nav_island))
+                if not np.isnan(island_snap_pos).any():
+                    snap_pos[i] = island_snap_pos
+                    break
+    
+    horizontal_dists = np.linalg.norm(snap_pos[:, [0, 2]] - points[:, [0, 2]], axis=1)
+    horizontal_dists[np.isnan(horizontal_dists)] = np.inf
+    return horizontal_dists
+
+def generate_objects_description(sim, object_layer, nav_mesh=None):
     """
     Generate description of objects, used when region layer is empty 
     """
-    description = "There are {} objects in the scene.\n".format(len(object_layer.obj_ids))
-    for obj_id in object_layer.obj_ids:
-        obj = object_layer.obj_dict[obj_id]
+    description = generate_objects_description_header(object_layer)
+    obj_ids = object_layer.obj_ids
+    horizontal_dists = compute_navigable_distances(
+        sim, object_layer.get_centers(obj_ids), nav_mesh
+    )
+    for obj_id, horizontal_dist in zip(obj_ids, horizontal_dists):
+        description += generate_object_description(
+            sim, object_layer.obj_dict[obj_id], horizontal_dist
+        )
 
-        if obj.full_name in sim._handle_to_goal_name:
-            obj_name = sim._handle_to_goal_name[obj.full_name]
-        elif obj.label:
-            obj_name = obj.label
-        if obj.full_name is None:
-            obj_name = "any_targets|" + str(obj_id)
-        else:
-            obj_name = obj.full_name
-        
-        position = np.array(obj.center)
-        # Remove quotes in list 
-        # position_str = ', '.join([f'{p:.1f}' for p in position])
-        # description += f'Object "{obj_name}" is at the position [{position_str}]. '
-        # add height and distance information
-        description += f'The height of "{obj_name}" is {position[1]:.1f}. '
-        island_areas = [
-            (island_ix, sim.pathfinder.island_area(island_index=island_ix))
-            for island_ix in range(sim.pathfinder.num_islands)
-        ]
-        horizontal_dist = np.inf
-        for nav_island in range(len(island_areas)):
-            snap_pos = sim.pathfinder.snap_point(obj.center, nav_island)
-            if not np.isnan(snap_pos).any():
-                horizontal_dist = np.linalg.norm(
-                    np.array(snap_pos)[[0, 2]] - np.array(obj.center)[[0, 2]]
-                )
-                break
-        description += f'The horizontal distance of "{obj_name}" to the nearest navigable point is {horizontal_dist:.1f}. '
-        if horizontal_dist == np.inf:
-            description += f'"inf" means the robot cannot navigate to a position near "{obj_name}".\n'
-        else:
-            description += "\n"
+    return description
+
+def generate_objects_description_header(object_layer):
+    return "There are {} objects in the scene.\n".format(len(object_layer.obj_ids))
+
+def generate_object_description(sim, obj, horizontal_dist=None):
+    """
+    Generate the description of a single object, see generate_objects_description
+    
+    Arguments:
+        horizontal_dist: horizontal distance of the object to the nearest navigable point, 
+            computed with the simulator pathfinder if None, see compute_navigable_distances
+    """
+    description = ""
+    obj_id = obj.id
+    if obj.full_name in sim._handle_to_goal_name:
+        obj_name = sim._handle_to_goal_name[obj.full_name]
+    elif obj.label:
+        obj_name = obj.label
+    if obj.full_name is None:
+        obj_name = "any_targets|" + str(obj_id)
+    else:
+        obj_name = obj.full_name
+    
+    position = np.array(obj.center)
+    # Remove quotes in list 
+    # position_str = ', '.join([f'{p:.1f}' for p in position])
+    # description += f'Object "{obj_name}" is at the position [{position_str}]. '
+    # add height and distance information
+    description += f'The height of "{obj_name}" is {position[1]:.1f}. '
+    if horizontal_dist is None:
+        horizontal_dist = compute_navigable_distances(sim, position)[0]
+    description += f'The horizontal distance of "{obj_name}" to the nearest navigable point is {horizontal_dist:.1f}. '
+    if horizontal_dist == np.inf:
+        description += f'"inf" means the robot cannot navigate to a position near "{obj_name}".\n'
+    else:
+        description += "\n"
 
     return description
 
@@ -269,26 +384,21 @@ def generate_agents_description(agent_layer, region_layer, nav_mesh):
 
 def generate_mp3d_agents_description(agent_layer, region_layer):
     agent_description = "There are {} agents in the scene.\n".format(len(agent_layer.agent_ids))
-    for agent_id in agent_layer.agent_ids:
+    agents_region_ids = region_layer.find_regions(
+        [agent_layer.agent_dict[agent_id].position for agent_id in agent_layer.agent_ids]
+    )
+    for agent_id, region_id in zip(agent_layer.agent_ids, agents_region_ids):
         agent = agent_layer.agent_dict[agent_id]
         agent_name = agent.agent_name
         agent_pos = agent.position
-
-        find_agent_in_region = False
-        for region_id in region_layer.region_ids:
-            region_node = region_layer.region_dict[region_id]
-            region_bb = region_node.bbox
-
-            if np.all(agent_pos >= region_bb[0]) and np.all(agent_pos <= region_bb[1]):
-                region_name = region_node.class_name + "_" + str(region_id)
-                parent_level = region_node.parent_level
-                find_agent_in_region = True
-                break
         
         agent_pos_str = ', '.join([f'{p:.1f}' for p in agent_pos])
-        if not find_agent_in_region:
+        if region_id < 0:
             agent_description += f'"{agent_name}" is at position [{agent_pos_str}].\n'
         else:
+            region_node = region_layer.region_dict[region_id]
+            region_name = region_node.class_name + "_" + str(region_id)
+            parent_level = region_node.parent_level
             agent_description += f'"{agent_name}" is in {region_name} on {parent_level} floor.\n'
         
     return agent_description
@@ -385,7 +495,7 @@ def visualize_scene_graph(
     ############### visualize gt free space segmentation ###############
     if vis_navmesh:
         if scene_graph.nav_mesh is not None:
-            mesh = scene_graph.nav_mesh.mesh
+            mesh = scene_graph.nav_mesh.paint_slope_colors()
             # deep copy and rotate
             mesh = copy.deepcopy(mesh)
             if mp3d_coord:
@@ -1,5 +1,6 @@
 import os
-from typing import List, Dict, Any
+import weakref
+from typing import List, Dict, Any, Optional
 import numpy as np
 import json
 from gym import spaces
@@ -12,18 +13,31 @@ from habitat_mas.dataset.defaults import habitat_mas_data_dir
 from habitat_mas.scene_graph.scene_graph_hssd import SceneGraphHSSD
 from habitat_mas.scene_graph.scene_graph_mp3d import SceneGraphMP3D
 from habitat_mas.scene_graph.utils import (
+    compute_navigable_distances,
     generate_objects_description, 
+    generate_objects_description_header,
+    generate_object_description,
     generate_agents_description, 
     generate_mp3d_objects_description, 
     generate_mp3d_agents_description,
     generate_region_adjacency_description
 )    
 
+@dataclass
+class _SceneDescriptionState:
+    """Scene graph and generated text kept between scene description observations"""
+    scene_graph: Any
+    object_descriptions: Dict[int, str] = field(default_factory=dict)
+    description: Optional[str] = None
+
+
 @registry.register_sensor
 class HSSDSceneDescriptionSensor(Sensor):
     """Sensor to generate text descriptions of the scene from the environment simulation."""
     # TODO: consider if all scene description sensors should have the same uuid, since only one can be used in a dataset
     cls_uuid: str = "scene_description"
+    # Sensors are re-created for every text context, keep the scene graphs per simulator
+    _scene_states: "weakref.WeakKeyDictionary[Any, _SceneDescriptionState]" = weakref.WeakKeyDictionary()
     
     def __init__(self, sim, config, *args, **kwargs):
         self._sim = sim
@@ -42,13 +56,34 @@ class HSSDSceneDescriptionSensor(Sensor):
     def get_observation(self, *args, **kwargs):
         """Generate text descriptions of the scene."""
         
-        # Initialize scene graph
-        sg = SceneGraphHSSD()
-        sg.load_gt_scene_graph(self._sim)
+        # The scene graph persists across steps and episodes of the same simulator,
+        # only moved objects and agents are refreshed and re-described
+        state = self._scene_states.get(self._sim)
+        if state is None:
+            state = _SceneDescriptionState(scene_graph=SceneGraphHSSD())
+            self._scene_states[self._sim] = state
+        sg = state.scene_graph
+        
+        if not sg.update_scene_graph(self._sim) and state.description is not None:
+            return state.description
         
         # Generate scene descriptions
-        objects_description = generate_objects_description(self._sim, sg.object_layer)
+        for obj_id in sg.removed_object_ids:
+            state.object_descriptions.pop(obj_id, None)
+        dirty_object_ids = list(sg.dirty_object_ids)
+        # snap all the moved objects to the navmesh at once
+        horizontal_dists = compute_navigable_distances(
+            self._sim, sg.object_layer.get_centers(dirty_object_ids), sg.nav_mesh
+        )
+        for obj_id, horizontal_dist in zip(dirty_object_ids, horizontal_dists):
+            state.object_descriptions[obj_id] = generate_object_description(
+                self._sim, sg.object_layer.obj_dict[obj_id], horizontal_dist
+            )
+        objects_description = generate_objects_description_header(sg.object_layer) + "".join(
+            state.object_descriptions[obj_id] for obj_id in sg.object_layer.obj_ids
+        )
         agent_description = generate_agents_description(sg.agent_layer, sg.region_layer, sg.nav_mesh)
+        sg.clear_dirty()
         
         scene_description = {
             "objects_description": objects_description,
@@ -60,6 +95,7 @@ class HSSDSceneDescriptionSensor(Sensor):
         scene_description_str = 'Here are the descriptions of the scene: \n'
         scene_description_str += objects_description + '\n'
         scene_description_str += agent_description
+        state.description = scene_description_str
         return scene_description_str
 
 class MP3DSceneDescriptionSensor(Sensor):
@@ -0,0 +1,19 @@
+import numpy as np
+
+
+def make_grid_triangles(num_rows, num_cols, seed=None):
+    """
+    Triangulate a regular (num_rows x num_cols) grid of quads, two triangles per quad.
+    With a seed, the triangles are returned in random order.
+    """
+    vertex_ids = np.arange((num_rows + 1) * (num_cols + 1)).reshape(num_rows + 1, num_cols + 1)
+    v00 = vertex_ids[:-1, :-1].ravel()
+    v01 = vertex_ids[:-1, 1:].ravel()
+    v10 = vertex_ids[1:, :-1].ravel()
+    v11 = vertex_ids[1:, 1:].ravel()
+    triangles = np.concatenate(
+        [np.stack([v00, v01, v11], axis=1), np.stack([v00, v11, v10], axis=1)], axis=0
+    )
+    if seed is not None:
+        triangles = np.random.default_rng(seed).permutation(triangles)
+    return triangles
@@ -0,0 +1,118 @@
+import os
+from types import SimpleNamespace
+import numpy as np
+import pytest
+mn = pytest.importorskip("magnum")
+urchin = pytest.importorskip("urchin")
+from habitat_mas.agents.capabilities.manipulation import (
+    get_all_robot_arm_workspace,
+    sample_ee_positions,
+)
+from habitat_mas.agents.capabilities.parse_urdf import (
+    BatchedChainFK,
+    get_joint_by_child_link,
+    parse_urdf,
+    sample_joint_positions,
+)
+from habitat_mas.agents.robots.defaults import (
+    robot_arm_params,
+    robot_arm_workspaces,
+    robot_link_id2name_map,
+    robot_urdf_paths,
+)
+
+requires_robot_urdfs = pytest.mark.skipif(
+    not all(os.path.exists(robot_urdf_paths[robot_type]) for robot_type in robot_arm_workspaces),
+    reason="Robot URDFs are not downloaded",
+)
+
+
+def horizontal_norm(position):
+    return np.linalg.norm(np.asarray(position)[[0, 2]])
+
+
+@requires_robot_urdfs
+def test_arm_workspace_matches_precomputed():
+    """
+    The workspaces computed by forward kinematics match the ones precomputed in the simulator.
+    The robot yaw of the precomputed ones is unknown, so only the yaw invariant quantities are compared.
+    """
+    workspaces = get_all_robot_arm_workspace(num_bins=5)
+    for robot_type, expected in robot_arm_workspaces.items():
+        workspace = workspaces[robot_type]
+        assert workspace["type"] == expected["type"]
+        if expected["type"] == "sphere":
+            # the robots are y-up in habitat, a wrong URDF rotation moves the center off its height
+            assert workspace["radius"] == pytest.approx(expected["radius"], abs=0.1)
+            assert workspace["center"][1] == pytest.approx(expected["center"][1], abs=0.1)
+            assert horizontal_norm(workspace["center"]) == pytest.approx(
+                horizontal_norm(expected["center"]), abs=0.1
+            )
+        else:
+            assert workspace["min_bound"][1] == pytest.approx(expected["min_bound"][1], abs=0.1)
+            assert workspace["max_bound"][1] == pytest.approx(expected["max_bound"][1], abs=0.1)
+
+
+class FetchRobotNoWheels:
+    """Fetch with the link ids of the URDF without wheels, as in habitat.articulated_agents"""
+
+    def __init__(self, base_transformation):
+        arm_params = robot_arm_params["FetchRobot"]
+        link_id2name = robot_link_id2name_map["FetchRobot"]
+        self.urdf_path = robot_urdf_paths["FetchRobot"]
+        self.params = SimpleNamespace(
+            arm_joints=[link_id - 2 for link_id in arm_params["arm_link_ids"]],
+            ee_links=[arm_params["ee_link_id"] - 2],
+            ee_offset=[mn.Vector3(*arm_params["ee_offset"])],
+            base_offset=mn.Vector3(0, 0, 0),
+        )
+        self.sim_obj = SimpleNamespace(get_link_name=lambda link_id: link_id2name[link_id + 2])
+        self.base_transformation = base_transformation
+        self.arm_joint_pos = np.zeros(len(self.params.arm_joints))
+
+    def ee_transform(self):
+        """End effector transformation with the ee offset, as MobileManipulator.ee_transform"""
+        robot = urchin.URDF.load(self.urdf_path, lazy_load_meshes=True)
+        arm_link_names = [self.sim_obj.get_link_name(link_id) for link_id in self.params.arm_joints]
+        cfg = {
+            joint.name: joint_pos
+            for link_name, joint_pos in zip(arm_link_names, self.arm_joint_pos)
+            for joint in robot.joints if joint.child == link_name
+        }
+        link_T = robot.link_fk(cfg=cfg, link=self.sim_obj.get_link_name(self.params.ee_links[0]))
+        rotation = mn.Matrix3x3(*[mn.Vector3(*link_T[:3, i]) for i in range(3)])
+        ee_transform = self.base_transformation @ mn.Matrix4.from_(rotation, mn.Vector3(*link_T[:3, 3]))
+        ee_transform.translation = ee_transform.transform_point(self.params.ee_offset[0])
+        return ee_transform
+
+
+@requires_robot_urdfs
+def test_sample_ee_positions_base_frame():
+    base_position = np.array([1.0, 0.2, -3.0])
+    # the base transformation of the agents includes the rotation of the z-up URDF to y-up
+    base_transformation = mn.Matrix4.from_(
+        mn.Matrix4.rotation_y(mn.Deg(90)).rotation(), mn.Vector3(*base_position)
+    ) @ mn.Matrix4.rotation_x(mn.Rad(-np.pi / 2))
+    agent = FetchRobotNoWheels(base_transformation)
+    sim = SimpleNamespace(agents_mgr=[SimpleNamespace(articulated_agent=agent)])
+
+    # the arm chain comes from the agent params, not the robot class name
+    positions = sample_ee_positions(sim, 0, num_bins=3, subtract_base=False)
+    # the sampled arm joint positions, continuous joints within [-pi, pi]
+    urdf = parse_urdf(agent.urdf_path)
+    fk = BatchedChainFK(
+        urdf,
+        agent.sim_obj.get_link_name(agent.params.ee_links[0]),
+        [get_joint_by_child_link(urdf, agent.sim_obj.get_link_name(link_id)).name for link_id in agent.params.arm_joints],
+    )
+    joint_positions = sample_joint_positions(*fk.get_joint_limits(), num_bins=3)
+    for i in [0, len(joint_positions) // 3, len(joint_positions) - 1]:
+        agent.arm_joint_pos = joint_positions[i]
+        assert np.allclose(positions[i], np.array(agent.ee_transform().translation), atol=1e-5)
+
+    positions = sample_ee_positions(sim, 0, num_bins=5, subtract_base=True)
+    center = positions.mean(axis=0)
+    radius = np.max(np.linalg.norm(positions - center, axis=1))
+    expected = robot_arm_workspaces["FetchRobot"]
+    assert radius == pytest.approx(expected["radius"], abs=0.1)
+    assert center[1] == pytest.approx(expected["center"][1], abs=0.1)
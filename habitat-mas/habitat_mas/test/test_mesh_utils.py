@@ -3,12 +3,22 @@ import open3d as o3d
 import os
 import pickle
 import numpy as np
-from habitat_mas.perception.nav_mesh import NavMesh
+from habitat_mas.perception.nav_mesh import (
+    NAVMESH_CACHE_ENV,
+    NavMesh,
+    NavMeshCache,
+    get_default_navmesh_cache
+)
 from habitat_mas.perception.mesh_utils import (
+    compute_triangle_adjacency,
+    compute_triangle_adjacency_csr,
+    build_region_triangle_adjacency_graph,
     propagate_triangle_region_ids,
     propagate_vertex_region_ids,
-    visualize_triangle_region_segmentation
+    visualize_triangle_region_segmentation,
+    vote_vertex_colors
 )
+from habitat_mas.test.mesh_data import make_grid_triangles
 
 # Set the root directory for pytest
 test_root = os.path.dirname(__file__)
@@ -29,8 +39,209 @@ def get_navmesh():
     
     navmesh.segment_by_region_bbox(region_bbox_dict)
     return navmesh
+
+
+def brute_force_triangle_adjacency(triangles):
+    adjacency_list = []
+    for i, triangle in enumerate(triangles):
+        adjacency_list.append([
+            j for j, other_triangle in enumerate(triangles)
+            if i != j and len(set(triangle).intersection(other_triangle)) == 2
+        ])
+    return adjacency_list
+
+
+def test_compute_triangle_adjacency():
+    rng = np.random.default_rng(0)
+    meshes = [make_grid_triangles(6, 9), rng.integers(0, 20, size=(150, 3))]
+    for triangles in meshes:
+        expected = brute_force_triangle_adjacency(triangles.tolist())
+        assert compute_triangle_adjacency(triangles) == expected
+
+        indptr, indices = compute_triangle_adjacency_csr(triangles)
+        assert len(indptr) == len(triangles) + 1
+        for i, neighbors in enumerate(expected):
+            assert indices[indptr[i]:indptr[i + 1]].tolist() == neighbors
+
+    # only degenerate triangles, no edge to share
+    indptr, indices = compute_triangle_adjacency_csr([[0, 0, 0], [1, 1, 2]])
+    assert indptr.tolist() == [0, 0, 0] and len(indices) == 0
     
 
+def test_propagate_triangle_region_ids_csr():
+    # a strip of 2 x 10 quads, region 0 seeded at the left end and region 1 at the right end
+    triangles = make_grid_triangles(2, 10)
+    indptr, indices = compute_triangle_adjacency_csr(triangles)
+    triangle_region_ids = -np.ones(len(triangles), dtype=int)
+    triangle_region_ids[0] = 0
+    triangle_region_ids[9] = 1
+
+    result = propagate_triangle_region_ids(triangle_region_ids, (indptr, indices))
+    assert (result >= 0).all()
+    # the input is not modified, list and CSR adjacency agree
+    assert (triangle_region_ids == -1).sum() == len(triangles) - 2
+    list_result = propagate_triangle_region_ids(
+        triangle_region_ids, compute_triangle_adjacency(triangles)
+    )
+    assert (result == list_result).all()
+
+    vertex_ids = np.arange(3 * 11)
+    vertices = np.stack([vertex_ids % 11, np.zeros(len(vertex_ids)), vertex_ids // 11], axis=1)
+    triangle_centers = np.mean(vertices[triangles], axis=1)
+    geodesic_result = propagate_triangle_region_ids(
+        triangle_region_ids, (indptr, indices), mode="geodesic", triangle_centers=triangle_centers
+    )
+    # triangles on the far left / right take the region seeded on their side
+    assert (geodesic_result[triangle_centers[:, 0] < 3] == 0).all()
+    assert (geodesic_result[triangle_centers[:, 0] > 7] == 1).all()
+
+    graph = build_region_triangle_adjacency_graph(result, (indptr, indices))
+    assert set(graph.nodes) == {0, 1}
+    assert graph.has_edge(0, 1)
+
+
+def test_navmesh_cache(tmp_path):
+    triangles = make_grid_triangles(4, 6)
+    vertex_ids = np.arange(5 * 7)
+    vertices = np.stack(
+        [vertex_ids % 7, np.zeros(len(vertex_ids)), vertex_ids // 7], axis=1
+    ).astype(np.float64)
+    region_bbox_dict = {
+        0: np.array([[0.0, -1.0, 0.0], [1.0, 1.0, 1.0]]),
+        1: np.array([[5.0, -1.0, 3.0], [6.0, 1.0, 4.0]]),
+    }
+
+    cache = NavMeshCache(str(tmp_path))
+    cold_navmesh = NavMesh(vertices, triangles, cache=cache)
+    cold_navmesh.segment_by_region_bbox(region_bbox_dict)
+    cold_navmesh.propagate_region_ids()
+    # the entry exists after the constructor, the propagated region ids do not
+    assert cache.misses == 2 and cache.hits == 0
+
+    # a new cache instance only sees the entries on disk
+    cache = NavMeshCache(str(tmp_path))
+    warm_navmesh = NavMesh(vertices, triangles, cache=cache)
+    warm_navmesh.segment_by_region_bbox(region_bbox_dict)
+    warm_navmesh.propagate_region_ids()
+    assert cache.misses == 0 and cache.hits > 0
+
+    assert (warm_navmesh.triangles == cold_navmesh.triangles).all()
+    assert (warm_navmesh.is_flat_ground == cold_navmesh.is_flat_ground).all()
+    assert warm_navmesh.triangle_adjacency_list == cold_navmesh.triangle_adjacency_list
+    assert (warm_navmesh.triangle_region_ids == cold_navmesh.triangle_region_ids).all()
+
+    # different settings do not share the entry
+    NavMesh(vertices, triangles, cache=cache, slope_threshold=10)
+    assert cache.misses == 1
+
+
+def test_default_navmesh_cache(monkeypatch, tmp_path):
+    monkeypatch.delenv(NAVMESH_CACHE_ENV, raising=False)
+    assert get_default_navmesh_cache() is None
+
+    monkeypatch.setenv(NAVMESH_CACHE_ENV, str(tmp_path / "navmesh"))
+    cache = get_default_navmesh_cache()
+    assert cache.cache_dir == str(tmp_path / "navmesh")
+    assert get_default_navmesh_cache() is cache
+
+
+def test_navmesh_locate():
+    triangles = make_grid_triangles(4, 6)
+    vertex_ids = np.arange(5 * 7)
+    vertices = np.stack(
+        [vertex_ids % 7, np.zeros(len(vertex_ids)), vertex_ids // 7], axis=1
+    ).astype(np.float64)
+    navmesh = NavMesh(vertices, triangles)
+    navmesh.segment_by_region_bbox({
+        0: np.array([[0.0, -1.0, 0.0], [1.0, 1.0, 1.0]]),
+        1: np.array([[5.0, -1.0, 3.0], [6.0, 1.0, 4.0]]),
+    })
+    navmesh.propagate_region_ids()
+
+    # points on, above and off the navmesh
+    points = np.array([
+        [0.3, 0.0, 0.6],
+        [5.5, 1.0, 3.5],
+        [2.2, 0.5, 1.9],
+        [20.0, 0.0, 20.0],
+    ])
+    triangle_ids, region_ids = navmesh.locate(points)
+    assert triangle_ids.shape == region_ids.shape == (len(points),)
+    triangle_centers = np.mean(vertices[triangles], axis=1)
+    for point, triangle_id in zip(points[:3], triangle_ids[:3]):
+        # the located triangle contains the point in the xz plane
+        tri = vertices[triangles[triangle_id]]
+        assert (point[[0, 2]] >= tri[:, [0, 2]].min(axis=0)).all()
+        assert (point[[0, 2]] <= tri[:, [0, 2]].max(axis=0)).all()
+    # the point off the navmesh falls back to the nearest triangle
+    nearest = np.argmin(np.linalg.norm(triangle_centers - points[3], axis=1))
+    assert triangle_ids[3] == nearest
+    assert region_ids[0] == 0 and region_ids[1] == 1
+    assert (region_ids == navmesh.triangle_region_ids[triangle_ids]).all()
+    assert navmesh.find_triangle_agent_on(points[1]) == triangle_ids[1]
+
+
+def test_navmesh_snap_points():
+    triangles = make_grid_triangles(4, 6)
+    vertex_ids = np.arange(5 * 7)
+    vertices = np.stack(
+        [vertex_ids % 7, np.zeros(len(vertex_ids)), vertex_ids // 7], axis=1
+    ).astype(np.float64)
+    navmesh = NavMesh(vertices, triangles)
+
+    # points above, next to, far from and high above the navmesh
+    points = np.array([
+        [2.2, 0.5, 1.9],
+        [7.5, 0.0, 2.0],
+        [20.0, 0.0, 20.0],
+        [3.0, 10.0, 3.0],
+    ])
+    snapped_points = navmesh.snap_points(points)
+    assert snapped_points.shape == points.shape
+    assert np.allclose(snapped_points[0], [2.2, 0.0, 1.9], atol=1e-5)
+    assert np.allclose(snapped_points[1], [6.0, 0.0, 2.0], atol=1e-5)
+    # no navmesh within the search extents
+    assert np.isnan(snapped_points[2:]).all()
+
+
+def loop_slope_segmentation(triangles, triangle_normals, num_vertices, slope_threshold):
+    """Reference slope segmentation with per-triangle vertex color accumulation"""
+    angles = np.degrees(np.arccos(np.dot(triangle_normals, np.array([0, 1, 0]))))
+    is_flat_ground = angles < slope_threshold
+    triangle_colors = np.where(is_flat_ground[:, None], [0, 1, 0], [1, 0, 0])
+    vertex_colors = np.zeros((num_vertices, 3))
+    for i, triangle in enumerate(triangles):
+        for j in range(3):
+            vertex_colors[triangle[j]] += triangle_colors[i]
+    with np.errstate(invalid="ignore"):
+        vertex_colors /= np.linalg.norm(vertex_colors, axis=1)[:, None]
+    return is_flat_ground, vertex_colors
+
+
+def test_navmesh_segment_by_slope():
+    # a grid with a bumpy height field, so that it has both flat and steep triangles
+    rng = np.random.default_rng(0)
+    triangles = make_grid_triangles(8, 8)
+    vertex_ids = np.arange(9 * 9)
+    vertices = np.stack(
+        [vertex_ids % 9, rng.uniform(0, 1.5, len(vertex_ids)), vertex_ids // 9], axis=1
+    ).astype(np.float64)
+    navmesh = NavMesh(vertices, triangles, slope_threshold=30)
+    assert navmesh.is_flat_ground.any() and not navmesh.is_flat_ground.all()
+
+    expected_flat_ground, expected_colors = loop_slope_segmentation(
+        navmesh.triangles, np.asarray(navmesh.mesh.triangle_normals), len(navmesh.vertices), 30
+    )
+    assert (navmesh.is_flat_ground == expected_flat_ground).all()
+    assert np.allclose(navmesh.slope_vertex_colors, expected_colors, equal_nan=True)
+    mesh = navmesh.paint_slope_colors()
+    assert np.allclose(np.asarray(mesh.vertex_colors), expected_colors, equal_nan=True)
+
+    # vertices without triangles have no color
+    colors = vote_vertex_colors(triangles[:2], np.ones((2, 3)), len(vertices))
+    assert np.isnan(colors[-1]).all() and np.allclose(colors[0], 1 / np.sqrt(3))
+
+
 def test_propagate_triangle_region_ids():
     visualize=True
     # Parse the .obj file into triangles and triangle_region_ids
@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+openai = pytest.importorskip("openai")
+from habitat_mas.utils.models import OpenAIModel, chat_all
+from habitat_mas.utils.chat_cache import ChatCompletionCache, ChatCacheMissError
+
+
+class StubChatCompletionsServer:
+    """
+    Local server mimicking the chat completions API. It replies with the last user message
+    after sleeping latency seconds, and records the number of requests handled concurrently.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.num_requests = 0
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.num_requests += 1
+                    stub.active_requests += 1
+                    stub.max_active_requests = max(stub.max_active_requests, stub.active_requests)
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.active_requests -= 1
+
+                last_user_message = [m for m in request["messages"] if m["role"] == "user"][-1]
+                body = json.dumps({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": last_user_message["content"]},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                }).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # client gave up, e.g. after a timeout
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_model(base_url, cache=None):
+    return OpenAIModel(
+        "You are a robot.",
+        [],
+        discussion_stage=True,
+        save_on_each_chat=False,
+        base_url=base_url,
+        max_retries=0,
+        cache=cache,
+    )
+
+
+def test_chat_all_concurrent(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    latency = 0.5
+    with StubChatCompletionsServer(latency=latency) as server:
+        models = [make_model(server.base_url) for _ in range(4)]
+        contents = [f"subtask {i}" for i in range(4)]
+
+        start = time.time()
+        responses = chat_all(models, contents)
+        elapsed = time.time() - start
+        # replies come back in the order of the models
+        assert responses == contents
+        assert elapsed < 2 * latency
+        assert server.max_active_requests == 4
+        assert all(model.token_usage == 2 for model in models)
+
+        # bounded concurrency
+        server.max_active_requests = 0
+        responses = chat_all(models, contents, max_concurrency=2)
+        assert responses == contents
+        assert server.max_active_requests == 2
+        assert all(len(model.chat_history) == 2 for model in models)
+
+
+def test_chat_timeout(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    with StubChatCompletionsServer(latency=1.0) as server:
+        models = [make_model(server.base_url) for _ in range(2)]
+        with pytest.raises(openai.APITimeoutError):
+            chat_all(models, ["a", "b"], timeout=0.2)
+
+
+def test_chat_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    cache_path = str(tmp_path / "chat_cache.sqlite")
+    with StubChatCompletionsServer() as server:
+        cache = ChatCompletionCache(cache_path)
+        cold_model = make_model(server.base_url, cache=cache)
+        assert cold_model.chat("pick up the apple") == "pick up the apple"
+        assert cold_model.chat("place it on the table") == "place it on the table"
+        assert server.num_requests == 2 and cache.misses == 2
+
+        # the same conversation is answered from the cache, also in replay-only mode
+        replay_cache = ChatCompletionCache(cache_path, mode="replay")
+        warm_model = make_model(server.base_url, cache=replay_cache)
+        assert warm_model.chat("pick up the apple") == "pick up the apple"
+        assert warm_model.chat("place it on the table") == "place it on the table"
+        assert server.num_requests == 2
+        assert replay_cache.stats() == {"hits": 2, "misses": 0, "tokens_saved": 4}
+        assert warm_model.token_usage == cold_model.token_usage
+
+        # a different conversation history misses
+        with pytest.raises(ChatCacheMissError):
+            make_model(server.base_url, cache=replay_cache).chat("place it on the table")
+
+
+def test_chat_cache_eviction(tmp_path):
+    cache = ChatCompletionCache(str(tmp_path / "chat_cache.sqlite"), max_size_bytes=25)
+    keys = [ChatCompletionCache.make_key("gpt-4o", [{"role": "user", "content": str(i)}]) for i in range(3)]
+    cache.put(keys[0], "0" * 10)
+    cache.put(keys[1], "1" * 10)
+    assert cache.get(keys[0]) is not None
+    # keys[1] is the least recently used
+    cache.put(keys[2], "2" * 10)
+    assert len(cache) == 2 and cache.size_bytes() == 20
+    assert cache.get(keys[1]) is None
+
+    cache.ttl = 0
+    assert cache.get(keys[0]) is None
+    cache.evict()
+    assert len(cache) == 0
+
+
+def test_chat_history_event_log(monkeypatch, tmp_path):
+    from habitat.utils.event_log import EventLog
+
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    chat_file = str(tmp_path / "episode_0" / "leader_group_chat_history.json")
+    event_log = EventLog(str(tmp_path / "event_log"), compact_interval=None)
+    with StubChatCompletionsServer() as server:
+        model = OpenAIModel(
+            "You are a leader.",
+            [],
+            discussion_stage=True,
+            enable_logging=True,
+            logging_file=chat_file,
+            base_url=server.base_url,
+            max_retries=0,
+            agent_name="leader",
+            event_log=event_log,
+        )
+        model.chat("assign subtasks")
+        model.chat("reassign subtasks")
+    # the owner of the event log writes the json files when closing it
+    assert not os.path.exists(chat_file)
+    event_log.close()
+    # nothing is logged to the closed event log
+    del model
+    with open(chat_file) as f:
+        chat_history = json.load(f)
+    assert chat_history[0] == {"role": "system", "content": "You are a leader."}
+    assert [turn[0]["content"] for turn in chat_history[1:]] == ["assign subtasks", "reassign subtasks"]
+    assert chat_history[2][1]["content"] == "reassign subtasks"
+    with open(tmp_path / "episode_0" / "token_usage.json") as f:
+        assert json.load(f) == {"leader": 4}
+
+
+def test_chat_history_event_log_compacts_periodically(monkeypatch, tmp_path):
+    from habitat.utils.event_log import EventLog
+
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    chat_file = tmp_path / "episode_0" / "robot_group_chat_history.json"
+    event_log = EventLog(str(tmp_path / "event_log"), fsync_interval=0.05, compact_interval=0.1)
+    with StubChatCompletionsServer() as server:
+        model = OpenAIModel(
+            "You are a robot.",
+            [],
+            discussion_stage=True,
+            logging_file=str(chat_file),
+            base_url=server.base_url,
+            max_retries=0,
+            event_log=event_log,
+        )
+        model.chat("subtask")
+    # the json files are written while the log is open, e.g. for runs that get killed
+    deadline = time.time() + 5
+    while not chat_file.exists() and time.time() < deadline:
+        time.sleep(0.05)
+    with open(chat_file) as f:
+        assert len(json.load(f)) == 2
+    event_log.close()
+
+
+def test_chat_history_without_event_log(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+    chat_file = tmp_path / "robot_action_history.json"
+    with StubChatCompletionsServer() as server:
+        model = OpenAIModel(
+            "You are a robot.",
+            [],
+            discussion_stage=True,
+            logging_file=str(chat_file),
+            base_url=server.base_url,
+            max_retries=0,
+        )
+        model.chat("subtask")
+    with open(chat_file) as f:
+        assert len(json.load(f)) == 2
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from habitat_mas.scene_graph.object_layer import ObjectLayer
+
+
+def brute_force_radius(centers, center, radius):
+    return sorted(
+        id for id, c in centers.items() if np.linalg.norm(c - center) <= radius
+    )
+
+
+def test_object_layer_spatial_queries():
+    rng = np.random.default_rng(0)
+    object_layer = ObjectLayer(index_rebuild_min=8)
+    centers = {}
+    for id in range(200):
+        centers[id] = rng.uniform(-10, 10, 3)
+        object_layer.add_object(centers[id], None, id=id, label=f"object_{id}")
+
+    # interleave removals, moves and additions with queries
+    for step in range(100):
+        if step % 3 == 0:
+            id = int(rng.choice(list(centers)))
+            object_layer.remove_object(id)
+            del centers[id]
+        elif step % 3 == 1:
+            id = int(rng.choice(list(centers)))
+            centers[id] = rng.uniform(-10, 10, 3)
+            if step % 2 == 0:
+                object_layer.update_object(id, center=centers[id])
+            else:
+                # in-place writes are written back to the layer
+                obj_node = object_layer.obj_dict[id]
+                obj_node.center[0] = centers[id][0]
+                obj_node.center[1:] += centers[id][1:] - obj_node.center[1:]
+                assert np.allclose(obj_node.center, centers[id])
+        else:
+            obj_node = object_layer.add_object(rng.uniform(-10, 10, 3), None)
+            centers[obj_node.id] = obj_node.center
+
+        query = rng.uniform(-10, 10, 3)
+        radius = rng.uniform(0, 5)
+        assert sorted(object_layer.query_radius(query, radius)) == \
+            brute_force_radius(centers, query, radius)
+
+        min_bound, max_bound = query - 2.0, query + 3.0
+        expected = sorted(
+            id for id, c in centers.items() if (c >= min_bound).all() and (c <= max_bound).all()
+        )
+        assert sorted(object_layer.query_aabb(min_bound, max_bound)) == expected
+
+        ids, dists = object_layer.k_nearest(query, k=5)
+        expected_dists = np.sort([np.linalg.norm(c - query) for c in centers.values()])[:5]
+        assert np.allclose(dists, expected_dists)
+        assert np.allclose(
+            np.linalg.norm(object_layer.get_centers(ids) - query, axis=1), dists
+        )
+
+    assert object_layer.obj_ids == list(centers)
+    assert np.allclose(
+        object_layer.get_centers(object_layer.obj_ids), np.stack(list(centers.values()))
+    )
+    id = object_layer.obj_ids[0]
+    assert object_layer.get_labels([id]) == [object_layer.obj_dict[id].label]
+    removed_node = object_layer.remove_object(id)
+    assert id not in object_layer
+    assert np.allclose(removed_node.center, centers[id])
+    assert removed_node.size is None
+
+    # invalid values are rejected without changing the layer
+    num_objects = len(object_layer)
+    for rotation in [lambda: None, [0.0, 0.0, 1.0]]:
+        with pytest.raises((TypeError, ValueError)):
+            object_layer.add_object(np.zeros(3), rotation, id=1000)
+        assert len(object_layer) == num_objects and 1000 not in object_layer
+    object_layer.add_object(np.zeros(3), [0.0, 0.0, 0.0, 1.0], id=1000)
+    assert np.allclose(object_layer.obj_dict[1000].rotation, [0, 0, 0, 1])
+
+
+def test_object_layer_grid_segmentation():
+    rng = np.random.default_rng(0)
+    bounds = np.array([[-1.0, 0.0, -2.0], [5.0, 1.0, 5.0]])
+    grid_size = 0.2
+    free_space_grid = np.ones((30, 35), dtype=bool)
+
+    object_layer = ObjectLayer()
+    object_layer.init_map(bounds, grid_size, free_space_grid)
+    bulk_layer = ObjectLayer()
+    bulk_layer.init_map(bounds, grid_size, free_space_grid)
+
+    # reference: a full-size mask per object, painted one after the other
+    expected_grid = -np.ones(free_space_grid.shape, dtype=int)
+    bboxes = []
+    for id in range(20):
+        min_bound = rng.uniform(-2, 6, 3)
+        bbox = np.stack([min_bound, min_bound + rng.uniform(0.1, 2, 3)], axis=0)
+        bboxes.append(bbox)
+        grid_bbox = ((bbox[:, [0, 2]] - bounds[0][[0, 2]]) / grid_size).astype(int)
+        mask = np.zeros(free_space_grid.shape, dtype=bool)
+        mask[grid_bbox[0][1]:grid_bbox[1][1], grid_bbox[0][0]:grid_bbox[1][0]] = True
+        expected_grid[mask] = id
+
+        obj_node = object_layer.add_object(bbox.mean(axis=0), None, id=id, bbox=bbox)
+        assert (obj_node.grid_map == mask).all()
+        bulk_layer.add_object(bbox.mean(axis=0), None, id=id)
+
+    assert (object_layer.segment_grid == expected_grid).all()
+    bulk_layer.segment_objects_on_grid_map_xz(list(range(20)), bboxes)
+    assert (bulk_layer.segment_grid == expected_grid).all()
+
+    # removing an object clears its remaining cells
+    object_layer.remove_object(19)
+    assert (object_layer.segment_grid != 19).all()
+    assert (object_layer.segment_grid[expected_grid != 19] == expected_grid[expected_grid != 19]).all()
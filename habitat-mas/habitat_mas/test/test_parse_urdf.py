@@ -0,0 +1,75 @@
+import numpy as np
+from urchin import URDF, Link, Joint, JointLimit
+from habitat_mas.agents.capabilities.parse_urdf import (
+    BatchedChainFK,
+    get_joint_by_child_link,
+    sample_joint_positions
+)
+
+
+def make_arm_urdf():
+    """A base with a prismatic lift, three revolute joints, a fixed wrist and a side branch"""
+    link_names = ["base", "lift", "shoulder", "elbow", "wrist", "hand", "head"]
+    links = [Link(name=name, inertial=None, visuals=[], collisions=[]) for name in link_names]
+
+    def origin(xyz, rpy_z=0.0):
+        transform = np.eye(4)
+        transform[:3, :3] = [
+            [np.cos(rpy_z), -np.sin(rpy_z), 0.0],
+            [np.sin(rpy_z), np.cos(rpy_z), 0.0],
+            [0.0, 0.0, 1.0],
+        ]
+        transform[:3, 3] = xyz
+        return transform
+
+    limit = JointLimit(effort=1.0, velocity=1.0, lower=-1.5, upper=2.0)
+    joints = [
+        Joint("lift_joint", "prismatic", "base", "lift", axis=[0, 0, 1], 
+              origin=origin([0.1, 0, 0.3]), limit=JointLimit(1.0, 1.0, lower=0.0, upper=0.5)),
+        Joint("shoulder_joint", "revolute", "lift", "shoulder", axis=[0, 0, 1], 
+              origin=origin([0, 0.2, 0.1], 0.3), limit=limit),
+        Joint("elbow_joint", "revolute", "shoulder", "elbow", axis=[0, 1, 1], 
+              origin=origin([0.4, 0, 0]), limit=limit),
+        Joint("wrist_joint", "continuous", "elbow", "wrist", axis=[1, 0, 0], 
+              origin=origin([0.3, 0.1, 0], -0.5)),
+        Joint("hand_joint", "fixed", "wrist", "hand", origin=origin([0.05, 0, 0.02], 0.7)),
+        Joint("head_joint", "revolute", "base", "head", axis=[0, 0, 1], 
+              origin=origin([0, 0, 1.0]), limit=limit),
+    ]
+    return URDF(name="arm", links=links, joints=joints)
+
+
+def test_batched_chain_fk():
+    urdf = make_arm_urdf()
+    arm_joint_names = [
+        get_joint_by_child_link(urdf, link).name for link in ["shoulder", "elbow", "wrist"]
+    ]
+    fk = BatchedChainFK(urdf, "hand", arm_joint_names)
+    lower, upper = fk.get_joint_limits()
+    assert np.allclose(lower, [-1.5, -1.5, -np.pi]) and np.allclose(upper, [2.0, 2.0, np.pi])
+
+    joint_positions = sample_joint_positions(lower, upper, num_samples=64, sampling="random")
+    offset = np.array([0.08, 0, 0])
+    positions = fk.link_positions(joint_positions, offset=offset)
+    transforms = fk.link_transforms(joint_positions)
+    for joint_position, position, transform in zip(joint_positions, positions, transforms):
+        # the lift joint is not sampled and stays at zero
+        expected = urdf.link_fk(cfg=dict(zip(arm_joint_names, joint_position)), link="hand")
+        assert np.allclose(transform, expected)
+        assert np.allclose(position, expected[:3, :3] @ offset + expected[:3, 3])
+
+    # all movable joints of the chain by default
+    fk = BatchedChainFK(urdf, "hand")
+    assert fk.joint_names == ["lift_joint", "shoulder_joint", "elbow_joint", "wrist_joint"]
+
+
+def test_sample_joint_positions():
+    lower, upper = np.array([0.0, -1.0, 2.0]), np.array([1.0, 1.0, 4.0])
+    grid = sample_joint_positions(lower, upper, num_bins=4)
+    assert grid.shape == (64, 3)
+    assert len(np.unique(grid, axis=0)) == 64
+
+    for sampling in ["sobol", "random"]:
+        samples = sample_joint_positions(lower, upper, num_samples=128, sampling=sampling)
+        assert samples.shape == (128, 3)
+        assert (samples >= lower).all() and (samples <= upper).all()
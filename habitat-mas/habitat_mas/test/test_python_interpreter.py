@@ -0,0 +1,42 @@
+import pytest
+from habitat_mas.utils.python_interpreter import PythonWorkerPool, SubprocessInterpreter
+
+
+@pytest.fixture
+def worker_pool():
+    pool = PythonWorkerPool(num_workers=1, max_runs_per_worker=3, preimport=["math"])
+    yield pool
+    pool.close()
+
+
+def test_worker_pool_run(worker_pool):
+    interpreter = SubprocessInterpreter(worker_pool=worker_pool, timeout=5)
+    assert interpreter.run("import math\nprint(math.sqrt(16))", "python") == "4.0\n"
+
+    # every run starts from a fresh namespace
+    interpreter.run("x = 1", "python")
+    result = interpreter.run("print(x)", "python")
+    assert "NameError" in result and "(stderr:" in result
+
+    # same output as a fresh subprocess
+    code = "import sys\nprint('out')\nprint('err', file=sys.stderr)\nprint(1 / 0)"
+    subprocess_interpreter = SubprocessInterpreter(use_worker_pool=False)
+    pool_result = interpreter.run(code, "python")
+    assert pool_result.startswith("out\n(stderr: ")
+    assert "ZeroDivisionError" in pool_result
+    assert "ZeroDivisionError" in subprocess_interpreter.run(code, "python")
+
+    stats = worker_pool.stats()
+    assert stats["runs"] == 4 and stats["recycles"] == 1
+    assert stats["max_latency"] >= stats["mean_latency"] > 0
+
+
+def test_worker_pool_timeout_and_crash(worker_pool):
+    stdout, stderr = worker_pool.run("while True: pass", timeout=0.5)
+    assert "TimeoutError" in stderr
+    stdout, stderr = worker_pool.run("import os\nos._exit(1)")
+    assert "crashed" in stderr
+    # the worker is replaced after a timeout or a crash
+    assert worker_pool.run("print('alive')") == ("alive\n", "")
+    stats = worker_pool.stats()
+    assert stats["timeouts"] == 1 and stats["crashes"] == 1
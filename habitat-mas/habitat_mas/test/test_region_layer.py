@@ -0,0 +1,34 @@
+import numpy as np
+from habitat_mas.scene_graph.region_layer import RegionLayer
+
+
+def brute_force_find_region(region_layer, point):
+    for region_id in region_layer.region_ids:
+        bbox = region_layer.region_dict[region_id].bbox
+        if np.all(point >= bbox[0]) and np.all(point <= bbox[1]):
+            return region_id
+    return -1
+
+
+def test_region_layer_find_regions():
+    rng = np.random.default_rng(0)
+    region_layer = RegionLayer()
+    assert (region_layer.find_regions(rng.uniform(-10, 10, (5, 3))) == -1).all()
+
+    # overlapping regions, the first added one wins
+    for region_id in range(20):
+        min_bound = rng.uniform(-10, 8, 3)
+        bbox = np.stack([min_bound, min_bound + rng.uniform(0.5, 4, 3)], axis=0)
+        region_layer.add_region(bbox, region_id=region_id)
+
+    points = rng.uniform(-12, 12, (500, 3))
+    # points on the region boundary are inside
+    points[0] = region_layer.region_dict[3].bbox[1]
+    region_ids = region_layer.find_regions(points, chunk_size=64)
+    expected = [brute_force_find_region(region_layer, point) for point in points]
+    assert region_ids.tolist() == expected
+    assert region_ids[0] != -1 and (region_ids == -1).any()
+
+    # the cached bounding boxes follow added regions
+    region_layer.add_region(np.array([[20.0, 20.0, 20.0], [21.0, 21.0, 21.0]]), region_id=20)
+    assert region_layer.find_regions([[20.5, 20.5, 20.5]]).tolist() == [20]
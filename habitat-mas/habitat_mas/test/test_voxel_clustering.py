@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+pytest.importorskip("sklearn")
+from scipy import stats
+from sklearn.cluster import DBSCAN
+from habitat_mas.perception.voxel_clustering import (
+    ClassVoxelMap,
+    _cluster_voxels,
+    compute_cluster_stats,
+    match_clusters,
+)
+
+
+def make_semantic_points(seed=0):
+    """Blobs of points of three classes, blobs of different classes overlap"""
+    rng = np.random.default_rng(seed)
+    blob_centers = [[0, 0, 0], [4, 0, 0], [0.5, 0.2, 0], [8, 1, 2], [4, 0.5, 0.5], [0, 6, 0]]
+    blob_labels = [0, 0, 1, 1, 2, 2]
+    xyz = np.concatenate([rng.normal(center, 0.3, size=(200, 3)) for center in blob_centers])
+    # sparse noise
+    xyz = np.concatenate([xyz, rng.uniform(-5, 15, size=(30, 3))])
+    labels = np.concatenate([np.repeat(blob_labels, 200), rng.integers(0, 3, size=30)])
+    order = rng.permutation(len(xyz))
+    return xyz[order], labels[order]
+
+
+def cluster_4d(xyz, labels, eps=1.0, min_samples=5, min_points_filter=5, label_scale=2):
+    """Clusters of the former 4-D DBSCAN of SceneGraphRtabmap, the label as fourth dimension"""
+    sem_points = np.concatenate((xyz, label_scale * labels.reshape(-1, 1)), axis=1)
+    inst_labels = DBSCAN(eps=eps, min_samples=min_samples).fit(sem_points).labels_
+    clusters = []
+    for inst_id in set(inst_labels) - {-1}:
+        obj_xyz = xyz[inst_labels == inst_id]
+        if obj_xyz.shape[0] > min_points_filter:
+            label = np.ravel(stats.mode(labels[inst_labels == inst_id]).mode)[0]
+            size = np.max(obj_xyz, axis=0) - np.min(obj_xyz, axis=0)
+            clusters.append((int(label), obj_xyz.shape[0], np.mean(obj_xyz, axis=0), size))
+    return sorted(clusters, key=lambda c: (c[0], c[1], tuple(c[2])))
+
+
+def cluster_per_class(xyz, labels, voxel_size, eps=1.0, min_samples=5, min_points_filter=5):
+    voxel_map = ClassVoxelMap(voxel_size)
+    clusters = []
+    for class_id in sorted(voxel_map.insert(xyz, labels)):
+        voxels = voxel_map.class_voxels[class_id]
+        cluster_labels = _cluster_voxels(
+            (voxel_map.get_centroids(class_id), voxels["counts"], eps, min_samples)
+        )
+        _, num_points, centers, min_bounds, max_bounds, _ = compute_cluster_stats(
+            cluster_labels, voxels["counts"], voxels["sums"], voxels["mins"], voxels["maxs"]
+        )
+        for i in np.flatnonzero(num_points > min_points_filter):
+            clusters.append((class_id, int(num_points[i]), centers[i], max_bounds[i] - min_bounds[i]))
+    return sorted(clusters, key=lambda c: (c[0], c[1], tuple(c[2])))
+
+
+@pytest.mark.parametrize("voxel_size", [None, 0.05])
+def test_cluster_stats_match_4d_dbscan(voxel_size):
+    xyz, labels = make_semantic_points()
+    expected = cluster_4d(xyz, labels)
+    clusters = cluster_per_class(xyz, labels, voxel_size)
+    assert len(clusters) == len(expected) == 6
+    for (label, num_points, center, size), (exp_label, exp_num_points, exp_center, exp_size) in zip(clusters, expected):
+        assert label == exp_label
+        assert num_points == exp_num_points
+        assert np.allclose(center, exp_center)
+        assert np.allclose(size, exp_size)
+
+
+def test_class_voxel_map_chunks():
+    xyz, labels = make_semantic_points()
+    voxel_map = ClassVoxelMap(0.1)
+    voxel_map.insert(xyz, labels)
+
+    chunked_map = ClassVoxelMap(0.1)
+    for chunk in np.array_split(np.arange(len(xyz)), 4):
+        previous = {
+            class_id: {field: values.copy() for field, values in voxels.items()}
+            for class_id, voxels in chunked_map.class_voxels.items()
+        }
+        updated_classes = chunked_map.insert(xyz[chunk], labels[chunk])
+        assert updated_classes == set(labels[chunk].tolist())
+        # previous voxels moved to the voxels with the same key
+        for class_id in updated_classes & set(previous):
+            remap = chunked_map.voxel_remaps[class_id]
+            assert np.array_equal(chunked_map.class_voxels[class_id]["keys"][remap], previous[class_id]["keys"])
+
+    for class_id, voxels in voxel_map.class_voxels.items():
+        for field, values in voxels.items():
+            assert np.allclose(chunked_map.class_voxels[class_id][field], values)
+
+
+def test_match_clusters():
+    # voxels 0-3 were previous cluster 0, voxels 4-6 previous cluster 1, voxel 7 is new
+    cluster_labels = np.array([5, 5, 5, 2, 2, 2, -1, 2])
+    counts = np.array([1, 1, 1, 10, 1, 1, 1, 1])
+    cluster_ids = np.array([2, 5])
+    previous_members = [np.array([0, 1, 2, 3]), np.array([4, 5, 6]), np.array([], dtype=int)]
+    # cluster 2 shares 10 points with previous cluster 0 and 2 with previous cluster 1,
+    # cluster 5 then only shares points with previous cluster 0 which is taken
+    assert match_clusters(cluster_ids, cluster_labels, counts, previous_members).tolist() == [0, -1]
+    assert match_clusters(cluster_ids, cluster_labels, counts, []).tolist() == [-1, -1]
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+# environment variables enabling the process-wide cache, see get_default_chat_cache()
+CHAT_CACHE_PATH_ENV = "HABITAT_MAS_CHAT_CACHE"
+CHAT_CACHE_MODE_ENV = "HABITAT_MAS_CHAT_CACHE_MODE"
+
+
+class ChatCacheMissError(KeyError):
+    """Raised by a replay-only ChatCompletionCache when a request is not cached"""
+
+
+def _canonical(obj):
+    """Convert messages, including openai response messages, to plain json values"""
+    if isinstance(obj, BaseModel):
+        return _canonical(obj.model_dump(mode="json", exclude_none=True))
+    if isinstance(obj, dict):
+        return {key: _canonical(value) for key, value in obj.items() if value is not None}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(value) for value in obj]
+    return obj
+
+
+class ChatCompletionCache:
+    """
+    Content-addressed cache of chat completions responses, stored in a SQLite database.
+
+    Responses are keyed by a hash of the canonical request (model, messages, tools, tool_choice),
+    so repeated prompts, e.g. the same episode evaluated under different ablations, are answered
+    without a request to the API.
+
+    Modes:
+        "read_write": return cached responses, send and store the others.
+        "replay": return cached responses, raise ChatCacheMissError on misses. This makes
+            re-running a benchmark deterministic and free.
+
+    Args:
+        path: The SQLite database file.
+        mode: "read_write" or "replay".
+        ttl: Entries older than ttl seconds are ignored and evicted, never if None.
+        max_size_bytes: Least recently used entries are evicted above this total size, no limit if None.
+    """
+    MODES = ("read_write", "replay")
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "read_write",
+        ttl: Optional[float] = None,
+        max_size_bytes: Optional[int] = None,
+    ):
+        assert mode in self.MODES, f"Unknown chat cache mode {mode}, should be one of {self.MODES}"
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # the connection is shared by the chat threads of this process, see chat_all()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                "total_tokens INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+            )
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: list,
+        tools: Optional[list] = None,
+        tool_choice: Optional[Any] = None,
+    ) -> str:
+        request = _canonical(
+            {"model": model, "messages": messages, "tools": tools, "tool_choice": tool_choice}
+        )
+        request_str = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(request_str.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response json, None on a miss in read_write mode"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, total_tokens, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self.hits += 1
+                self.tokens_saved += row[1]
+            else:
+                self.misses += 1
+        if row is None:
+            if self.mode == "replay":
+                raise ChatCacheMissError(f"Chat completions request {key} is not in cache {self.path}")
+            return None
+        return row[0]
+
+    def put(self, key: str, response: str, total_tokens: int = 0):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, len(response), total_tokens, now, now),
+            )
+        self.evict()
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """Drop expired entries, then least recently used entries until under max_size_bytes"""
+        with self._lock, self._conn:
+            if self.ttl is not None:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+                )
+            if self.max_size_bytes is None:
+                return
+            total_size = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total_size <= self.max_size_bytes:
+                return
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access"
+            ).fetchall()
+            evicted_keys = []
+            for key, size in rows:
+                if total_size <= self.max_size_bytes:
+                    break
+                evicted_keys.append((key,))
+                total_size -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "tokens_saved": self.tokens_saved}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_chat_cache: Optional[ChatCompletionCache] = None
+
+
+def get_default_chat_cache() -> Optional[ChatCompletionCache]:
+    """
+    Return the process-wide chat cache, enabled by setting HABITAT_MAS_CHAT_CACHE to a
+    database path, and optionally HABITAT_MAS_CHAT_CACHE_MODE to "replay". None if not set.
+    """
+    global _default_chat_cache
+    path = os.environ.get(CHAT_CACHE_PATH_ENV)
+    if not path:
+        return None
+    mode = os.environ.get(CHAT_CACHE_MODE_ENV, "read_write")
+    if _default_chat_cache is None or _default_chat_cache.path != path or _default_chat_cache.mode != mode:
+        _default_chat_cache = ChatCompletionCache(path, mode=mode)
+    return _default_chat_cache
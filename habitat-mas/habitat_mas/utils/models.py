@@ -1,13 +1,20 @@
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from ..agents.crab_core import Action
-from typing import List
+from typing import Any, List, Optional, Sequence
 import openai
+from openai.types.chat import ChatCompletion
+from .chat_cache import ChatCompletionCache, get_default_chat_cache
 from .python_interpreter import SubprocessInterpreter
 # from openai.types.chat.chat_completion import ChatCompletionMessage
 # from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall
 from pydantic import BaseModel
 
+# token_usage.json is shared by all agents of an episode, which may chat concurrently
+_token_usage_lock = threading.Lock()
+
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, BaseModel):
@@ -28,6 +35,10 @@ class OpenAIModel:
         logging_file="",
         save_on_each_chat=True,
         agent_name="unknown",
+        base_url=None,
+        max_retries=None,
+        cache: Optional[ChatCompletionCache] = None,
+        event_log=None,
     ) -> None:
         self.system_message = {
             "role": "system",
@@ -38,7 +49,14 @@ class OpenAIModel:
         self.chat_history = []
         self.window_size = window_size
         self.model = model
-        self.client = openai.OpenAI()
+        client_kwargs = {}
+        if base_url is not None:
+            client_kwargs["base_url"] = base_url
+        if max_retries is not None:
+            client_kwargs["max_retries"] = max_retries
+        self.client = openai.OpenAI(**client_kwargs)
+        # response cache, the process-wide one (if enabled by environment variables) by default
+        self.cache = cache if cache is not None else get_default_chat_cache()
         self.planning_stage = discussion_stage
         self.code_execution = code_execution
         if self.code_execution:
@@ -56,14 +74,53 @@ class OpenAIModel:
         self.logging_file = logging_file
         self.save_on_each_chat = save_on_each_chat
         self.agent_name = agent_name
+        # habitat.utils.event_log.EventLog of the run, opened and closed by its owner (the evaluator),
+        # without one the chat history files are written directly
+        self.event_log = event_log
+        # chat turns already appended to the event log, see log_chat_history()
+        self._num_logged_turns = 0
+        self._logged_system_message = None
 
     
     def __del__(self):
-        """Save chat history to a file if logging is enabled"""
-        if self.enable_logging:
-            self.save_chat_history(self.logging_file)
+        """Log the remaining chat history if logging is enabled, unless the event log is closed already"""
+        if self.enable_logging and not (self.event_log is not None and self.event_log.closed):
+            self.log_chat_history(self.logging_file)
+
+    def log_chat_history(self, file_path: str):
+        """
+        Append the chat turns not logged yet and the token usage to the event log.
+        file_path and token_usage.json next to it are rebuilt from the log periodically and when 
+        it is closed, see save_chat_history() for the format. Without an event log, they are written 
+        right away with save_chat_history().
+        """
+        if not file_path:
+            return
+        if self.event_log is None:
+            self.save_chat_history(file_path)
+            return
+        event_log = self.event_log
+        # a new model, a new system message or a replaced history rewrites the file
+        reset = (
+            self._logged_system_message != self.system_message 
+            or self._num_logged_turns > len(self.chat_history)
+        )
+        if reset:
+            self._num_logged_turns = 0
+        new_turns = self.chat_history[self._num_logged_turns:]
+        if reset or new_turns:
+            items = ([self.system_message] if reset else []) + new_turns
+            event_log.json_extend(
+                file_path, items, reset=reset, indent=2, json_encoder=CustomJSONEncoder
+            )
+            self._num_logged_turns = len(self.chat_history)
+            self._logged_system_message = dict(self.system_message)
+        
+        token_path = os.path.join(os.path.dirname(file_path), "token_usage.json")
+        event_log.json_update(token_path, f"{self.agent_name}", self.token_usage)
            
     def save_chat_history(self, file_path: str):
+        """Write the full chat history and the token usage right away"""
 
         with open(file_path, "w") as f:
             full_history = [self.system_message] + self.chat_history
@@ -71,16 +128,35 @@ class OpenAIModel:
         
         episode_path = os.path.dirname(file_path)
         token_path = os.path.join(episode_path, "token_usage.json")
-        if not os.path.exists(token_path):
-            with open(token_path, 'w') as f:
-                json.dump({}, f)
+        with _token_usage_lock:
+            if not os.path.exists(token_path):
+                with open(token_path, 'w') as f:
+                    json.dump({}, f)
 
-        with open(token_path, 'r') as f:
-            data = json.load(f)
-        data[f"{self.agent_name}"] = self.token_usage
+            with open(token_path, 'r') as f:
+                data = json.load(f)
+            data[f"{self.agent_name}"] = self.token_usage
+
+            with open(token_path, 'w') as f:
+                json.dump(data, f, indent=4)
 
-        with open(token_path, 'w') as f:
-            json.dump(data, f, indent=4)
+    def _create_completion(self, timeout: Optional[float] = None, **request) -> ChatCompletion:
+        """
+        Call the chat completions API, answering from the response cache if enabled.
+        token_usage counts cached responses too, the tokens actually saved are counted by the cache.
+        """
+        if self.cache is None:
+            return self.client.chat.completions.create(timeout=timeout, **request)
+        
+        key = self.cache.make_key(
+            request["model"], request["messages"], request.get("tools"), request.get("tool_choice")
+        )
+        cached_response = self.cache.get(key)
+        if cached_response is not None:
+            return ChatCompletion.model_validate_json(cached_response)
+        response = self.client.chat.completions.create(timeout=timeout, **request)
+        self.cache.put(key, response.model_dump_json(), response.usage.total_tokens)
+        return response
 
     def set_system_message(self, system_message: str):
         self.system_message = {"role": "system", "content": system_message}
@@ -89,7 +165,18 @@ class OpenAIModel:
         print("Internal action: ", action_name, parameters)
         return str(self.action_map[action_name].run(**parameters))
 
-    def chat(self, content: str, crab_planning=False):
+    def chat(self, content: str, crab_planning=False, timeout: Optional[float] = None):
+        """
+        Send a user message and return the model reply.
+        
+        Args:
+            content: The user message.
+            crab_planning: Plain chat without tools, used by the crab planning agent.
+            timeout: Timeout in seconds of each request to the chat completions API, 
+                openai.APITimeoutError is raised when it expires. It is not a deadline for the 
+                whole chat: client retries and tool call or code execution rounds send 
+                several requests, each with this timeout.
+        """
         new_message = {"role": "user", "content": content}
 
         request = [self.system_message]
@@ -107,15 +194,17 @@ class OpenAIModel:
         if self.planning_stage:
             while True:
                 if self.tool_calls_enable:
-                    response = self.client.chat.completions.create(
+                    response = self._create_completion(
                         messages=request,  # type: ignore
                         model=self.model,
                         tools=self.openai_tools,
+                        timeout=timeout,
                     )
                 else:
-                    response = self.client.chat.completions.create(
+                    response = self._create_completion(
                         messages=request,  # type: ignore
                         model=self.model,
+                        timeout=timeout,
                     )
                 self.token_usage += response.usage.total_tokens
 
@@ -164,13 +253,14 @@ class OpenAIModel:
                     request.append(result_message)
                 else:
                     if self.save_on_each_chat:
-                        self.save_chat_history(self.logging_file)
+                        self.log_chat_history(self.logging_file)
                     return response_message.content
         elif crab_planning:
             while True:
-                response = self.client.chat.completions.create(
+                response = self._create_completion(
                     messages=request,  # type: ignore
                     model=self.model,
+                    timeout=timeout,
                 )
                 self.token_usage += response.usage.total_tokens
 
@@ -179,16 +269,17 @@ class OpenAIModel:
                 request.append(response_message)
 
                 if self.save_on_each_chat:
-                    self.save_chat_history(self.logging_file)
+                    self.log_chat_history(self.logging_file)
                 return response_message.content
         else:
-            response = self.client.chat.completions.create(
+            response = self._create_completion(
                 messages=request,  # type: ignore
                 model=self.model,
                 tools=[
                     {"type": "function", "function": action} for action in self.actions
                 ],
                 tool_choice="required",
+                timeout=timeout,
             )
             self.token_usage += response.usage.total_tokens
 
@@ -214,7 +305,7 @@ class OpenAIModel:
             parameters = json.loads(call.function.arguments)
             
             if self.save_on_each_chat:
-                self.save_chat_history(self.logging_file)
+                self.log_chat_history(self.logging_file)
             
             return (call.function.name, parameters)
 
@@ -235,6 +326,40 @@ class OpenAIModel:
             self.actions.append(new_action)
 
 
+def chat_all(
+    models: Sequence[OpenAIModel],
+    contents: Sequence[str],
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[Any]:
+    """
+    Chat with several models concurrently, models[i] receiving contents[i].
+    
+    Args:
+        models: The models to chat with, each model should appear at most once.
+        contents: The user messages, one per model.
+        max_concurrency: Maximum number of chats running at the same time, all of them if None.
+        timeout: Timeout in seconds of each request to the chat completions API, see OpenAIModel.chat.
+    
+    Returns:
+        The replies in the order of models, regardless of the order they complete in.
+        The first exception raised by a chat, in that order, is re-raised.
+    """
+    assert len(models) == len(contents)
+    if len(models) == 0:
+        return []
+    if len(models) == 1 or max_concurrency == 1:
+        return [model.chat(content, timeout=timeout) for model, content in zip(models, contents)]
+    
+    max_workers = len(models) if max_concurrency is None else min(max_concurrency, len(models))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat") as executor:
+        futures = [
+            executor.submit(model.chat, content, timeout=timeout)
+            for model, content in zip(models, contents)
+        ]
+        return [future.result() for future in futures]
+
+
 def _extract_code(content) -> list[tuple[str, str]]:
     codes = []
     texts = []
@@ -1,11 +1,214 @@
+import atexit
+import json
+import os
+import queue
+import select
 import shlex
 import subprocess
+import sys
 import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import ClassVar, Dict, List
+from typing import ClassVar, Dict, List, Optional, Sequence, Tuple
 
 from colorama import Fore
 
+_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+
+class _WorkerError(RuntimeError):
+    pass
+
+
+class _PythonWorker:
+    r"""A warm python process running python_worker.py, see PythonWorkerPool."""
+
+    def __init__(
+        self, 
+        preimport: Sequence[str], 
+        memory_limit_mb: Optional[float] = None,
+    ) -> None:
+        cmd = [sys.executable, "-u", _WORKER_SCRIPT, "--preimport", *preimport]
+        if memory_limit_mb is not None:
+            cmd += ["--memory-limit-mb", str(memory_limit_mb)]
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        self.num_runs = 0
+        self.ready = False
+
+    def _read_message(self, timeout: Optional[float]) -> dict:
+        readable, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not readable:
+            raise TimeoutError
+        line = self.proc.stdout.readline()
+        if not line:
+            raise _WorkerError(f"worker exited with code {self.proc.wait()}")
+        return json.loads(line)
+
+    def wait_ready(self, timeout: Optional[float]) -> None:
+        if not self.ready:
+            self._read_message(timeout)
+            self.ready = True
+
+    def run(self, code: str, timeout: Optional[float]) -> Tuple[str, str]:
+        try:
+            self.proc.stdin.write(json.dumps({"code": code}) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise _WorkerError(f"worker exited with code {self.proc.poll()}") from e
+        self.num_runs += 1
+        response = self._read_message(timeout)
+        return response["stdout"], response["stderr"]
+
+    def kill(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+
+
+class PythonWorkerPool:
+    r"""A pool of warm python processes executing code strings.
+    
+    Starting a python interpreter and importing numpy for every code block
+    takes hundreds of milliseconds. The workers of this pool are started once
+    with the preimport modules already imported, and receive code through a
+    pipe. Each run executes in a fresh ``__main__`` namespace of the worker.
+    
+    Args:
+        num_workers (int, optional): Number of workers, which is also the
+            number of concurrent runs. (default: :obj:`2`)
+        max_runs_per_worker (int, optional): A worker is replaced after this
+            many runs, to bound the state leaking between runs (e.g. changed
+            module globals). (default: :obj:`100`)
+        timeout (float, optional): Default timeout in seconds of a run. The
+            worker is killed and replaced when it expires. No timeout if
+            :obj:`None`. (default: :obj:`None`)
+        memory_limit_mb (float, optional): Address space limit of the
+            workers, no limit if :obj:`None`. (default: :obj:`None`)
+        preimport (Sequence[str], optional): Modules imported by the workers
+            at startup. (default: :obj:`("numpy", "math")`)
+        startup_timeout (float, optional): Timeout in seconds for a worker to
+            become ready. (default: :obj:`60.0`)
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 2,
+        max_runs_per_worker: int = 100,
+        timeout: Optional[float] = None,
+        memory_limit_mb: Optional[float] = None,
+        preimport: Sequence[str] = ("numpy", "math"),
+        startup_timeout: float = 60.0,
+    ) -> None:
+        self.num_workers = num_workers
+        self.max_runs_per_worker = max_runs_per_worker
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.preimport = list(preimport)
+        self.startup_timeout = startup_timeout
+        self.pid = os.getpid()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "timeouts": 0,
+            "crashes": 0,
+            "recycles": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+        }
+        self._closed = False
+        # workers start importing right away, in parallel
+        self._idle_workers: "queue.Queue[_PythonWorker]" = queue.Queue()
+        for _ in range(num_workers):
+            self._idle_workers.put(self._start_worker())
+        atexit.register(self.close)
+
+    def _start_worker(self) -> _PythonWorker:
+        return _PythonWorker(self.preimport, self.memory_limit_mb)
+
+    def run(self, code: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+        r"""Executes python code in a warm worker.
+
+        Args:
+            code (str): The python code to execute.
+            timeout (float, optional): Timeout in seconds, the pool timeout
+                if :obj:`None`.
+
+        Returns:
+            Tuple[str, str]: The captured stdout and stderr of the code.
+        """
+        if self._closed:
+            raise RuntimeError("PythonWorkerPool is closed.")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle_workers.get()
+        start_time = time.time()
+        stat = None
+        try:
+            worker.wait_ready(self.startup_timeout)
+            stdout, stderr = worker.run(code, timeout)
+            if worker.num_runs >= self.max_runs_per_worker:
+                stat = "recycles"
+        except TimeoutError:
+            stdout = ""
+            stderr = f"TimeoutError: code execution exceeded {timeout} seconds"
+            stat = "timeouts"
+        except _WorkerError as e:
+            stdout = ""
+            stderr = f"Code execution crashed, e.g. out of memory: {e}"
+            stat = "crashes"
+        finally:
+            if stat is not None:
+                worker.kill()
+                worker = self._start_worker()
+            self._idle_workers.put(worker)
+
+        latency = time.time() - start_time
+        with self._stats_lock:
+            self._stats["runs"] += 1
+            self._stats["total_latency"] += latency
+            self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+            if stat is not None:
+                self._stats[stat] += 1
+        return stdout, stderr
+
+    def stats(self) -> Dict[str, float]:
+        r"""Run counters and latencies in seconds."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["mean_latency"] = stats["total_latency"] / max(stats["runs"], 1)
+        return stats
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle_workers.get_nowait()
+            except queue.Empty:
+                break
+            worker.kill()
+
+
+_default_worker_pool: Optional[PythonWorkerPool] = None
+_default_worker_pool_lock = threading.Lock()
+
+
+def get_default_worker_pool() -> PythonWorkerPool:
+    r"""Returns the worker pool of this process, started on first use."""
+    global _default_worker_pool
+    with _default_worker_pool_lock:
+        if _default_worker_pool is None or _default_worker_pool.pid != os.getpid():
+            _default_worker_pool = PythonWorkerPool()
+        return _default_worker_pool
+
 
 class SubprocessInterpreter:
     r"""SubprocessInterpreter is a class for executing code files or code
@@ -23,6 +226,12 @@ class SubprocessInterpreter:
             the executed code. (default: :obj:`False`)
         print_stderr (bool, optional): If True, print the standard error of the
             executed code. (default: :obj:`True`)
+        worker_pool (PythonWorkerPool, optional): Pool of warm workers running
+            python code, the process-wide pool if :obj:`None`.
+        use_worker_pool (bool, optional): If False, run python code in a new
+            subprocess each time. (default: :obj:`True`)
+        timeout (float, optional): Timeout in seconds of a code execution, no
+            timeout if :obj:`None`. (default: :obj:`None`)
     """
 
     _CODE_EXECUTE_CMD_MAPPING: ClassVar[Dict[str, str]] = {
@@ -50,10 +259,22 @@ class SubprocessInterpreter:
         require_confirm: bool = False,
         print_stdout: bool = False,
         print_stderr: bool = True,
+        worker_pool: Optional[PythonWorkerPool] = None,
+        use_worker_pool: bool = True,
+        timeout: Optional[float] = None,
     ) -> None:
         self.require_confirm = require_confirm
         self.print_stdout = print_stdout
         self.print_stderr = print_stderr
+        self._worker_pool = worker_pool
+        self.use_worker_pool = use_worker_pool
+        self.timeout = timeout
+
+    @property
+    def worker_pool(self) -> PythonWorkerPool:
+        if self._worker_pool is None:
+            self._worker_pool = get_default_worker_pool()
+        return self._worker_pool
 
     def run_file(
         self,
@@ -84,7 +305,15 @@ class SubprocessInterpreter:
         proc = subprocess.Popen(
             cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
-        stdout, stderr = proc.communicate()
+        try:
+            stdout, stderr = proc.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            stdout, _ = proc.communicate()
+            stderr = f"TimeoutError: code execution exceeded {self.timeout} seconds"
+        return self._format_result(stdout, stderr)
+
+    def _format_result(self, stdout: str, stderr: str) -> str:
         if self.print_stdout and stdout:
             print("======stdout======")
             print(Fore.GREEN + stdout + Fore.RESET)
@@ -102,8 +331,10 @@ class SubprocessInterpreter:
         code: str,
         code_type: str,
     ) -> str:
-        r"""Generates a temporary file with the given code, executes it, and
-            deletes the file afterward.
+        r"""Executes python code in a warm worker of the worker pool. Other
+            code, or python code if use_worker_pool is False, is written to a
+            temporary file which is executed in a subprocess and deleted
+            afterward.
 
         Args:
             code (str): The code string to execute.
@@ -138,6 +369,10 @@ class SubprocessInterpreter:
                         "This choice stops the current operation and any "
                         "further code execution."
                     )
+        if code_type == "python" and self.use_worker_pool:
+            stdout, stderr = self.worker_pool.run(code, timeout=self.timeout)
+            return self._format_result(stdout, stderr)
+
         temp_file_path = self._create_temp_file(
             code=code, extension=self._CODE_EXTENSION_MAPPING[code_type]
         )
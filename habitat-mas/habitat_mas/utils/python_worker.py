@@ -0,0 +1,81 @@
+r"""Sandbox worker of :class:`PythonWorkerPool`, run as a standalone script.
+
+The worker imports the modules given on the command line once, then reads
+requests from stdin, one JSON object per line: ``{"code": "..."}``. Each code
+string is executed in a fresh ``__main__`` namespace and the worker replies
+on stdout with one JSON line: ``{"stdout": "...", "stderr": "..."}``.
+
+It only depends on the standard library so that it can start before (and
+without) the rest of the package.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import linecache
+import os
+import sys
+import traceback
+
+
+def _set_memory_limit(memory_limit_mb):
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    limit = int(memory_limit_mb * 1024 * 1024)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_code(code):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    # make the source lines available to tracebacks
+    linecache.cache["<code>"] = (len(code), None, code.splitlines(True), "<code>")
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            exec(compile(code, "<code>", "exec"), namespace)
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            # skip the frame of this function, like a traceback of a script
+            etype, value, tb = sys.exc_info()
+            traceback.print_exception(etype, value, tb.tb_next)
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--preimport", nargs="*", default=[])
+    parser.add_argument("--memory-limit-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    # keep private copies of the pipes for the protocol, so that code writing
+    # to the file descriptors directly (e.g. subprocesses) cannot corrupt it
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    responses = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    for module in args.preimport:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    if args.memory_limit_mb is not None:
+        _set_memory_limit(args.memory_limit_mb)
+
+    # signal that the worker is ready
+    responses.write(json.dumps({"ready": True}) + "\n")
+    responses.flush()
+    for line in requests:
+        request = json.loads(line)
+        responses.write(json.dumps(_run_code(request["code"])) + "\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    main()
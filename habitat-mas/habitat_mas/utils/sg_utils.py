@@ -4,21 +4,20 @@
 # TODO: Publish semantic_scene_graph from habitat to ROS, and reconstruction GT
 # scene graph in sg_nav, after moving agent logics to sg_nav package
 
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
 import os
 import sys
 import time
-from typing import List
+from typing import Dict, List
 import pathlib
 import numpy as np
 import pickle
 import open3d as o3d
 import copy 
-from scipy import stats
 from scipy.ndimage.morphology import binary_dilation
 import quaternion as qt
 import ros_numpy 
-from sklearn.cluster import DBSCAN
 from matplotlib import cm 
 
 from habitat_sim import Simulator
@@ -34,6 +33,12 @@ from scene_graph.scene_graph_gt import SceneGraphGTGibson
 from scene_graph.object_layer import ObjectLayer, ObjectNode
 from scene_graph.region_layer import RegionLayer
 from scene_graph.utils import project_points_to_grid_xz
+from habitat_mas.perception.voxel_clustering import (
+    ClassVoxelMap,
+    _cluster_voxels,
+    compute_cluster_stats,
+    match_clusters,
+)
 
 
 # NOTE: category index in habitat gibson is meaningless 
@@ -53,13 +58,23 @@ class SceneGraphRtabmap(SceneGraphBase):
             scene_bounds=None, grid_map=None, map_resolution=0.05, dbscan_eps=1.0, 
             dbscan_min_samples=5, dbscan_num_processes=4, min_points_filter=5,
             dbscan_verbose=False, dbscan_vis=False, label_scale=2, 
-            nms=True, nms_th=0.4):
+            nms=True, nms_th=0.4, voxel_size=0.05):
+        """
+        Build the scene graph from a semantic point cloud, more points can be added with update().
+        
+        Points are voxel-downsampled and clustered per class with DBSCAN (classes in parallel 
+        with dbscan_num_processes processes), label_scale is kept for compatibility since 
+        classes are never clustered together. With point_features, object vertices are the 
+        voxel centroids of the object. Call close(), or use the scene graph as a context manager,
+        to shut down the process pool.
+        """
 
         # 1. get boundary of the scene (one-layer) and initialize map
         self.scene_bounds = scene_bounds
         self.grid_map = grid_map
         self.map_resolution = map_resolution
         self.point_features = point_features
+        self.label_mapping = label_mapping
         self.object_layer = ObjectLayer()
         self.region_layer = RegionLayer()
         
@@ -67,8 +82,28 @@ class SceneGraphRtabmap(SceneGraphBase):
             self.region_layer.init_map(
                 self.scene_bounds, self.map_resolution, self.grid_map
             )
+        
+        self.dbscan_eps = dbscan_eps
+        self.dbscan_min_samples = dbscan_min_samples
+        self.dbscan_num_processes = dbscan_num_processes
+        self.dbscan_verbose = dbscan_verbose
+        self.min_points_filter = min_points_filter
+        self.nms = nms
+        self.nms_th = nms_th
+        
+        # accumulated voxels and object candidates of each class
+        self.voxel_map = ClassVoxelMap(voxel_size)
+        self.class_objects: Dict[int, List[dict]] = {}
+        self._next_obj_id = 0
+        self._executor = None
 
-        # 2. use DBSCAN with label as fourth dimension to cluster instance points
+        xyz, class_label = self.parse_rtabmap_pcl(rtabmap_pcl)
+        self.update(xyz, class_label)
+        return
+    
+    @staticmethod
+    def parse_rtabmap_pcl(rtabmap_pcl):
+        """Get points and class labels (-1 for background) of a rtabmap semantic point cloud"""
         points = ros_numpy.point_cloud2.pointcloud2_to_array(rtabmap_pcl)
         points = ros_numpy.point_cloud2.split_rgb_field(points)
         xyz = np.vstack((points["x"], points["y"], points["z"])).T
@@ -78,103 +113,153 @@ class SceneGraphRtabmap(SceneGraphBase):
         num_class = len(coco_categories)
         # cvrt from 0 for background to -1 for background
         class_label = np.round(g * float(num_class + 1) / 255.0).astype(int) - 1
-        # filter out background points 
+        return xyz, class_label
+    
+    def update_from_pcl(self, rtabmap_pcl):
+        """Add a chunk of rtabmap semantic point cloud to the scene graph"""
+        xyz, class_label = self.parse_rtabmap_pcl(rtabmap_pcl)
+        self.update(xyz, class_label)
+    
+    def update(self, xyz, class_label):
+        """
+        Add a chunk of semantic points to the scene graph. Only the classes present in the 
+        chunk are clustered again, but DBSCAN then runs over all the voxels accumulated for 
+        each of these classes, so the cost of an update grows with the size of the touched 
+        classes in the map (bounded by the voxel count, not the raw point count, when 
+        voxel_size is set). Objects keep their id across updates when their new cluster 
+        shares points with the previous one.
+        
+        Arguments:
+            xyz: np.ndarray (N, 3)
+            class_label: np.ndarray (N,), -1 for background
+        """
+        # filter out background points and unknown classes
+        class_label = np.asarray(class_label).reshape(-1)
         objects_mask = (class_label >= 0)
-        if not np.any(objects_mask): # no object points in semantic mesh 
-            # stop initialization with empty scene graph
-            return 
-        objects_xyz = xyz[objects_mask]
-        objects_label = class_label[objects_mask]
-        sem_points = np.concatenate(
-            (objects_xyz, label_scale * objects_label.reshape(-1, 1)), axis=1)
-
-        # cluster semantic point clouds to object clusters 
-        db = DBSCAN(eps=dbscan_eps, min_samples=dbscan_min_samples, 
-                    n_jobs=dbscan_num_processes).fit(sem_points)
-        core_samples_mask = np.zeros_like(db.labels_, dtype=bool)
-        core_samples_mask[db.core_sample_indices_] = True
-        inst_labels = db.labels_
-        object_ids = set(inst_labels)
-        if dbscan_verbose:
-            num_clusters = len(object_ids) - (1 if -1 in inst_labels else 0)
-            num_noise = (inst_labels == -1).sum()
-            print(f"DBSCAN on semantic point clouds, num_clusters ({num_clusters}), num_noise ({num_noise})")
+        if self.label_mapping is not None:
+            objects_mask &= (class_label < len(self.label_mapping))
+        updated_classes = sorted(
+            self.voxel_map.insert(np.asarray(xyz)[objects_mask], class_label[objects_mask])
+        )
+        if len(updated_classes) == 0: # no new object points
+            return
         
-        if dbscan_vis:
-            pass
+        # 2. cluster voxels of each updated class to object clusters 
+        updated_ids = set()
+        for class_id, cluster_labels in zip(updated_classes, self._cluster_classes(updated_classes)):
+            voxels = self.voxel_map.class_voxels[class_id]
+            cluster_ids, num_points, centers, min_bounds, max_bounds, members = \
+                compute_cluster_stats(
+                    cluster_labels, voxels["counts"], voxels["sums"], voxels["mins"], voxels["maxs"]
+                )
+            if self.dbscan_verbose:
+                num_noise = voxels["counts"][cluster_labels == -1].sum()
+                print(f"DBSCAN on class {class_id}, num_clusters ({len(cluster_ids)}), num_noise ({num_noise})")
+            
+            # previous objects of the class, with their voxel indices after the insert
+            previous_objects = self.class_objects.get(class_id, [])
+            remap = self.voxel_map.voxel_remaps[class_id]
+            matches = match_clusters(
+                cluster_ids, cluster_labels, voxels["counts"], 
+                [remap[obj["members"]] for obj in previous_objects]
+            )
+            
+            centroids = self.voxel_map.get_centroids(class_id) if self.point_features else None
+            candidates = []
+            for i in np.flatnonzero(num_points > self.min_points_filter):
+                if matches[i] >= 0:
+                    obj_id = previous_objects[matches[i]]["id"]
+                else:
+                    obj_id = self._next_obj_id
+                    self._next_obj_id += 1
+                candidates.append({
+                    "id": obj_id,
+                    "label": class_id,
+                    "num_points": num_points[i],
+                    "center": centers[i],
+                    "size": max_bounds[i] - min_bounds[i],
+                    "vertices": centroids[members[i]] if self.point_features else None,
+                    "members": members[i],
+                })
+                updated_ids.add(obj_id)
+            self.class_objects[class_id] = candidates
         
         # 3. non-maximum suppression: filter out noisy detection result 
-
-        if nms:
-            valid_object_ids = []
-            valid_object_score_bboxes = [] # [p, x, y, z, l,w,h]
-            for obj_id in object_ids:
-                if obj_id == -1: # outliers
-                    continue
-                obj_xyz = objects_xyz[inst_labels == obj_id]
-                if obj_xyz.shape[0] > min_points_filter:
-                    label_modes, _ = stats.mode(objects_label[inst_labels == obj_id], nan_policy="omit")
-                    # select mode label as object label
-                    obj_label = label_modes[0]
-                    if obj_label < len(label_mapping):
-                        obj_cls_name = label_mapping[obj_label]
-                        center = np.mean(obj_xyz, axis=0)
-                        size = np.max(obj_xyz, axis=0) - np.min(obj_xyz, axis=0)
-                        score_bbox = np.array([obj_xyz.shape[0], # num of points  
-                                            center[0], center[1], center[2],
-                                            size[0], size[1], size[2],
-                                            ])
-                        valid_object_ids.append(obj_id)
-                        valid_object_score_bboxes.append(score_bbox)
-            
-            object_ids = valid_object_ids
-            # there could be no valid objects founded 
-            if len(valid_object_ids) > 0:
-                valid_object_score_bboxes = np.stack(valid_object_score_bboxes, axis=0)
-                selected_indices, _ = NMS(valid_object_score_bboxes, nms_th)
-                object_ids = [valid_object_ids[idx] for idx in selected_indices]
-                
-        # 4. create object nodes in scene graph 
+        candidates = [obj for objs in self.class_objects.values() for obj in objs]
+        if self.nms and len(candidates) > 0:
+            score_bboxes = np.stack([
+                # [p, x, y, z, l,w,h], p is the num of points
+                np.concatenate([[obj["num_points"]], obj["center"], obj["size"]])
+                for obj in candidates
+            ], axis=0)
+            selected_indices, _ = NMS(score_bboxes, self.nms_th)
+            candidates = [candidates[idx] for idx in selected_indices]
         
-        for obj_id in object_ids:
-            
-            if obj_id == -1: # outliers
-                continue
-            
-            obj_xyz = objects_xyz[inst_labels == obj_id]
-            if obj_xyz.shape[0] > min_points_filter:
-                label_modes, _ = stats.mode(objects_label[inst_labels == obj_id], nan_policy="omit")
-                # select mode label as object label
-                obj_label = label_modes[0]
-                obj_cls_name = ""
-                if obj_label >= 0:
-                    obj_cls_name = label_mapping[obj_label]
-                # else:
-                #     obj_cls_name = "background"
-                    # use axis-aligned bounding box for now 
-                    center = np.mean(obj_xyz, axis=0)
-                    rot_quat = np.array([0, 0, 0, 1])  # identity transform
-                    size = np.max(obj_xyz, axis=0) - np.min(obj_xyz, axis=0)
-                    if not self.point_features:
-                        object_vertices = None
-                    else:
-                        object_vertices = obj_xyz
-                        
-                    object_node = self.object_layer.add_object(
-                        center,
-                        rot_quat,
-                        size,
-                        id=obj_id,
-                        class_name=obj_cls_name,
-                        label=obj_label,
-                        vertices=object_vertices   
-                    )
+        # 4. sync object nodes in scene graph with the selected objects
+        selected_ids = set(obj["id"] for obj in candidates)
+        for obj_id in list(self.object_layer.obj_ids):
+            if obj_id not in selected_ids:
+                self.object_layer.remove_object(obj_id)
+        for obj in candidates:
+            if obj["id"] in self.object_layer:
+                if obj["id"] not in updated_ids:
+                    continue
+                # the cluster of the object changed
+                self.object_layer.remove_object(obj["id"])
+            obj_cls_name = ""
+            if self.label_mapping is not None:
+                obj_cls_name = self.label_mapping[obj["label"]]
+            # use axis-aligned bounding box for now 
+            self.object_layer.add_object(
+                obj["center"],
+                np.array([0, 0, 0, 1]),  # identity transform
+                obj["size"],
+                id=obj["id"],
+                class_name=obj_cls_name,
+                label=obj["label"],
+                vertices=obj["vertices"]
+            )
 
-                # no region prediction module implemented 
-                # connect object to region
-                # region_node.add_object(object_node)
+            # no region prediction module implemented 
+            # connect object to region
+            # region_node.add_object(object_node)
 
         return
+    
+    def _cluster_classes(self, class_ids):
+        """Run DBSCAN on the voxels of each class, in a process pool if there are several classes"""
+        tasks = [
+            (
+                self.voxel_map.get_centroids(class_id), 
+                self.voxel_map.class_voxels[class_id]["counts"],
+                self.dbscan_eps, 
+                self.dbscan_min_samples
+            )
+            for class_id in class_ids
+        ]
+        if self.dbscan_num_processes > 1 and len(tasks) > 1:
+            if self._executor is None:
+                # reused across updates
+                self._executor = ProcessPoolExecutor(max_workers=self.dbscan_num_processes)
+            return list(self._executor.map(_cluster_voxels, tasks))
+        return [_cluster_voxels(task) for task in tasks]
+    
+    def close(self):
+        """Shut down the clustering process pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def __del__(self):
+        # the pool may not be created if __init__ failed
+        if getattr(self, "_executor", None) is not None:
+            self.close()
 
 
 
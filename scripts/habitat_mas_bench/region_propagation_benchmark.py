@@ -0,0 +1,68 @@
+# Copyright (c) Meta Platforms, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Time region id propagation over the navmesh triangle graph on synthetic grid meshes.
+
+python scripts/habitat_mas_bench/region_propagation_benchmark.py --sizes 10000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from habitat_mas.perception.mesh_utils import (
+    compute_triangle_adjacency_csr,
+    propagate_triangle_region_ids,
+    region_adjacency_pairs,
+)
+from habitat_mas.test.mesh_data import make_grid_triangles
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 200000]
+    )
+    parser.add_argument("--num-regions", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'triangles':>10} {'bfs (s)':>10} {'geodesic (s)':>13} {'region pairs (s)':>17}")
+    for size in args.sizes:
+        grid_size = max(1, int(np.sqrt(size / 2)))
+        triangles = make_grid_triangles(grid_size, grid_size, seed=0)
+        side = int(np.sqrt(triangles.max() + 1))
+        vertex_ids = np.arange(side**2)
+        vertices = np.stack(
+            [vertex_ids % side, np.zeros(len(vertex_ids)), vertex_ids // side],
+            axis=1,
+        )
+        triangle_centers = np.mean(vertices[triangles], axis=1)
+        adjacency = compute_triangle_adjacency_csr(triangles)
+
+        triangle_region_ids = -np.ones(len(triangles), dtype=int)
+        seeds = rng.choice(len(triangles), args.num_regions, replace=False)
+        triangle_region_ids[seeds] = np.arange(args.num_regions)
+
+        start = time.perf_counter()
+        result = propagate_triangle_region_ids(triangle_region_ids, adjacency)
+        bfs_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        propagate_triangle_region_ids(
+            triangle_region_ids,
+            adjacency,
+            mode="geodesic",
+            triangle_centers=triangle_centers,
+        )
+        geodesic_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        region_adjacency_pairs(result, adjacency)
+        pairs_time = time.perf_counter() - start
+
+        print(
+            f"{len(triangles):>10} {bfs_time:>10.4f} {geodesic_time:>13.4f} {pairs_time:>17.4f}"
+        )
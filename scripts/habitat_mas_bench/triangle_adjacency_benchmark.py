@@ -0,0 +1,87 @@
+# Copyright (c) Meta Platforms, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Compare the edge-hash triangle adjacency in habitat_mas.perception.mesh_utils
+against the original O(T^2) pairwise implementation on synthetic grid meshes.
+
+python scripts/habitat_mas_bench/triangle_adjacency_benchmark.py --sizes 1000 10000 200000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from habitat_mas.perception.mesh_utils import (
+    compute_triangle_adjacency,
+    compute_triangle_adjacency_csr,
+)
+from habitat_mas.test.mesh_data import make_grid_triangles
+
+
+def pairwise_triangle_adjacency(triangles):
+    """The original implementation: set intersection for every triangle pair"""
+    adjacency_list = []
+    for i, triangle in enumerate(triangles):
+        triangle_neighbors = []
+        for j, other_triangle in enumerate(triangles):
+            if i != j:
+                shared_vertices = set(triangle).intersection(other_triangle)
+                if len(shared_vertices) == 2:
+                    triangle_neighbors.append(j)
+        adjacency_list.append(triangle_neighbors)
+    return adjacency_list
+
+
+def time_fn(fn, *args, repeats=1):
+    best = np.inf
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 5000, 20000, 50000, 100000, 200000],
+    )
+    parser.add_argument(
+        "--max-pairwise-size",
+        type=int,
+        default=5000,
+        help="Skip the O(T^2) implementation above this number of triangles",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'triangles':>10} {'csr (s)':>10} {'list (s)':>10} {'pairwise (s)':>13} {'speedup':>9}")
+    for size in args.sizes:
+        grid_size = max(1, int(np.sqrt(size / 2)))
+        triangles = make_grid_triangles(grid_size, grid_size, seed=0)
+        csr_time, _ = time_fn(
+            compute_triangle_adjacency_csr, triangles, repeats=args.repeats
+        )
+        list_time, adjacency_list = time_fn(
+            compute_triangle_adjacency, triangles, repeats=args.repeats
+        )
+
+        pairwise_str, speedup_str = "-", "-"
+        if len(triangles) <= args.max_pairwise_size:
+            pairwise_time, expected = time_fn(
+                pairwise_triangle_adjacency, triangles.tolist()
+            )
+            assert adjacency_list == expected, "Adjacency mismatch"
+            pairwise_str = f"{pairwise_time:.4f}"
+            speedup_str = f"{pairwise_time / list_time:.0f}x"
+
+        print(
+            f"{len(triangles):>10} {csr_time:>10.4f} {list_time:>10.4f} {pairwise_str:>13} {speedup_str:>9}"
+        )
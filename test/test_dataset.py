@@ -9,6 +9,7 @@ from itertools import groupby, islice
 import pytest
 
 from habitat.core.dataset import Dataset, Episode
+from habitat.core.scene_scheduler import SceneAffinityScheduler
 from habitat.tasks.nav.nav import NavigationEpisode, NavigationGoal
 
 
@@ -376,3 +377,59 @@ def test_reset_goals():
 
     ep.goals = [NavigationGoal(position=[3, 4, 5])]
     assert ep._shortest_path_cache is None
+
+
+def test_scene_affinity_scheduler():
+    dataset = _construct_dataset(100)
+    # scene_id_0 has the most costly episodes
+    dataset.episodes += _construct_dataset(20, num_groups=1).episodes
+
+    scheduler = SceneAffinityScheduler.from_dataset(dataset, num_workers=3)
+    assignments = scheduler.assignments
+    assert len(assignments) == 3
+    # every scene is loaded by a single worker
+    scenes = [s for worker_scenes in assignments for s in worker_scenes]
+    assert sorted(scenes) == sorted(
+        {dataset.scene_from_scene_path(ep.scene_id) for ep in dataset.episodes}
+    )
+    # the workers are balanced by their number of episodes
+    loads = [
+        sum(30 if s == "scene_id_0" else 10 for s in worker_scenes)
+        for worker_scenes in assignments
+    ]
+    assert max(loads) - min(loads) <= 10
+    assert scheduler.next_scenes() is None
+
+    # less scenes than workers, the costliest scene gets the extra workers
+    scheduler = SceneAffinityScheduler.from_dataset(
+        _construct_dataset(30, num_groups=2), num_workers=3
+    )
+    assert all(len(scenes) == 1 for scenes in scheduler.assignments)
+    assert len(scheduler.assignments) == 3
+
+
+def test_scene_affinity_scheduler_dynamic():
+    dataset = _construct_dataset(100)
+    dataset.episodes += _construct_dataset(20, num_groups=1).episodes
+    scheduler = SceneAffinityScheduler.from_dataset(
+        dataset, num_workers=4, dynamic=True
+    )
+    assert scheduler.assignments[0] == ["scene_id_0"]
+    assert all(len(scenes) == 1 for scenes in scheduler.assignments)
+    assert scheduler.num_pending_scenes == 6
+    assert scheduler.num_pending_episodes == 60
+
+    pending = []
+    while True:
+        scenes = scheduler.next_scenes()
+        if scenes is None:
+            break
+        pending.extend(scenes)
+    assert len(pending) == 6
+    assert scheduler.num_pending_episodes == 0
+    assert len(set(pending + sum(scheduler.assignments, []))) == 10
+
+    scheduler = SceneAffinityScheduler.from_dataset(
+        _construct_dataset(10, num_groups=2), num_workers=4, dynamic=True
+    )
+    assert scheduler.num_workers == 2
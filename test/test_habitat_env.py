@@ -19,6 +19,7 @@ from habitat.core.batch_rendering.env_batch_renderer_constants import (
     KEYFRAME_OBSERVATION_KEY,
 )
 from habitat.core.simulator import AgentState
+from habitat.core.vector_env import RESET_DEFERRED_KEY
 from habitat.datasets.pointnav.pointnav_dataset import PointNavDatasetV1
 from habitat.gym.gym_definitions import make_gym_from_config
 from habitat.gym.gym_wrapper import HabGymWrapper
@@ -504,6 +505,73 @@ def test_vec_env_call_func():
         assert env_ids == list(range(num_envs))
 
 
+def test_vectorized_envs_shared_memory():
+    configs, _ = _load_test_data()
+    num_envs = len(configs)
+    env_fn_args = tuple((c,) for c in configs)
+    with habitat.VectorEnv(
+        make_env_fn=make_gym_from_config,
+        env_fn_args=env_fn_args,
+        multiprocessing_start_method="forkserver",
+    ) as envs, habitat.VectorEnv(
+        make_env_fn=make_gym_from_config,
+        env_fn_args=env_fn_args,
+        multiprocessing_start_method="forkserver",
+        shared_memory_observations=True,
+    ) as shared_envs:
+        observations = envs.reset()
+        shared_observations = shared_envs.reset()
+        for obs, shared_obs in zip(observations, shared_observations):
+            assert obs.keys() == shared_obs.keys()
+            for k in obs:
+                assert np.array_equal(obs[k], shared_obs[k])
+
+        for _ in range(configs[0].habitat.environment.max_episode_steps):
+            actions = sample_non_stop_action_gym(
+                envs.action_spaces[0], num_envs
+            )
+            outputs = envs.step(actions)
+            shared_outputs = shared_envs.step(actions)
+            for (obs, *_), (shared_obs, *_) in zip(outputs, shared_outputs):
+                for k in obs:
+                    assert np.array_equal(obs[k], shared_obs[k])
+
+        shared_envs.pause_at(1)
+        assert len(shared_envs.reset()) == num_envs - 1
+
+    assert shared_envs._is_closed
+
+
+def test_vectorized_envs_async_reset():
+    configs, _ = _load_test_data()
+    num_envs = len(configs)
+    env_fn_args = tuple((c,) for c in configs)
+    with habitat.VectorEnv(
+        make_env_fn=make_gym_from_config,
+        env_fn_args=env_fn_args,
+        multiprocessing_start_method="forkserver",
+        async_reset_done=True,
+    ) as envs:
+        envs.reset()
+        prev_dones = [False] * num_envs
+        num_deferred_resets = 0
+        for _ in range(2 * configs[0].habitat.environment.max_episode_steps):
+            outputs = envs.step(
+                sample_non_stop_action_gym(envs.action_spaces[0], num_envs)
+            )
+            for prev_done, (_, reward, done, info) in zip(
+                prev_dones, outputs
+            ):
+                # the step after the end of an episode only resets
+                assert info[RESET_DEFERRED_KEY] == prev_done
+                if prev_done:
+                    assert reward == 0.0 and not done
+                    num_deferred_resets += 1
+            prev_dones = [done for _, _, done, _ in outputs]
+
+        assert num_deferred_resets > 0
+
+
 def test_close_with_paused():
     configs, _ = _load_test_data()
     env_fn_args = tuple((c,) for c in configs)
@@ -21,10 +21,16 @@ import habitat.tasks.rearrange.rearrange_sim
 import habitat.tasks.rearrange.rearrange_task
 import habitat.utils.env_utils
 import habitat_sim
+from habitat.config import read_write
 from habitat.config.default import get_config
 from habitat.core.embodied_task import Episode
 from habitat.core.environments import get_env_class
 from habitat.core.logging import logger
+from habitat.datasets.rearrange.episode_store import (
+    EPISODE_STORE_EXT,
+    LazyEpisodes,
+    write_episode_store,
+)
 from habitat.datasets.rearrange.rearrange_dataset import RearrangeDatasetV0
 from habitat.utils.geometry_utils import is_point_in_triangle
 
@@ -81,7 +87,34 @@ def check_json_serialization(dataset: RearrangeDatasetV0):
     ), "JSON dataset encoding/decoding isn't consistent"
 
 
-def test_rearrange_dataset():
+def check_episode_store_serialization(
+    dataset: RearrangeDatasetV0, store_path: str
+):
+    write_episode_store(store_path, dataset.to_binary())
+    dataset_config = dataset.config.copy()
+    with read_write(dataset_config):
+        dataset_config.data_path = store_path
+        dataset_config.content_scenes = ["*"]
+    lazy_dataset = RearrangeDatasetV0(dataset_config)
+    assert isinstance(lazy_dataset.episodes, LazyEpisodes)
+    assert len(lazy_dataset.episodes) == len(dataset.episodes)
+    assert lazy_dataset.scene_ids == dataset.scene_ids
+    assert json.loads(lazy_dataset.to_json()) == json.loads(
+        dataset.to_json()
+    ), "Episode store decoding isn't consistent."
+
+    scene_id = dataset.scene_ids[0]
+    assert [ep.episode_id for ep in dataset.get_scene_episodes(scene_id)] == [
+        ep.episode_id for ep in lazy_dataset.get_scene_episodes(scene_id)
+    ]
+    splits = lazy_dataset.get_splits(2, allow_uneven_splits=True)
+    assert all(isinstance(split.episodes, LazyEpisodes) for split in splits)
+    assert sorted(
+        ep.episode_id for split in splits for ep in split.episodes
+    ) == sorted(ep.episode_id for ep in dataset.episodes)
+
+
+def test_rearrange_dataset(tmp_path):
     dataset_config = get_config(CFG_TEST).habitat.dataset
     if not RearrangeDatasetV0.check_config_paths_exist(dataset_config):
         pytest.skip(
@@ -95,6 +128,9 @@ def test_rearrange_dataset():
     dataset.episodes = dataset.episodes[0:EPISODES_LIMIT]
     check_json_serialization(dataset)
     check_binary_serialization(dataset)
+    check_episode_store_serialization(
+        dataset, str(tmp_path / f"rearrange{EPISODE_STORE_EXT}")
+    )
 
 
 def test_pddl():
@@ -122,6 +158,15 @@ def test_pddl():
     poss_actions = pddl.get_possible_actions()
     ac_strs = [x.compact_str for x in poss_actions]
 
+    # Pruning the groundings with the true predicates keeps the same actions
+    # as checking the precondition of every action.
+    applicable_actions = pddl.get_possible_actions(true_preds=true_preds)
+    assert [x.compact_str for x in applicable_actions] == [
+        x.compact_str
+        for x in poss_actions
+        if x.is_precond_satisfied_from_predicates(true_preds)
+    ]
+
     # Make sure we can't do an action if the precondition is not satisfied.
     place_ac = poss_actions[
         ac_strs.index("place(goal0|0,TARGET_goal0|0,robot_0)")
@@ -146,6 +191,55 @@ def test_pddl():
     )
 
 
+def test_pddl_truth_cache_within_step():
+    config = get_config(
+        "habitat-lab/habitat/config/benchmark/rearrange/multi_task/rearrange_easy.yaml",
+        [
+            # Concurrent rendering can cause problems on CI.
+            "habitat.simulator.concur_render=False",
+            "habitat.dataset.split=val",
+        ],
+    )
+    env_class = get_env_class(config.habitat.env_task)
+    env = habitat.utils.env_utils.make_env_fn(
+        env_class=env_class, config=config
+    )
+    env.reset()
+    task = env.env.env._env.task  # type: ignore
+    pddl = task.pddl_problem
+    sim = pddl.sim_info.sim
+    assert pddl.sim_info.pred_truth_cache is not None
+
+    def true_pred_strs():
+        return {x.compact_str for x in pddl.get_true_predicates()}
+
+    holding = "holding(goal0|0,robot_0)"
+    assert holding not in true_pred_strs()
+
+    # Grasping and releasing without stepping the simulator, as the grasp
+    # actions do, changes the cached predicates.
+    obj_idx = pddl.sim_info.search_for_entity(pddl.all_entities["goal0|0"])
+    sim.grasp_mgr.snap_to_obj(sim.scene_obj_ids[obj_idx])
+    assert holding in true_pred_strs()
+    sim.grasp_mgr.desnap(force=True)
+    assert holding not in true_pred_strs()
+
+    # A task action changes the state before the simulator is stepped, so
+    # the actions after it get new truth values.
+    true_pred_strs()
+    state_version = sim.state_version
+    task._step_single_action(
+        "base_velocity",
+        {"action_args": {"base_vel": np.array([1.0, 0.0])}},
+        env.env.env._env.current_episode,  # type: ignore
+    )
+    assert sim.state_version != state_version
+    assert pddl.sim_info.pred_truth_cache
+    pddl.sim_info.sync_step_cache()
+    assert not pddl.sim_info.pred_truth_cache
+    env.close()
+
+
 TEST_CFG_PATHS = list(
     glob(
         "habitat-lab/habitat/config/benchmark/rearrange/**/*.yaml",
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and its affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import pytest
+
+torch = pytest.importorskip("torch")
+habitat_baselines = pytest.importorskip("habitat_baselines")
+
+from gym import spaces
+from torch import nn
+
+from habitat_baselines.common.rollout_storage import RolloutStorage
+from habitat_baselines.rl.ppo import PPO
+
+NUM_STEPS = 4
+NUM_ENVS = 2
+
+
+class ConstantPolicy(nn.Module):
+    """Policy with a single value and action distribution for all the observations"""
+
+    num_recurrent_layers = 1
+    recurrent_hidden_size = 4
+
+    def __init__(self):
+        super().__init__()
+        self.value = nn.Parameter(torch.zeros(1))
+        self.logits = nn.Parameter(torch.zeros(2))
+
+    def policy_parameters(self):
+        return self.parameters()
+
+    def aux_loss_parameters(self):
+        return {}
+
+    def evaluate_actions(
+        self,
+        observations,
+        rnn_hidden_states,
+        prev_actions,
+        masks,
+        action,
+        rnn_build_seq_info,
+    ):
+        n = action.shape[0]
+        dist = torch.distributions.Categorical(
+            logits=self.logits.expand(n, 2)
+        )
+        return (
+            self.value.expand(n, 1),
+            dist.log_prob(action.flatten()).unsqueeze(-1),
+            dist.entropy().unsqueeze(-1),
+            rnn_hidden_states,
+            {},
+        )
+
+
+def fill_rollouts(policy, fake_value_pred, fake_step=(2, 0)):
+    """
+    Rollouts in which env 0 ends its episode on step 1 and its reset is
+    deferred, so step 2 is the fake transition from the terminal observation.
+    """
+    rollouts = RolloutStorage(
+        NUM_STEPS,
+        NUM_ENVS,
+        spaces.Dict({"x": spaces.Box(-1.0, 1.0, (1,))}),
+        spaces.Discrete(2),
+        policy,
+    )
+    for step in range(NUM_STEPS):
+        value_preds = torch.full((NUM_ENVS, 1), 0.5)
+        valid_masks = torch.ones(NUM_ENVS, 1, dtype=torch.bool)
+        next_masks = torch.ones(NUM_ENVS, 1, dtype=torch.bool)
+        if step == 1:
+            next_masks[0] = False
+        if step == fake_step[0]:
+            value_preds[fake_step[1]] = fake_value_pred
+            valid_masks[0] = False
+            next_masks[0] = False
+        rollouts.insert(
+            actions=torch.tensor([[step % 2], [1]]),
+            action_log_probs=torch.full((NUM_ENVS, 1), -0.5),
+            value_preds=value_preds,
+        )
+        rollouts.insert(
+            next_observations={"x": torch.zeros(NUM_ENVS, 1)},
+            rewards=torch.tensor([[1.0], [float(step)]]),
+            next_masks=next_masks,
+            valid_masks=valid_masks,
+        )
+        rollouts.advance_rollout()
+    rollouts.compute_returns(
+        torch.zeros(NUM_ENVS, 1), use_gae=True, gamma=0.99, tau=0.95
+    )
+    return rollouts
+
+
+def make_ppo():
+    return PPO(
+        ConstantPolicy(),
+        clip_param=0.2,
+        ppo_epoch=2,
+        num_mini_batch=1,
+        value_loss_coef=0.5,
+        entropy_coef=0.01,
+        lr=1e-2,
+        eps=1e-5,
+        max_grad_norm=0.5,
+    )
+
+
+def test_rollout_storage_invalid_steps_excluded_from_loss():
+    ppo = make_ppo()
+    advantages = ppo.get_advantages(fill_rollouts(ppo.actor_critic, 0.5))
+    assert advantages[2, 0].item() == 0.0
+    assert torch.all(advantages[:NUM_STEPS, 1] != 0.0)
+
+    # The value prediction of the fake step changes neither the losses nor
+    # the gradients.
+    metrics = []
+    for fake_value_pred in [0.5, 100.0]:
+        torch.manual_seed(0)
+        ppo = make_ppo()
+        metrics.append(
+            ppo.update(fill_rollouts(ppo.actor_critic, fake_value_pred))
+        )
+    assert metrics[0].keys() == metrics[1].keys()
+    for k in metrics[0]:
+        assert metrics[0][k] == pytest.approx(metrics[1][k]), k
+
+    # It does for a valid step.
+    torch.manual_seed(0)
+    ppo = make_ppo()
+    valid_metrics = ppo.update(
+        fill_rollouts(ppo.actor_critic, 100.0, fake_step=(2, 1))
+    )
+    assert valid_metrics["value_loss"] != pytest.approx(
+        metrics[0]["value_loss"]
+    )